@@ -0,0 +1,89 @@
+"""compare the integration schemes of NBodySystem.step by the number of
+force evaluations they need for a given accuracy
+
+Every scheme integrates one period of an eccentric two-body orbit with
+several timesteps. The error is the largest deviation from the initial
+positions after one period, the cost is the number of force (or, for
+'hermite', force and jerk) evaluations.
+
+Usage:
+    python -m benchmarks.integrators [--json results.json]
+"""
+import argparse
+import json
+import numpy as np
+import nbody
+from nbody import integrators
+
+SCHEMES = ['kick-drift', 'kdk', 'dkd', 'yoshida4', 'yoshida6', 'hermite']
+STEPS_PER_PERIOD = [50, 100, 200, 400, 800, 1600]
+
+
+class Counter:
+    """wrap a force function and count its calls"""
+
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.function(*args, **kwargs)
+
+
+def eccentric_orbit(eccentricity=0.5):
+    """two equal masses (G=1, m=1) on an orbit with semi-major axis 1
+    starting at apocentre; return the system and its period"""
+    separation = 1 + eccentricity
+    speed = np.sqrt(2 * (1 - eccentricity) / separation)
+    body1 = nbody.PointMass('b1', 1.0, np.array([separation / 2, 0]),
+                            np.array([0, speed / 2]))
+    body2 = nbody.PointMass('b2', 1.0, np.array([-separation / 2, 0]),
+                            np.array([0, -speed / 2]))
+    period = 2 * np.pi * np.sqrt(1 / 2)
+    return nbody.NBodySystem(body1, body2), period
+
+
+def run(scheme, nsteps):
+    system, period = eccentric_orbit()
+    initial = system.all_positions.copy()
+    counter = Counter(integrators.acceleration)
+    jerk_counter = Counter(integrators.acceleration_jerk)
+    integrators.acceleration = counter
+    integrators.acceleration_jerk = jerk_counter
+    try:
+        dt = period / nsteps
+        for i in range(nsteps):
+            system.step(dt, grav_const=1, integrator=scheme,
+                        halfstep=(scheme == 'kick-drift' and i == 0))
+    finally:
+        integrators.acceleration = counter.function
+        integrators.acceleration_jerk = jerk_counter.function
+    error = np.abs(system.all_positions - initial).max()
+    return {'integrator': scheme,
+            'steps': nsteps,
+            'force_evaluations': counter.calls + jerk_counter.calls,
+            'error': float(error)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print('{:<12}{:>8}{:>14}{:>14}'.format('integrator', 'steps',
+                                           'evaluations', 'error'))
+    for scheme in SCHEMES:
+        for nsteps in STEPS_PER_PERIOD:
+            result = run(scheme, nsteps)
+            results.append(result)
+            print('{integrator:<12}{steps:>8}{force_evaluations:>14}'
+                  '{error:>14.3e}'.format(**result))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""compare the float64, float32 and mixed-precision modes of NBodySystem
+by speed, peak memory and accuracy
+
+'float64' is the default, 'float32' converts the whole system with
+NBodySystem.astype(np.float32) and 'mixed' keeps float64 positions and
+velocities but evaluates the forces in float32 (dtype=np.float32).
+For every number of bodies, a single step is timed like in
+benchmarks.suite, the force error is the largest deviation from the
+float64 accelerations relative to the largest float64 acceleration,
+and a softened random cluster is simulated for --steps kdk steps to
+measure the relative energy drift and the largest deviation of the
+positions from the float64 run.
+
+Usage:
+    python -m benchmarks.precision [--json results.json] [--sizes 100]
+                                   [--methods direct] [--steps 1000]
+"""
+import argparse
+import json
+import numpy as np
+import nbody
+from nbody import forces
+from benchmarks.suite import available_methods, environment, measure
+from benchmarks.suite import MAX_DIRECT
+
+SIZES = [100, 1000, 2000]
+METHODS = ['direct', 'blocked', 'jit']
+MODES = ['float64', 'float32', 'mixed']
+STEPS = 1000
+SOFTENING = 0.05
+
+
+def random_system(nbodies, dim=3, seed=0):
+    """a random cluster in G=1 units with velocities of about the
+    virial speed"""
+    rng = np.random.default_rng(seed)
+    masses = rng.uniform(1, 2, size=nbodies) / nbodies
+    return nbody.NBodySystem.from_arrays(
+        rng.normal(size=(nbodies, dim)),
+        rng.normal(size=(nbodies, dim)) * 0.3, masses)
+
+
+def prepare(system, mode):
+    """return the system and the step options of mode"""
+    if mode == 'float32':
+        return system.astype(np.float32), {}
+    if mode == 'mixed':
+        return system.astype(np.float64), {'dtype': np.float32}
+    return system.astype(np.float64), {}
+
+
+def run(nbodies, method, mode, nsteps):
+    reference = random_system(nbodies)
+    system, options = prepare(reference, mode)
+    step = lambda: system.step(1e-3, grav_const=1, inplace=False,
+                               method=method, softening=SOFTENING,
+                               **options)
+    time, peak = measure(step)
+
+    expected = forces.acceleration(reference.all_positions,
+                                   reference.all_masses, 1, method=method,
+                                   softening=SOFTENING)
+    acc = forces.acceleration(system.all_positions, system.all_masses, 1,
+                              method=method, softening=SOFTENING,
+                              **options)
+    force_error = np.abs(acc - expected).max() / np.abs(expected).max()
+
+    energy = reference.conserved_quantities(1, softening=SOFTENING)['energy']
+    end = str(nsteps) + 'ms'
+    reference.simulate(end=end, step='1ms', grav_const=1, method=method,
+                       integrator='kdk', softening=SOFTENING)
+    system.simulate(end=end, step='1ms', grav_const=1, method=method,
+                    integrator='kdk', softening=SOFTENING, **options)
+    final = system.conserved_quantities(1, softening=SOFTENING)['energy']
+    return {'mode': mode,
+            'method': method,
+            'bodies': nbodies,
+            'time': time,
+            'peak_memory': peak,
+            'force_error': float(force_error),
+            'energy_drift': float(abs((final - energy) / energy)),
+            'position_error': float(np.abs(system.all_positions
+                                           - reference.all_positions).max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='the numbers of bodies')
+    parser.add_argument('--methods', nargs='+', default=METHODS,
+                        help='the force backends')
+    parser.add_argument('--steps', type=int, default=STEPS,
+                        help='the number of steps of the accuracy run')
+    args = parser.parse_args()
+
+    results = []
+    print('{:<9}{:<9}{:>7}{:>12}{:>12}{:>12}{:>12}{:>12}'.format(
+        'mode', 'method', 'bodies', 'time [s]', 'peak [B]', 'force err',
+        'energy err', 'pos err'))
+    for nbodies in args.sizes:
+        for method in available_methods(nbodies, args.methods, MAX_DIRECT):
+            for mode in MODES:
+                result = run(nbodies, method, mode, args.steps)
+                results.append(result)
+                print('{mode:<9}{method:<9}{bodies:>7}{time:>12.3e}'
+                      '{peak_memory:>12}{force_error:>12.3e}'
+                      '{energy_drift:>12.3e}{position_error:>12.3e}'.format(
+                          **result))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'environment': environment(), 'results': results},
+                      file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
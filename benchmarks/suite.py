@@ -0,0 +1,172 @@
+"""measure the run time and peak memory of the main NBodySystem
+operations for several numbers of bodies, dimensions and force backends
+
+Every benchmark is called once to warm up (compiling kernels and
+starting worker pools), timed with timeit (repeating it until it has
+run for at least 0.2 s) and run once more under tracemalloc to record
+the peak memory allocated by NumPy and Python. Benchmarks that evaluate forces
+also report the force evaluations and pairwise interactions per second.
+The JSON output holds the environment (commit, versions, CPUs) and one
+record per benchmark, so runs of different commits can be compared.
+
+'direct' needs O(N^2 D) memory, so it is skipped above --max-direct
+bodies; 'jit' is skipped if numba is not installed. simulate runs with
+more than --max-interactions pairwise interactions in total are skipped
+to keep the suite at a few minutes for N = 10^4.
+
+Usage:
+    python -m benchmarks.suite [--json results.json] [--sizes 2 100]
+                               [--dims 3] [--methods direct blocked]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import timeit
+import tracemalloc
+import numpy as np
+import nbody
+from nbody import jit
+
+SIZES = [2, 10, 100, 1000, 10000]
+DIMS = [2, 3]
+METHODS = ['direct', 'blocked', 'barneshut', 'jit']
+SIMULATE_STEPS = [10, 100]
+MAX_DIRECT = 2000
+MAX_SIMULATE_INTERACTIONS = 10 ** 9
+
+
+def random_bodies(nbodies, dim, seed=0):
+    """PointMass objects with random masses, positions and velocities
+    (G=1 units)"""
+    rng = np.random.default_rng(seed)
+    return [nbody.PointMass('b' + str(i), rng.uniform(1, 2),
+                            rng.normal(size=dim), rng.normal(size=dim) * 0.1)
+            for i in range(nbodies)]
+
+
+def measure(function):
+    """return the mean run time of function in s and the peak memory
+    of a single call in bytes"""
+    # the first call compiles kernels and starts worker pools
+    function()
+    number, total = timeit.Timer(function).autorange()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return total / number, peak
+
+
+def benchmarks(nbodies, dim, methods, max_interactions):
+    """yield (name, method, function, force evaluations per call) for
+    all benchmarks of a system of nbodies bodies in dim dimensions"""
+    bodies = random_bodies(nbodies, dim)
+    system = nbody.NBodySystem(*bodies)
+    yield 'init', None, lambda: nbody.NBodySystem(*bodies), 0
+    yield 'centre_of_mass', None, system.centre_of_mass, 0
+    yield 'get_body', None, lambda: system.get_body('b0'), 0
+    names = ['b' + str(i) for i in range(0, nbodies, 10)]
+    yield 'select', None, lambda: system.select(names).positions, 0
+    for method in methods:
+        yield ('step_inplace', method,
+               lambda method=method: system.step(1e-3, grav_const=1,
+                                                 method=method), 1)
+        yield ('step_copy', method,
+               lambda method=method: system.step(1e-3, grav_const=1,
+                                                 inplace=False,
+                                                 method=method), 1)
+        for nsteps in SIMULATE_STEPS:
+            if nsteps * nbodies ** 2 > max_interactions:
+                continue
+            yield ('simulate_' + str(nsteps), method,
+                   lambda method=method, end=str(nsteps) + 'ms':
+                       system.simulate(end=end, step='1ms', grav_const=1,
+                                       method=method),
+                   nsteps)
+
+
+def available_methods(nbodies, methods, max_direct):
+    """the methods that can run with nbodies bodies"""
+    return [method for method in methods
+            if not (method == 'direct' and nbodies > max_direct)
+            and not (method == 'jit' and not jit.HAVE_NUMBA)]
+
+
+def environment():
+    """describe the machine and the code that is benchmarked"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit or None,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': jit.HAVE_NUMBA,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()}
+
+
+def run(sizes, dims, methods, max_direct=MAX_DIRECT,
+        max_interactions=MAX_SIMULATE_INTERACTIONS):
+    """run all benchmarks and yield one result dict per benchmark"""
+    for dim in dims:
+        for nbodies in sizes:
+            for name, method, function, evaluations in benchmarks(
+                    nbodies, dim,
+                    available_methods(nbodies, methods, max_direct),
+                    max_interactions):
+                time, peak = measure(function)
+                result = {'benchmark': name,
+                          'method': method,
+                          'bodies': nbodies,
+                          'dim': dim,
+                          'time': time,
+                          'peak_memory': peak}
+                if evaluations:
+                    result['evaluations_per_s'] = evaluations / time
+                    result['interactions_per_s'] = \
+                        evaluations * nbodies * (nbodies - 1) / time
+                yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='the numbers of bodies')
+    parser.add_argument('--dims', type=int, nargs='+', default=DIMS,
+                        help='the numbers of dimensions')
+    parser.add_argument('--methods', nargs='+', default=METHODS,
+                        help='the force backends')
+    parser.add_argument('--max-direct', type=int, default=MAX_DIRECT,
+                        help="the largest system to run 'direct' on")
+    parser.add_argument('--max-interactions', type=float,
+                        default=MAX_SIMULATE_INTERACTIONS,
+                        help='the largest simulate run in interactions')
+    args = parser.parse_args()
+
+    results = []
+    print('{:<15}{:<11}{:>7}{:>5}{:>13}{:>13}{:>15}'.format(
+        'benchmark', 'method', 'bodies', 'dim', 'time [s]', 'peak [B]',
+        'evaluations/s'))
+    for result in run(args.sizes, args.dims, args.methods, args.max_direct,
+                      args.max_interactions):
+        results.append(result)
+        print('{benchmark:<15}{method!s:<11}{bodies:>7}{dim:>5}'
+              '{time:>13.3e}{peak_memory:>13}'.format(**result)
+              + '{:>15.3e}'.format(result.get('evaluations_per_s',
+                                              float('nan'))))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'environment': environment(), 'results': results},
+                      file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
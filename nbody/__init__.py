@@ -1,4 +1,3 @@
-import test
-
 from .pointmass import PointMass
-from .nbodysystem import NBodySystem
\ No newline at end of file
+from .nbodysystem import NBodySystem
+from .ensemble import NBodyEnsemble
@@ -0,0 +1,66 @@
+import numba
+import numpy as np
+
+# the compiled kernels of nbody.jit. This module imports numba, so it is
+# only imported when a kernel is needed.
+
+# see softening.SPLINE_SUPPORT
+SPLINE_SUPPORT = 2.8
+
+
+@numba.njit(inline='always')
+def _force_factor(dist2, eps, spline):
+    """softening.force_factor of a single pair"""
+    if not spline:
+        return 1.0 / ((dist2 + eps * eps) * np.sqrt(dist2 + eps * eps))
+    h = SPLINE_SUPPORT * eps
+    dist = np.sqrt(dist2)
+    if dist >= h:
+        return 1.0 / (dist2 * dist)
+    u = dist / h
+    if u < 0.5:
+        return (32 / 3 + u * u * (32 * u - 38.4)) / h ** 3
+    return (64 / 3 - 48 * u + 38.4 * u * u - 32 / 3 * u ** 3
+            - 1 / (15 * u ** 3)) / h ** 3
+
+
+@numba.njit(parallel=True, cache=True)
+def acceleration_kernel(positions, masses, grav_const, softening, spline,
+                        out):
+    """sum the pull of all bodies on every body in one fused loop"""
+    nbodies, dim = positions.shape
+    for i in numba.prange(nbodies):
+        for k in range(dim):
+            out[i, k] = 0.0
+        for j in range(nbodies):
+            # the self-interaction is skipped
+            if j == i:
+                continue
+            dist2 = 0.0
+            for k in range(dim):
+                diff = positions[i, k] - positions[j, k]
+                dist2 += diff * diff
+            eps = max(softening[i], softening[j])
+            # coincident bodies without softening do not pull
+            if dist2 + eps * eps == 0.0:
+                continue
+            weight = masses[j] * _force_factor(dist2, eps, spline)
+            for k in range(dim):
+                out[i, k] += (positions[i, k] - positions[j, k]) * weight
+        for k in range(dim):
+            out[i, k] *= - grav_const
+
+
+@numba.njit(cache=True)
+def kick_drift_kernel(positions, velocities, masses, dt, grav_const,
+                      softening, spline, nsteps, halfstep, previous):
+    """run nsteps kick-drift steps in place, keeping the positions
+    before the last step in previous"""
+    accelleration = np.empty_like(positions)
+    for step in range(nsteps):
+        acceleration_kernel(positions, masses, grav_const, softening,
+                            spline, accelleration)
+        kick = dt / 2 if halfstep and step == 0 else dt
+        previous[:] = positions
+        velocities += accelleration * kick
+        positions += velocities * dt
@@ -0,0 +1,234 @@
+import numpy as np
+from .softening import force_factor, pair_softening, weighted_sum
+
+
+class BarnesHutTree:
+    """a Barnes-Hut tree (quadtree in 2D, octree in 3D, 2^D-tree in
+    general) over the bodies of a gravitational system
+
+    Every node stores the total mass and the centre of mass of the
+    bodies it contains, so the pull of a distant group of bodies can be
+    approximated by a single point mass. The tree is cheap to build
+    from the array layout of NBodySystem and is meant to be rebuilt
+    every step.
+
+    Attributes
+    ----------
+    positions: np.ndarray
+        the (N, D) positions the tree was built from
+    masses: np.ndarray
+        the (N,) masses the tree was built from
+    centres: np.ndarray
+        the geometric centre of each node
+    half_widths: np.ndarray
+        half the edge length of each (cubic) node
+    node_masses: np.ndarray
+        the total mass contained in each node
+    node_coms: np.ndarray
+        the centre of mass of each node
+    children: list
+        the indices of the child nodes of each node (empty for leaves)
+    leaf_bodies: list
+        the indices of the bodies in each leaf (None for inner nodes)
+
+    Methods
+    -------
+    acceleration(grav_const, theta, softening, kernel)
+        approximate the gravitational acceleration of every body
+    """
+
+    def __init__(self,
+                 positions: np.ndarray,
+                 masses: np.ndarray,
+                 leaf_size=8,
+                 max_depth=32):
+        """
+        Parameters
+        ----------
+        positions: np.ndarray
+            the (N, D) positions of the bodies
+        masses: np.ndarray
+            the (N,) masses of the bodies
+        leaf_size: int, optional
+            the maximum number of bodies in a leaf. Default is 8.
+        max_depth: int, optional
+            the maximum depth of the tree. Nodes at this depth become
+            leaves regardless of their size, which keeps the tree finite
+            if many bodies share the same position. Default is 32.
+        """
+        self.positions = positions
+        self.masses = masses
+        self.leaf_size = leaf_size
+        self.max_depth = max_depth
+        self._dim = positions.shape[1]
+        self._bits = 1 << np.arange(self._dim)
+
+        self.children = []
+        self.leaf_bodies = []
+        centres = []
+        half_widths = []
+        node_masses = []
+        node_coms = []
+        self._nodes = (centres, half_widths, node_masses, node_coms)
+
+        lower = positions.min(axis=0)
+        upper = positions.max(axis=0)
+        half_width = (upper - lower).max() / 2
+        if half_width == 0:
+            half_width = 1.0
+        self._build(np.arange(len(masses)), (lower + upper) / 2,
+                    half_width, 0)
+
+        self.centres = np.array(centres)
+        self.half_widths = np.array(half_widths)
+        self.node_masses = np.array(node_masses)
+        self.node_coms = np.array(node_coms)
+        del self._nodes
+
+    def _build(self, index, centre, half_width, depth):
+        """recursively add the node containing the bodies index and
+        return its node id"""
+        centres, half_widths, node_masses, node_coms = self._nodes
+        node = len(centres)
+        masses = self.masses[index]
+        positions = self.positions[index]
+        total_mass = masses.sum()
+        if total_mass > 0:
+            com = (positions * masses[:, None]).sum(axis=0) / total_mass
+        else:
+            com = centre
+        centres.append(centre)
+        half_widths.append(half_width)
+        node_masses.append(total_mass)
+        node_coms.append(com)
+        self.children.append([])
+        self.leaf_bodies.append(None)
+
+        if len(index) <= self.leaf_size or depth >= self.max_depth:
+            self.leaf_bodies[node] = index
+            return node
+
+        # sort the bodies into the 2^D orthants around the centre
+        orthant = ((positions > centre) * self._bits).sum(axis=1)
+        order = np.argsort(orthant, kind='stable')
+        counts = np.bincount(orthant, minlength=1 << self._dim)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        for k in np.nonzero(counts)[0]:
+            offset = ((k & self._bits) > 0) * 2 - 1
+            child = self._build(index[order[bounds[k]:bounds[k + 1]]],
+                                centre + offset * half_width / 2,
+                                half_width / 2,
+                                depth + 1)
+            self.children[node].append(child)
+        return node
+
+    def acceleration(self, grav_const, theta=0.5, softening=0.0,
+                     kernel='plummer'):
+        """approximate the gravitational acceleration of every body
+
+        The tree is walked for all bodies at once: at every node the
+        bodies for which the node appears small enough (edge length /
+        distance < theta) get the monopole pull of the node, all others
+        descend into its children. Leaves are summed directly.
+
+        Parameters
+        ----------
+        grav_const: float
+            The gravitational constant
+        theta: float, optional
+            The opening angle. theta=0 reproduces the direct sum,
+            larger values are faster and less accurate. Default is 0.5.
+        softening: float or np.ndarray, optional
+            the softening length(s), see forces.direct_acceleration.
+            The pull of a node is softened with the softening length of
+            the target body. Default is 0.
+        kernel: str, optional
+            the softening kernel, see forces.direct_acceleration.
+            Default is 'plummer'.
+
+        Returns
+        -------
+        np.ndarray
+            the (N, D) accelerations
+        """
+        positions = self.positions
+        accelleration = np.zeros(positions.shape, dtype=positions.dtype)
+        stack = [(0, np.arange(len(self.masses)))]
+        while stack:
+            node, targets = stack.pop()
+            target_positions = positions[targets]
+
+            bodies = self.leaf_bodies[node]
+            if bodies is not None:
+                convec = target_positions[:, None, :] - positions[bodies]
+                dist2 = (convec ** 2).sum(axis=2)
+                # targets and bodies are both ascending, so the targets
+                # that are in the leaf are found by a binary search
+                cols = np.searchsorted(bodies, targets).clip(
+                    max=len(bodies) - 1)
+                rows = np.nonzero(bodies[cols] == targets)[0]
+                dist2[rows, cols[rows]] = np.inf
+                factor = force_factor(
+                    dist2, pair_softening(softening, targets, bodies),
+                    kernel)
+                accelleration[targets] += weighted_sum(
+                    'ijk,ij->ik', convec, factor * self.masses[bodies])
+                continue
+
+            convec = target_positions - self.node_coms[node]
+            dist2 = (convec ** 2).sum(axis=1)
+            inside = (np.abs(target_positions - self.centres[node])
+                      <= self.half_widths[node]).all(axis=1)
+            far = (4 * self.half_widths[node] ** 2 < theta ** 2 * dist2) \
+                & ~inside
+            if far.any():
+                far_softening = softening
+                if np.ndim(softening):
+                    far_softening = softening[targets[far]]
+                factor = force_factor(dist2[far], far_softening, kernel)
+                accelleration[targets[far]] += (
+                    convec[far] * (self.node_masses[node] * factor)[:, None])
+            near = targets[~far]
+            if len(near):
+                for child in self.children[node]:
+                    stack.append((child, near))
+
+        return - grav_const * accelleration
+
+
+def barneshut_acceleration(positions: np.ndarray,
+                           masses: np.ndarray,
+                           grav_const: float,
+                           theta=0.5,
+                           leaf_size=8,
+                           softening=0.0,
+                           kernel='plummer'):
+    """calculate the accelerations with a freshly built Barnes-Hut tree
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    theta: float, optional
+        The opening angle. Default is 0.5.
+    leaf_size: int, optional
+        the maximum number of bodies in a leaf. Default is 8.
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    tree = BarnesHutTree(positions, masses, leaf_size=leaf_size)
+    return tree.acceleration(grav_const, theta=theta, softening=softening,
+                             kernel=kernel)
@@ -0,0 +1,372 @@
+import numpy as np
+
+
+def _names_array(names):
+    """return names as a 1D array, keeping str and int names apart
+
+    Names that numpy does not store as one array of str or numbers,
+    e.g. tuples or a mix of str and int, are kept as Python objects.
+    """
+    if isinstance(names, np.ndarray) and names.ndim == 1:
+        return names
+    names = list(names)
+    try:
+        array = np.array(names) if names else np.zeros(0)
+    except ValueError:
+        # e.g. [('a', 1), 'b']
+        array = None
+    # np.array turns e.g. ['a', 1] into ['a', '1'] and tuples into rows
+    if (array is None or array.ndim != 1 or array.dtype.kind not in 'biufUS'
+            or (array.dtype.kind in 'US' and not all(
+                isinstance(name, (str, bytes)) for name in names))):
+        array = np.empty(len(names), dtype=object)
+        for row, name in enumerate(names):
+            array[row] = name
+    return array
+
+
+def swap_remove_plan(rows, size):
+    """plan the removal of rows from arrays of size rows by moving the
+    last rows that are kept into the gaps
+
+    Parameters
+    ----------
+    rows: array_like
+        the rows to remove
+    size: int
+        the number of rows
+
+    Returns
+    -------
+    tuple
+        (holes, tail, new_size): array[holes] = array[tail] followed by
+        array[:new_size] removes rows in O(len(rows)) time
+    """
+    rows = np.unique(np.asarray(rows, dtype=np.intp))
+    new_size = size - len(rows)
+    holes = rows[rows < new_size]
+    # the rows behind new_size that are kept fill the holes
+    tail = np.setdiff1d(np.arange(new_size, size), rows,
+                        assume_unique=True)
+    return holes, tail, new_size
+
+
+class NameIndex:
+    """an array-backed mapping from the names (or integer IDs) of the
+    bodies of a system to their rows
+
+    The names are kept in row order and, for the lookup, sorted with the
+    rows they belong to, so many names are found at once with a binary
+    search (np.searchsorted) and without a loop in Python. Names that
+    can not be sorted, e.g. a mix of str and int, are looked up in a
+    dict instead, which needs a loop in Python. Any hashable name can be
+    used; a tuple passed to rows() is a single name if there is a body
+    of that name.
+
+    Appending and swap-removing names takes time proportional to the
+    number of changed names: the names are stored in a buffer that grows
+    geometrically, and the sorted lookup table is only rebuilt on the
+    next lookup.
+
+    Attributes
+    ----------
+    names: np.ndarray
+        the (N,) names in row order (read-only)
+
+    Methods
+    -------
+    rows(names)
+        return the rows of one or many names
+    append(names)
+        add names for new rows at the end
+    swap_remove(holes, tail, new_size)
+        remove rows, see swap_remove_plan
+    copy()
+        return an independent copy
+    """
+
+    def __init__(self, names):
+        """
+        Parameters
+        ----------
+        names: array_like
+            the N unique names in row order
+
+        Raises
+        ------
+        AttributeError
+            if several bodies have the same name
+        """
+        self._buffer = _names_array(names).copy()
+        self._size = len(self._buffer)
+        self._reset()
+        self._lookup()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return bool(self._find(_names_array([name]))[1][0])
+
+    @property
+    def names(self):
+        names = self._buffer[:self._size]
+        names.flags.writeable = False
+        return names
+
+    def _reset(self):
+        """mark the lookup tables as out of date"""
+        self._sorted = None
+        self._order = None
+        self._mapping = None
+
+    def _lookup(self):
+        """rebuild the lookup tables if they are out of date: the sorted
+        names and their rows, or a dict if the names can not be sorted"""
+        if self._sorted is not None or self._mapping is not None:
+            return
+        names = self._buffer[:self._size]
+        try:
+            order = np.argsort(names, kind='stable')
+        except TypeError:
+            mapping = dict(zip(names.tolist(), range(self._size)))
+            if len(mapping) != self._size:
+                seen = set()
+                for name in names.tolist():
+                    if name in seen:
+                        raise AttributeError("there are several objects "
+                                             "called " + str(name))
+                    seen.add(name)
+            self._mapping = mapping
+            return
+        ordered = names[order]
+        repeated = ordered[1:] == ordered[:-1]
+        if np.any(repeated):
+            raise AttributeError("there are several objects called "
+                                 + str(ordered[1:][repeated][0]))
+        self._sorted, self._order = ordered, order
+
+    def _find(self, query):
+        """return the rows of the names in query and whether they were
+        found"""
+        self._lookup()
+        if self._mapping is not None:
+            rows = np.array([self._mapping.get(name, -1)
+                             for name in query.tolist()], dtype=np.intp)
+            return rows, rows >= 0
+        ordered = self._sorted
+        not_found = (np.zeros(query.shape, dtype=np.intp),
+                     np.zeros(query.shape, dtype=bool))
+        if not len(ordered):
+            return not_found
+        try:
+            position = np.searchsorted(ordered, query)
+            position = np.minimum(position, len(ordered) - 1)
+            found = np.asarray(ordered[position] == query, dtype=bool)
+        except TypeError:
+            return not_found
+        return self._order[position], found.reshape(query.shape)
+
+    def rows(self, names):
+        """return the rows of names
+
+        Parameters
+        ----------
+        names: scalar or array_like
+            a name or an array of names
+
+        Raises
+        ------
+        KeyError
+            if a name is not in the index
+
+        Returns
+        -------
+        int or np.ndarray
+            the row of a single name, or the array of rows of names
+        """
+        scalar = np.ndim(names) == 0 or (isinstance(names, tuple)
+                                         and names in self)
+        query = _names_array([names] if scalar else names)
+        rows, found = self._find(query)
+        if not np.all(found):
+            missing = query[~found].tolist()[0]
+            raise KeyError(missing)
+        return int(rows[0]) if scalar else rows
+
+    def append(self, names):
+        """add the names of new rows at the end
+
+        Parameters
+        ----------
+        names: array_like
+            the new unique names
+
+        Raises
+        ------
+        AttributeError
+            if a name is already in the index or repeated in names
+        """
+        names = _names_array(names)
+        # raises if names repeats a name
+        NameIndex(names)
+        taken = self._find(names)[1]
+        if np.any(taken):
+            raise AttributeError("there are several objects called "
+                                 + str(names[taken].tolist()[0]))
+        size = self._size + len(names)
+        dtype = self._buffer.dtype if self._size else names.dtype
+        numbers = dtype.kind in 'biuf' and names.dtype.kind in 'biuf'
+        if dtype.kind == names.dtype.kind or numbers:
+            dtype = np.result_type(dtype, names.dtype)
+        else:
+            # e.g. int names added to str names
+            dtype = np.dtype(object)
+        if size > len(self._buffer) or dtype != self._buffer.dtype:
+            buffer = np.empty(max(size, 2 * len(self._buffer)), dtype=dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+        self._buffer[self._size:size] = names
+        self._size = size
+        self._reset()
+        self._lookup()
+
+    def swap_remove(self, holes, tail, new_size):
+        """remove rows as planned by swap_remove_plan"""
+        self._buffer[holes] = self._buffer[tail]
+        self._size = new_size
+        self._reset()
+
+    def copy(self):
+        """return an independent copy of the index"""
+        index = NameIndex.__new__(NameIndex)
+        index._buffer = self._buffer[:self._size].copy()
+        index._size = self._size
+        # the lookup tables are replaced, never changed, so they are
+        # shared
+        index._sorted = self._sorted
+        index._order = self._order
+        index._mapping = self._mapping
+        return index
+
+    def to_dict(self):
+        """return the mapping as a dict {name: row}"""
+        return dict(zip(self.names.tolist(), range(self._size)))
+
+
+def _contiguous(rows):
+    """return the slice that selects the same rows as the ascending,
+    gap-free rows, or rows itself if there is no such slice"""
+    if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and (
+            len(rows) == 1 or (np.diff(rows) == 1).all()):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
+
+
+class BodyView:
+    """a live view of some bodies of an NBodySystem
+
+    A BodyView does not hold any state of the bodies itself: positions,
+    velocities and masses are read from the current arrays of the system
+    on every access, so a view stays valid across step(), which replaces
+    the arrays of the system. Assigning to them (also with +=, *= etc.)
+    writes into the arrays of the system.
+
+    The arrays that are returned are zero-copy views of the arrays of the
+    system if the view selects a single body or a contiguous range of
+    rows, and copies otherwise. Views alias the system only until the
+    next step; use copy() for a snapshot that never changes.
+
+    Attributes
+    ----------
+    system: NBodySystem
+        the system the bodies belong to
+    rows: int, slice or np.ndarray
+        the rows of the bodies in the arrays of the system
+    names: object or np.ndarray
+        the name or the names of the bodies
+    positions, velocities: np.ndarray
+        the (D,) or (M, D) positions and velocities
+    masses: float or np.ndarray
+        the mass or the (M,) masses
+
+    Methods
+    -------
+    copy()
+        return the bodies as a new NBodySystem
+    """
+
+    def __init__(self, system, rows):
+        """
+        Parameters
+        ----------
+        system: NBodySystem
+            the system the bodies belong to
+        rows: int or array_like
+            the row or the rows of the bodies
+        """
+        self.system = system
+        if np.ndim(rows) == 0:
+            self.rows = int(rows)
+        else:
+            self.rows = _contiguous(np.asarray(rows, dtype=np.intp))
+
+    def __len__(self):
+        if isinstance(self.rows, int):
+            return 1
+        if isinstance(self.rows, slice):
+            return self.rows.stop - self.rows.start
+        return len(self.rows)
+
+    def __repr__(self):
+        return 'BodyView(' + repr(self.names) + ')'
+
+    @property
+    def names(self):
+        return self.system.name_index.names[self.rows]
+
+    @property
+    def positions(self):
+        return self.system.all_positions[self.rows]
+
+    @positions.setter
+    def positions(self, value):
+        self.system.all_positions[self.rows] = value
+
+    @property
+    def velocities(self):
+        return self.system.all_velocities[self.rows]
+
+    @velocities.setter
+    def velocities(self, value):
+        self.system.all_velocities[self.rows] = value
+
+    @property
+    def masses(self):
+        return self.system.all_masses[self.rows]
+
+    @masses.setter
+    def masses(self, value):
+        self.system.all_masses[self.rows] = value
+
+    def copy(self):
+        """return the bodies as a new NBodySystem with copies of their
+        arrays, at the time and phase of the system
+
+        Returns
+        -------
+        NBodySystem
+            the selected bodies
+        """
+        rows = self.rows
+        if isinstance(rows, int):
+            rows = slice(rows, rows + 1)
+        system = type(self.system)(
+            self.system.all_positions[rows].copy(),
+            self.system.all_velocities[rows].copy(),
+            self.system.all_masses[rows].copy(),
+            NameIndex(self.system.name_index.names[rows]),
+            not_yet_initialized=False)
+        system.time = self.system.time
+        system.staggered = self.system.staggered
+        return system
@@ -0,0 +1,143 @@
+import warnings
+import numpy as np
+
+
+def _column(name):
+    """a property that returns the records of name as an array"""
+    return property(lambda self: np.array(self._records[name]))
+
+
+class DiagnosticsLog:
+    """record the conserved quantities of a system while it is simulated
+
+    Pass a DiagnosticsLog to NBodySystem.simulate or iter_simulate to
+    record NBodySystem.conserved_quantities at the start, every `every`
+    and after the last step. If max_energy_drift is given and the
+    relative drift of the total energy from the first record exceeds it,
+    a RuntimeWarning is issued, aborted is set and the simulation stops
+    early. The conserved quantities are those of isolated bodies, so
+    the periodic box of method='pm' raises a ValueError.
+
+    Attributes
+    ----------
+    every: pd.Timedelta or None
+        the interval between records
+    max_energy_drift: float or None
+        the largest tolerated relative energy drift
+    aborted: bool
+        True if a simulation was stopped because of the energy drift
+    times: np.ndarray
+        the (records,) simulation times in s
+    kinetic, potential, energy, virial_ratio: np.ndarray
+        the (records,) kinetic, potential and total energies and
+        virial ratios
+    momentum: np.ndarray
+        the (records, D) momenta
+    angular_momentum: np.ndarray
+        the angular momenta, see NBodySystem.angular_momentum
+
+    Methods
+    -------
+    record(system, grav_const, dt, method, options)
+        append the current state of system
+    energy_drift()
+        the relative drift of the total energy of the last record
+    to_frame()
+        return the records as a pandas.DataFrame
+    """
+
+    _QUANTITIES = ('kinetic', 'potential', 'energy', 'momentum',
+                   'angular_momentum', 'virial_ratio')
+
+    def __init__(self, every=None, max_energy_drift=None):
+        """
+        Parameters
+        ----------
+        every: pd.Timedelta, optional
+            the interval between records, rounded up to a whole number
+            of steps. Default is to record only the start and the end.
+        max_energy_drift: float, optional
+            stop the simulation when |E - E0| / |E0| exceeds this
+        """
+        self.every = every
+        self.max_energy_drift = max_energy_drift
+        self.aborted = False
+        self._times = []
+        self._records = {name: [] for name in self._QUANTITIES}
+
+    def __len__(self):
+        return len(self._times)
+
+    @property
+    def times(self):
+        return np.array(self._times)
+
+    kinetic = _column('kinetic')
+    potential = _column('potential')
+    energy = _column('energy')
+    momentum = _column('momentum')
+    angular_momentum = _column('angular_momentum')
+    virial_ratio = _column('virial_ratio')
+
+    def record(self, system, grav_const, dt=None, method='direct',
+               options=None):
+        """append the conserved quantities of the current state of
+        system and check the energy drift
+
+        Parameters
+        ----------
+        system: NBodySystem
+            the system
+        grav_const: float
+            The gravitational constant
+        dt: float, optional
+            the timestep, to synchronize staggered velocities
+        method: str, optional
+            the force backend, see NBodySystem.conserved_quantities
+        options: dict, optional
+            the options of the force backend
+
+        Returns
+        -------
+        bool
+            False if the energy drift exceeds max_energy_drift
+        """
+        quantities = system.conserved_quantities(grav_const, dt, method,
+                                                 **(options or {}))
+        self._times.append(system.time)
+        for name in self._QUANTITIES:
+            self._records[name].append(quantities[name])
+        drift = self.energy_drift()
+        if self.max_energy_drift is not None and drift > self.max_energy_drift:
+            warnings.warn("relative energy drift {:.3e} exceeds {:.3e} at "
+                          "t = {} s, stopping the simulation".format(
+                              drift, self.max_energy_drift, system.time),
+                          RuntimeWarning, stacklevel=2)
+            self.aborted = True
+            return False
+        return True
+
+    def energy_drift(self):
+        """return |E - E0| / |E0| for the last record, with E0 the
+        energy of the first record"""
+        energy = self._records['energy']
+        if not energy:
+            return 0.0
+        if energy[0] == 0:
+            return abs(energy[-1])
+        return abs((energy[-1] - energy[0]) / energy[0])
+
+    def to_frame(self):
+        """return the records as a pandas.DataFrame indexed by the time,
+        with one column per component of the vector quantities"""
+        import pandas as pd
+        columns = {}
+        for name in self._QUANTITIES:
+            values = getattr(self, name).reshape((len(self), -1))
+            if values.shape[1] == 1:
+                columns[name] = values[:, 0]
+            else:
+                for i in range(values.shape[1]):
+                    columns[name + str(i + 1)] = values[:, i]
+        return pd.DataFrame(columns,
+                            index=pd.to_timedelta(self.times, unit='s'))
@@ -0,0 +1,213 @@
+import numpy as np
+from .nbodysystem import NBodySystem, gravitational_constant
+from .softening import check_kernel, force_factor, weighted_sum
+
+
+class NBodyEnsemble:
+    """many independent gravitational systems that are advanced together
+
+    The B member systems are stacked into (B, N, D) arrays, so a single
+    vectorized step advances all of them. Members with fewer than N
+    bodies are padded with massless bodies that are held in place; mask
+    tells the real bodies from the padding.
+
+    Attributes
+    ----------
+    all_positions: np.ndarray
+        the (B, N, D) positions of all members
+    all_velocities: np.ndarray
+        the (B, N, D) velocities of all members
+    all_masses: np.ndarray
+        the (B, N) masses of all members (0 for padding)
+    mask: np.ndarray
+        (B, N) boolean array, True for real bodies
+    bodyindices: list
+        the bodyindex dictionary of every member
+
+    Methods
+    -------
+    step(dt)
+        run the simulation of all members one timestep
+    simulate(end, step)
+        run the simulation of all members and return their trajectories
+    member(i)
+        return the current state of member i as an NBodySystem
+    """
+
+    def __init__(self, *systems, memory_budget=2 ** 27):
+        """
+        Parameters
+        ----------
+        systems: NBodySystem
+            the members. All of them must have the same number of
+            spatial dimensions.
+        memory_budget: int, optional
+            the approximate number of bytes the temporaries of step may
+            use; the members are processed in chunks that fit into it.
+            Default is 2**27 (128 MiB).
+        """
+        dims = {system.all_positions.shape[1] for system in systems}
+        if len(dims) != 1:
+            raise ValueError("all systems must have the same dimension")
+        nbodies = max(len(system.all_masses) for system in systems)
+        shape = (len(systems), nbodies, dims.pop())
+
+        self.all_positions = np.zeros(shape)
+        self.all_velocities = np.zeros(shape)
+        self.all_masses = np.zeros(shape[:2])
+        self.mask = np.zeros(shape[:2], dtype=bool)
+        self.bodyindices = []
+        for i, system in enumerate(systems):
+            n = len(system.all_masses)
+            self.all_positions[i, :n] = system.all_positions
+            self.all_velocities[i, :n] = system.all_velocities
+            self.all_masses[i, :n] = system.all_masses
+            self.mask[i, :n] = True
+            self.bodyindices.append(dict(system.bodyindex))
+        self.memory_budget = memory_budget
+
+    def _acceleration(self, grav_const, softening=0.0, kernel='plummer'):
+        """calculate the accelerations of all bodies of all members"""
+        check_kernel(kernel)
+        nmembers, nbodies, dim = self.all_positions.shape
+        # the pair temporaries of a member use about (dim + 3) N^2 floats
+        chunk = self.memory_budget // (8 * nbodies ** 2 * (dim + 3))
+        chunk = max(int(chunk), 1)
+        counts = self.mask.sum(axis=1)
+        diagonal = np.arange(nbodies)
+
+        accelleration = np.empty(self.all_positions.shape)
+        for i in range(0, nmembers, chunk):
+            positions = self.all_positions[i:i + chunk]
+            convec = positions[:, :, None, :] - positions[:, None, :, :]
+            dist2 = (convec ** 2).sum(axis=3)
+            # a body does not pull itself and the padding pulls nobody,
+            # so these pairs are moved to infinity instead of masking
+            # all pairs
+            dist2[:, diagonal, diagonal] = np.inf
+            for member, count in enumerate(counts[i:i + chunk]):
+                dist2[member, :, count:] = np.inf
+            if np.ndim(softening):
+                lengths = softening[i:i + chunk]
+                pair = np.maximum(lengths[:, :, None], lengths[:, None, :])
+            else:
+                pair = softening
+            weights = (self.all_masses[i:i + chunk, None, :]
+                       * force_factor(dist2, pair, kernel))
+            accelleration[i:i + chunk] = - grav_const * weighted_sum(
+                'bijk,bij->bik', convec, weights)
+        # the padding stays where it is
+        accelleration *= self.mask[:, :, None]
+        return accelleration
+
+    def step(self,
+             dt,
+             grav_const=gravitational_constant,
+             halfstep=False,
+             softening=0.0,
+             kernel='plummer'):
+        """advance all members by dt with the kick-drift scheme of
+        NBodySystem.step
+
+        Parameters
+        ----------
+        dt: float
+            The timestep on which the simulation operates
+        grav_const: float, optional
+            The gravitational constant. Default is the newtonian
+            gravitational constant.
+        halfstep: bool, optional
+            update the velocities with a step of dt/2, see
+            NBodySystem.step. Default is False.
+        softening: float or np.ndarray, optional
+            a softening length or the (B, N) softening lengths of the
+            bodies (a pair uses the larger one), see
+            forces.direct_acceleration. Default is 0.
+        kernel: str, optional
+            the softening kernel, 'plummer' or 'spline'. Default is
+            'plummer'.
+        """
+        accelleration = self._acceleration(grav_const, softening, kernel)
+        if halfstep:
+            self.all_velocities = self.all_velocities + accelleration * dt/2
+        else:
+            self.all_velocities = self.all_velocities + accelleration * dt
+        self.all_positions = self.all_positions + self.all_velocities * dt
+
+    def simulate(self,
+                 end,
+                 step,
+                 start='0s',
+                 grav_const=gravitational_constant,
+                 halfstep=True,
+                 stride=1,
+                 softening=0.0,
+                 kernel='plummer'):
+        """simulate the evolution of all members over time.
+        Note: after using simulate() self will be in the final state.
+
+        Parameters
+        ----------
+        end: pd.Timedelta
+            The time at which the simulation terminates
+        step: pd.Timedelta
+            The timestep of each iteration
+        start: pd.Timedelta, optional
+            The time at the beginning of the simulation.
+            Default is '0s'
+        grav_const: float, optional
+            the gravitational constant. Default is the Newtonian
+            gravitational constant
+        halfstep: bool, optional
+            if halfstep=True the first iteration of the simulation will
+            use a halfstep for the velocities, see NBodySystem.step
+        stride: int, optional
+            record the positions every stride steps. Default is 1.
+        softening: float or np.ndarray, optional
+            the softening length(s), see step(). Default is 0.
+        kernel: str, optional
+            the softening kernel, see step(). Default is 'plummer'.
+
+        Returns
+        -------
+        tuple
+            (times, trajectories) with the (frames,) times in s and a
+            list that holds the (frames, N_i, D) positions of every
+            member i (views into a single array)
+        """
+        start, dt, nsteps, output_times = NBodySystem._output_times(
+            end, step, start, stride, None, None)
+        results = np.empty((len(self.mask),) + (len(output_times),)
+                           + self.all_positions.shape[1:])
+
+        for i in range(nsteps + 1):
+            if i % stride == 0:
+                results[:, i // stride] = self.all_positions
+            if i < nsteps:
+                self.step(dt * 1e-9, grav_const=grav_const,
+                          halfstep=halfstep and i == 0,
+                          softening=softening, kernel=kernel)
+
+        trajectories = [results[i, :, :len(bodyindex)]
+                        for i, bodyindex in enumerate(self.bodyindices)]
+        return output_times * 1e-9, trajectories
+
+    def member(self, i: int):
+        """return the current state of member i
+
+        Parameters
+        ----------
+        i: int
+            the index of the member
+
+        Returns
+        -------
+        NBodySystem
+            a copy of the current state of member i
+        """
+        n = len(self.bodyindices[i])
+        return NBodySystem(self.all_positions[i, :n].copy(),
+                           self.all_velocities[i, :n].copy(),
+                           self.all_masses[i, :n].copy(),
+                           dict(self.bodyindices[i]),
+                           not_yet_initialized=False)
@@ -0,0 +1,177 @@
+import numpy as np
+
+
+def _groups(positions, capture_radius):
+    """return the rows of the bodies that are closer than capture_radius
+    to another body and the label of the group each of them belongs to
+    (bodies that are linked by a chain of close pairs form one group)"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.spatial import cKDTree
+    pairs = cKDTree(positions).query_pairs(capture_radius,
+                                           output_type='ndarray')
+    if not len(pairs):
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    members, local = np.unique(pairs, return_inverse=True)
+    local = local.reshape(pairs.shape)
+    graph = coo_matrix((np.ones(len(local)), (local[:, 0], local[:, 1])),
+                       shape=(len(members), len(members)))
+    labels = connected_components(graph, directed=False)[1]
+    return members, labels
+
+
+class BodyEvents:
+    """merge colliding bodies and remove escaping bodies during a
+    simulation
+
+    Pass a BodyEvents to NBodySystem.step, simulate or iter_simulate.
+    After every step, all bodies closer than capture_radius to each
+    other (also via a chain of close pairs) are merged into the most
+    massive of them, which gets their total mass, centre of mass and
+    total momentum. Then all bodies farther than escape_radius from the
+    centre of mass whose kinetic energy relative to the centre of mass
+    exceeds the potential energy of the remaining mass (as a point mass
+    at the centre of mass) are removed. Removed rows are filled with the
+    last rows of the arrays (swap-remove), so every event takes time
+    proportional to the number of bodies it changes.
+
+    Merges conserve mass and momentum, but not energy; escapers take
+    their mass, momentum and energy with them, so DiagnosticsLog shows
+    jumps at these events.
+
+    Attributes
+    ----------
+    capture_radius: float or None
+        the distance below which bodies merge
+    escape_radius: float or None
+        the distance from the centre of mass beyond which unbound bodies
+        are removed
+    merges: list
+        (time, survivor, absorbed) for every merger, with the simulation
+        time in s, the name of the surviving body and the list of the
+        names of the bodies it absorbed
+    escapes: list
+        (time, name) for every removed body
+    source: np.ndarray or None
+        after a step that changed the bodies, the row every body had
+        before the step (merged bodies keep the row of the survivor);
+        None after a step without events
+
+    Methods
+    -------
+    apply(system, grav_const)
+        merge and remove the bodies of system
+    to_frame()
+        return the events as a pandas.DataFrame
+    """
+
+    def __init__(self, capture_radius=None, escape_radius=None):
+        """
+        Parameters
+        ----------
+        capture_radius: float, optional
+            merge bodies that are closer than this. Default is to never
+            merge bodies.
+        escape_radius: float, optional
+            remove unbound bodies farther than this from the centre of
+            mass. Default is to never remove bodies.
+        """
+        self.capture_radius = capture_radius
+        self.escape_radius = escape_radius
+        self.merges = []
+        self.escapes = []
+        self.source = None
+
+    def __len__(self):
+        return len(self.merges) + len(self.escapes)
+
+    def apply(self, system, grav_const):
+        """merge the colliding bodies of system and remove its escapers
+
+        Parameters
+        ----------
+        system: NBodySystem
+            the system, changed in place
+        grav_const: float
+            The gravitational constant
+
+        Returns
+        -------
+        np.ndarray or None
+            source, see the attribute
+        """
+        source = None
+        if self.capture_radius is not None:
+            source = self._merge(system)
+        if self.escape_radius is not None:
+            escaped = self._escape(system, grav_const)
+            if escaped is not None:
+                source = escaped if source is None else source[escaped]
+        self.source = source
+        return source
+
+    def _merge(self, system):
+        members, labels = _groups(system.all_positions, self.capture_radius)
+        if not len(members):
+            return None
+        masses = system.all_masses[members]
+        # the most massive member of every group survives
+        order = np.lexsort((members, -masses, labels))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = labels[order][1:] != labels[order][:-1]
+        survivors = members[order[first]]
+        absorbed = members[order[~first]]
+
+        total = np.bincount(labels, weights=masses)
+        weights = masses[:, None]
+        dim = system.all_positions.shape[1]
+        moments = np.zeros((len(total), dim))
+        momenta = np.zeros((len(total), dim))
+        np.add.at(moments, labels, weights * system.all_positions[members])
+        np.add.at(momenta, labels, weights * system.all_velocities[members])
+        positions = system.all_positions[survivors]
+        velocities = system.all_velocities[survivors]
+        massive = total > 0
+        positions[massive] = moments[massive] / total[massive, None]
+        velocities[massive] = momenta[massive] / total[massive, None]
+        system._set_rows(survivors, positions, velocities, total)
+
+        names = system.name_index.names
+        group_of = labels[order[~first]]
+        for label, survivor in enumerate(names[survivors].tolist()):
+            self.merges.append((system.time, survivor,
+                                names[absorbed[group_of == label]].tolist()))
+        return system._remove_rows(absorbed)
+
+    def _escape(self, system, grav_const):
+        masses = system.all_masses
+        total = masses.sum()
+        if total <= 0:
+            return None
+        offsets = system.all_positions - masses @ system.all_positions / total
+        relative = (system.all_velocities
+                    - masses @ system.all_velocities / total)
+        dist = np.sqrt((offsets ** 2).sum(axis=1))
+        far = np.nonzero(dist > self.escape_radius)[0]
+        energy = (0.5 * (relative[far] ** 2).sum(axis=1)
+                  - grav_const * (total - masses[far]) / dist[far])
+        escaping = far[energy > 0]
+        if not len(escaping):
+            return None
+        for name in system.name_index.names[escaping].tolist():
+            self.escapes.append((system.time, name))
+        return system._remove_rows(escaping)
+
+    def to_frame(self):
+        """return the events as a pandas.DataFrame with the columns
+        time (in s), event ('merge' or 'escape'), name and absorbed (the
+        list of absorbed names of a merger), ordered by time"""
+        import pandas as pd
+        rows = ([(time, 'merge', name, absorbed)
+                 for time, name, absorbed in self.merges]
+                + [(time, 'escape', name, [])
+                   for time, name in self.escapes])
+        frame = pd.DataFrame(rows, columns=['time', 'event', 'name',
+                                            'absorbed'])
+        return frame.sort_values('time', kind='stable').reset_index(
+            drop=True)
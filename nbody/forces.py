@@ -0,0 +1,418 @@
+import numpy as np
+from .barneshut import barneshut_acceleration
+from .parallel import parallel_acceleration
+from .particlemesh import pm_acceleration
+from . import jit
+from .jit import jit_acceleration
+from .softening import force_factor, potential_factor, pair_softening
+from .softening import weighted_sum
+
+
+def direct_acceleration(positions: np.ndarray,
+                        masses: np.ndarray,
+                        grav_const: float,
+                        softening=0.0,
+                        kernel='plummer'):
+    """calculate the accelerations by direct summation over all pairs
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    softening: float or np.ndarray, optional
+        the softening length of all bodies or the (N,) softening
+        lengths of the bodies (a pair uses the larger one).
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, 'plummer' or 'spline', see
+        softening.force_factor. Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    # calculate connection vector map and squared distance map
+    diagonal = np.arange(len(masses))
+    convec_map, dist2_map = _pair_block(positions, positions,
+                                        (diagonal, diagonal))
+
+    # calculate acceleration
+    factor = force_factor(dist2_map,
+                          pair_softening(softening, diagonal, diagonal),
+                          kernel)
+    mx = weighted_sum('ijk,ij->ik', convec_map, factor * masses[None, :])
+    accelleration = - grav_const * mx
+    return accelleration
+
+
+def _block_size(dim, memory_budget):
+    """the number of bodies per block so that the temporaries of a
+    block pair fit into memory_budget bytes"""
+    # a block pair needs about (dim + 3) float64 arrays of block**2 items
+    return max(int(np.sqrt(memory_budget / (8 * (dim + 3)))), 1)
+
+
+def _pair_block(pos_i, pos_j, self_pairs=None):
+    """return the connection vectors and the squared distances between
+    the bodies at pos_i and the bodies at pos_j
+
+    self_pairs are the (row, column) indices of the pairs of a body with
+    itself. Their distance is set to infinity, so they drop out of the
+    sums without a pass over all pairs.
+    """
+    convec = pos_i[:, None, :] - pos_j[None, :, :]
+    dist2 = (convec ** 2).sum(axis=2)
+    if self_pairs is not None:
+        dist2[self_pairs] = np.inf
+    return convec, dist2
+
+
+def _self_pairs(rows, start, stop):
+    """the self_pairs of _pair_block for the bodies rows (an index array)
+    and the bodies start:stop"""
+    inside = np.nonzero((rows >= start) & (rows < stop))[0]
+    return inside, rows[inside] - start
+
+
+def blocked_acceleration(positions: np.ndarray,
+                         masses: np.ndarray,
+                         grav_const: float,
+                         memory_budget=2 ** 27,
+                         softening=0.0,
+                         kernel='plummer'):
+    """calculate the accelerations by direct summation in tiles
+
+    The bodies are split into blocks that are small enough for the
+    temporaries of a block pair to fit into memory_budget. Every pair
+    of blocks is evaluated once and, following Newton's third law,
+    contributes to the accelerations of both blocks, so only half of
+    the pairs have to be computed. The peak memory is O(N * block)
+    instead of the O(N^2 * D) of direct_acceleration.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    memory_budget: int, optional
+        the approximate number of bytes the temporaries of a single
+        block pair may use. Default is 2**27 (128 MiB).
+    softening: float or np.ndarray, optional
+        the softening length(s), see direct_acceleration. Default is 0.
+    kernel: str, optional
+        the softening kernel, see direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    nbodies, dim = positions.shape
+    block = _block_size(dim, memory_budget)
+
+    accelleration = np.zeros(positions.shape, dtype=positions.dtype)
+    for i in range(0, nbodies, block):
+        rows = slice(i, i + block)
+        for j in range(i, nbodies, block):
+            cols = slice(j, j + block)
+            self_pairs = None
+            if j == i:
+                diagonal = np.arange(len(masses[rows]))
+                self_pairs = (diagonal, diagonal)
+            convec, dist2 = _pair_block(positions[rows], positions[cols],
+                                        self_pairs)
+            factor = force_factor(dist2,
+                                  pair_softening(softening, rows, cols),
+                                  kernel)
+            accelleration[rows] += weighted_sum(
+                'ijk,ij->ik', convec, factor * masses[None, cols])
+            if j != i:
+                accelleration[cols] -= weighted_sum(
+                    'ijk,ij->jk', convec, factor * masses[rows, None])
+    return - grav_const * accelleration
+
+
+def target_acceleration(positions: np.ndarray,
+                        masses: np.ndarray,
+                        grav_const: float,
+                        targets,
+                        memory_budget=2 ** 27,
+                        softening=0.0,
+                        kernel='plummer'):
+    """calculate the accelerations of some bodies caused by all bodies
+
+    Like blocked_acceleration, but only for the bodies selected by
+    targets and without the symmetric pair evaluation, so the result of
+    every target does not depend on which other bodies are targets.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    targets: slice or np.ndarray
+        selects the rows of positions to calculate the acceleration of
+    memory_budget: int, optional
+        the approximate number of bytes the temporaries of a single
+        block pair may use. Default is 2**27 (128 MiB).
+    softening: float or np.ndarray, optional
+        the softening length(s), see direct_acceleration. Default is 0.
+    kernel: str, optional
+        the softening kernel, see direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        the (T, D) accelerations of the T selected bodies
+    """
+    nbodies, dim = positions.shape
+    index = np.arange(nbodies)[targets]
+    target_positions = positions[index]
+    block = _block_size(dim, memory_budget)
+
+    accelleration = np.zeros(target_positions.shape,
+                             dtype=positions.dtype)
+    for i in range(0, len(index), block):
+        rows = index[i:i + block]
+        for j in range(0, nbodies, block):
+            cols = slice(j, j + block)
+            convec, dist2 = _pair_block(target_positions[i:i + block],
+                                        positions[cols],
+                                        _self_pairs(rows, j, j + block))
+            factor = force_factor(dist2,
+                                  pair_softening(softening, rows, cols),
+                                  kernel)
+            accelleration[i:i + block] += weighted_sum(
+                'ijk,ij->ik', convec, factor * masses[None, cols])
+    return - grav_const * accelleration
+
+
+def potential_energy(positions: np.ndarray,
+                     masses: np.ndarray,
+                     grav_const: float,
+                     memory_budget=2 ** 27,
+                     softening=0.0,
+                     kernel='plummer'):
+    """calculate the total potential energy by direct summation over all
+    pairs in tiles
+
+    Every pair is counted once; coincident bodies without softening are
+    skipped, like in the force backends.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    memory_budget: int, optional
+        the approximate number of bytes the temporaries of a single
+        block pair may use. Default is 2**27 (128 MiB).
+    softening: float or np.ndarray, optional
+        the softening length(s), see direct_acceleration. Default is 0.
+    kernel: str, optional
+        the softening kernel, see direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    float
+        the potential energy
+    """
+    nbodies, dim = positions.shape
+    block = _block_size(dim, memory_budget)
+
+    energy = 0.0
+    for i in range(0, nbodies, block):
+        rows = slice(i, i + block)
+        for j in range(i, nbodies, block):
+            cols = slice(j, j + block)
+            dist2 = _pair_block(positions[rows], positions[cols])[1]
+            pairs = (masses[rows, None] * masses[None, cols]
+                     * potential_factor(dist2,
+                                        pair_softening(softening, rows,
+                                                       cols),
+                                        kernel))
+            if j == i:
+                # only the pairs above the diagonal of a diagonal block
+                pairs = np.triu(pairs, 1)
+            # coincident bodies without softening add nothing
+            energy += pairs[np.isfinite(pairs)].sum()
+    return - grav_const * energy
+
+
+def acceleration_jerk(positions: np.ndarray,
+                      velocities: np.ndarray,
+                      masses: np.ndarray,
+                      grav_const: float,
+                      memory_budget=2 ** 27,
+                      targets=slice(None),
+                      softening=0.0,
+                      kernel='plummer'):
+    """calculate the accelerations and their time derivatives (jerks)
+    by direct summation in tiles
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    memory_budget: int, optional
+        the approximate number of bytes the temporaries of a single
+        block pair may use. Default is 2**27 (128 MiB).
+    targets: slice or np.ndarray, optional
+        selects the bodies to calculate the acceleration and jerk of.
+        Default is all bodies.
+    softening: float or np.ndarray, optional
+        the softening length(s), see direct_acceleration. Default is 0.
+    kernel: str, optional
+        the softening kernel, see direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    tuple
+        (accelleration, jerk), both (T, D) arrays for the T selected
+        bodies
+    """
+    nbodies, dim = positions.shape
+    index = np.arange(nbodies)[targets]
+    target_positions = positions[index]
+    target_velocities = velocities[index]
+    # the jerk needs a few more temporaries than the acceleration
+    block = _block_size(2 * dim, memory_budget)
+
+    accelleration = np.zeros(target_positions.shape,
+                             dtype=positions.dtype)
+    jerk = np.zeros(target_positions.shape, dtype=positions.dtype)
+    for i in range(0, len(index), block):
+        rows = index[i:i + block]
+        for j in range(0, nbodies, block):
+            cols = slice(j, j + block)
+            convec, dist2 = _pair_block(target_positions[i:i + block],
+                                        positions[cols],
+                                        _self_pairs(rows, j, j + block))
+            relvel = (target_velocities[i:i + block, None]
+                      - velocities[None, cols])
+            factor, slope = force_factor(
+                dist2, pair_softening(softening, rows, cols), kernel,
+                derivative=True)
+            m_factor = factor * masses[None, cols]
+            # d/dt (r f(r)) = v f(r) + r (r.v) f'(r) / r
+            m_slope_rv = (slope * masses[None, cols]
+                          * (convec * relvel).sum(axis=2))
+            accelleration[i:i + block] += weighted_sum('ijk,ij->ik', convec,
+                                                       m_factor)
+            jerk[i:i + block] += (weighted_sum('ijk,ij->ik', relvel,
+                                               m_factor)
+                                  + weighted_sum('ijk,ij->ik', convec,
+                                                 m_slope_rv))
+    return - grav_const * accelleration, - grav_const * jerk
+
+
+# the force backends that can be selected with the method parameter
+# of NBodySystem.step and NBodySystem.simulate
+FORCE_METHODS = {'direct': direct_acceleration,
+                 'blocked': blocked_acceleration,
+                 'parallel': parallel_acceleration,
+                 'jit': jit_acceleration,
+                 'barneshut': barneshut_acceleration,
+                 'pm': pm_acceleration}
+
+
+def resolve_method(method):
+    """return the force backend that method stands for: 'auto' is
+    'jit' if numba is installed and 'direct' otherwise"""
+    if method == 'auto':
+        return 'jit' if jit.HAVE_NUMBA else 'direct'
+    return method
+
+
+def acceleration(positions: np.ndarray,
+                 masses: np.ndarray,
+                 grav_const: float,
+                 method='direct',
+                 profiler=None,
+                 dtype=None,
+                 **options):
+    """calculate the accelerations with the force backend method
+
+    All backends evaluate the forces in the floating point type of
+    positions (the process pool of 'parallel' and the mesh of 'pm'
+    always use float64, the result is converted back).
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    method: str, optional
+        the name of the force backend in FORCE_METHODS, or 'auto' for
+        the compiled backend 'jit' if numba is installed and 'direct'
+        otherwise. Default is 'direct'.
+    profiler: profiling.Profiler, optional
+        adds the time of the backend to the phase 'forces' and counts
+        the evaluation and its interactions
+    dtype: np.dtype, optional
+        evaluate the forces in this floating point type and return them
+        in the type of positions, e.g. np.float32 with float64 positions
+        for mixed precision: the pairwise temporaries take half the
+        memory while the positions are still accumulated in float64.
+        Default is the type of positions.
+    options:
+        passed on to the force backend, e.g. memory_budget for
+        'blocked', workers for 'parallel', theta for 'barneshut' or
+        box_size for 'pm'
+
+    Raises
+    ------
+    ValueError
+        if there is no force backend called method
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    method = resolve_method(method)
+    if method not in FORCE_METHODS:
+        raise ValueError("unknown force method " + repr(method)
+                         + ", choose one of " + ", ".join(FORCE_METHODS))
+    if dtype is not None and np.dtype(dtype) != positions.dtype:
+        storage = positions.dtype
+        accelleration = acceleration(positions.astype(dtype),
+                                     masses.astype(dtype), grav_const,
+                                     method, profiler, **options)
+        return accelleration.astype(storage)
+    if profiler is None:
+        return FORCE_METHODS[method](positions, masses, grav_const,
+                                     **options)
+    with profiler.phase('forces'):
+        accelleration = FORCE_METHODS[method](positions, masses, grav_const,
+                                              **options)
+    profiler.count('force_evaluations')
+    profiler.count('interactions', len(masses) * (len(masses) - 1))
+    return accelleration
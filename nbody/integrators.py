@@ -0,0 +1,443 @@
+import numpy as np
+from .forces import acceleration, acceleration_jerk
+
+
+def _require_direct(method, integrator):
+    if method not in ('direct', 'auto'):
+        raise ValueError("the " + integrator + " integrator only supports "
+                         "method='direct'")
+
+
+def _acceleration_jerk(positions, velocities, masses, grav_const,
+                       memory_budget, targets=slice(None), profiler=None,
+                       softening=0.0, kernel='plummer', dtype=None):
+    """forces.acceleration_jerk, timed and counted by profiler and
+    evaluated in the floating point type dtype"""
+    if dtype is not None and np.dtype(dtype) != positions.dtype:
+        forces = _acceleration_jerk(positions.astype(dtype),
+                                    velocities.astype(dtype),
+                                    masses.astype(dtype), grav_const,
+                                    memory_budget, targets, profiler,
+                                    softening, kernel)
+        return tuple(array.astype(positions.dtype) for array in forces)
+    if profiler is None:
+        return acceleration_jerk(positions, velocities, masses, grav_const,
+                                 memory_budget, targets, softening, kernel)
+    with profiler.phase('forces'):
+        forces = acceleration_jerk(positions, velocities, masses,
+                                   grav_const, memory_budget, targets,
+                                   softening, kernel)
+    profiler.count('force_evaluations')
+    profiler.count('interactions', len(forces[0]) * (len(masses) - 1))
+    return forces
+
+
+def kick_drift_step(positions: np.ndarray,
+                    velocities: np.ndarray,
+                    masses: np.ndarray,
+                    dt: float,
+                    grav_const: float,
+                    halfstep=False,
+                    method='direct',
+                    forces=None,
+                    **options):
+    """advance the bodies by dt with a kick followed by a drift
+
+    If the velocities lag half a step behind the positions, this is the
+    leapfrog scheme. Use halfstep=True in the first step to move the
+    velocities of a synchronized state half a step back.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    dt: float
+        the timestep
+    grav_const: float
+        The gravitational constant
+    halfstep: bool, optional
+        kick the velocities by dt/2 instead of dt. Default is False.
+    method: str, optional
+        The force backend, see forces.acceleration. Default is 'direct'.
+    forces: optional
+        not used
+    options:
+        passed on to the force backend
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, None) after dt has elapsed
+    """
+    accelleration = acceleration(positions, masses, grav_const,
+                                 method=method, **options)
+    if halfstep:
+        velocities = velocities + accelleration * dt/2
+    else:
+        velocities = velocities + accelleration * dt
+    positions = positions + velocities * dt
+    return positions, velocities, None
+
+
+def kdk_step(positions: np.ndarray,
+             velocities: np.ndarray,
+             masses: np.ndarray,
+             dt: float,
+             grav_const: float,
+             method='direct',
+             forces=None,
+             **options):
+    """advance the bodies by dt with the synchronized kick-drift-kick
+    leapfrog (velocity Verlet)
+
+    The acceleration at the end of the step is returned, so the next
+    step can start with it and needs only one force evaluation.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    dt: float
+        the timestep
+    grav_const: float
+        The gravitational constant
+    method: str, optional
+        The force backend, see forces.acceleration. Default is 'direct'.
+    forces: np.ndarray, optional
+        the accelerations at positions, if they are already known
+    options:
+        passed on to the force backend
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, accelleration) after dt has elapsed
+    """
+    if forces is None:
+        forces = acceleration(positions, masses, grav_const,
+                              method=method, **options)
+    velocities = velocities + forces * dt/2
+    positions = positions + velocities * dt
+    accelleration = acceleration(positions, masses, grav_const,
+                                 method=method, **options)
+    velocities = velocities + accelleration * dt/2
+    return positions, velocities, accelleration
+
+
+def _composition(positions, velocities, masses, dt, grav_const, weights,
+                 method, options):
+    """apply drift-kick-drift leapfrog steps of weights * dt in turn"""
+    for weight in weights:
+        positions = positions + velocities * (weight * dt/2)
+        accelleration = acceleration(positions, masses, grav_const,
+                                     method=method, **options)
+        velocities = velocities + accelleration * (weight * dt)
+        positions = positions + velocities * (weight * dt/2)
+    return positions, velocities, None
+
+
+def dkd_step(positions: np.ndarray,
+             velocities: np.ndarray,
+             masses: np.ndarray,
+             dt: float,
+             grav_const: float,
+             method='direct',
+             forces=None,
+             **options):
+    """advance the bodies by dt with the synchronized drift-kick-drift
+    leapfrog
+
+    Parameters are the same as for kdk_step (forces is not used).
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, None) after dt has elapsed
+    """
+    return _composition(positions, velocities, masses, dt, grav_const,
+                        (1,), method, options)
+
+
+_CBRT2 = 2 ** (1 / 3)
+YOSHIDA4_WEIGHTS = (1 / (2 - _CBRT2),
+                    - _CBRT2 / (2 - _CBRT2),
+                    1 / (2 - _CBRT2))
+# solution A of Yoshida (1990)
+_W1, _W2, _W3 = -1.17767998417887, 0.235573213359357, 0.784513610477560
+YOSHIDA6_WEIGHTS = (_W3, _W2, _W1, 1 - 2 * (_W1 + _W2 + _W3), _W1, _W2, _W3)
+
+
+def yoshida4_step(positions: np.ndarray,
+                  velocities: np.ndarray,
+                  masses: np.ndarray,
+                  dt: float,
+                  grav_const: float,
+                  method='direct',
+                  forces=None,
+                  **options):
+    """advance the bodies by dt with Yoshida's symplectic 4th-order
+    scheme (three leapfrog steps, three force evaluations)
+
+    Parameters are the same as for kdk_step (forces is not used).
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, None) after dt has elapsed
+    """
+    return _composition(positions, velocities, masses, dt, grav_const,
+                        YOSHIDA4_WEIGHTS, method, options)
+
+
+def yoshida6_step(positions: np.ndarray,
+                  velocities: np.ndarray,
+                  masses: np.ndarray,
+                  dt: float,
+                  grav_const: float,
+                  method='direct',
+                  forces=None,
+                  **options):
+    """advance the bodies by dt with Yoshida's symplectic 6th-order
+    scheme (seven leapfrog steps, seven force evaluations)
+
+    Parameters are the same as for kdk_step (forces is not used).
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, None) after dt has elapsed
+    """
+    return _composition(positions, velocities, masses, dt, grav_const,
+                        YOSHIDA6_WEIGHTS, method, options)
+
+
+def hermite_step(positions: np.ndarray,
+                 velocities: np.ndarray,
+                 masses: np.ndarray,
+                 dt: float,
+                 grav_const: float,
+                 method='direct',
+                 forces=None,
+                 memory_budget=2 ** 27,
+                 profiler=None,
+                 softening=0.0,
+                 kernel='plummer',
+                 dtype=None):
+    """advance the bodies by dt with the 4th-order Hermite
+    predictor-corrector scheme
+
+    The acceleration and jerk at the predicted state are returned and
+    used as the starting values of the next step, so every step needs
+    one evaluation of forces.acceleration_jerk.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    dt: float
+        the timestep
+    grav_const: float
+        The gravitational constant
+    method: str, optional
+        only 'direct' is supported, the jerk is calculated with
+        forces.acceleration_jerk
+    forces: tuple, optional
+        (accelleration, jerk) at the initial state, if already known
+    memory_budget: int, optional
+        the memory budget of forces.acceleration_jerk in bytes.
+        Default is 2**27 (128 MiB).
+    profiler: profiling.Profiler, optional
+        times and counts the force evaluations
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+    dtype: np.dtype, optional
+        the floating point type of the force evaluations, see
+        forces.acceleration. Default is the type of positions.
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, (accelleration, jerk)) after dt
+    """
+    _require_direct(method, 'hermite')
+    if forces is None:
+        forces = _acceleration_jerk(positions, velocities, masses,
+                                    grav_const, memory_budget,
+                                    profiler=profiler, softening=softening,
+                                    kernel=kernel, dtype=dtype)
+    acc0, jerk0 = forces
+
+    # predict
+    pred_positions = (positions + velocities * dt + acc0 * dt ** 2 / 2
+                      + jerk0 * dt ** 3 / 6)
+    pred_velocities = velocities + acc0 * dt + jerk0 * dt ** 2 / 2
+
+    # evaluate and correct
+    acc1, jerk1 = _acceleration_jerk(pred_positions, pred_velocities,
+                                     masses, grav_const, memory_budget,
+                                     profiler=profiler, softening=softening,
+                                     kernel=kernel, dtype=dtype)
+    new_velocities = (velocities + (acc0 + acc1) * dt / 2
+                      + (jerk0 - jerk1) * dt ** 2 / 12)
+    new_positions = (positions + (velocities + new_velocities) * dt / 2
+                     + (acc0 - acc1) * dt ** 2 / 12)
+    return new_positions, new_velocities, (acc1, jerk1)
+
+
+def _block_spans(accelleration, jerk, eta, tick, max_level):
+    """return the timestep of every body from the criterion
+    eta * |a| / |da/dt|, rounded down to a power of two ticks between 1
+    and 2**max_level"""
+    acc_norm = np.sqrt((accelleration ** 2).sum(axis=1))
+    jerk_norm = np.sqrt((jerk ** 2).sum(axis=1))
+    # the timestep of every body in units of a tick
+    body_ticks = np.full(len(acc_norm), np.inf)
+    np.divide(eta * acc_norm, jerk_norm * tick, out=body_ticks,
+              where=jerk_norm > 0)
+    with np.errstate(divide='ignore', over='ignore'):
+        levels = np.floor(np.log2(body_ticks))
+    return 2 ** levels.clip(0, max_level).astype(int)
+
+
+def block_step(positions: np.ndarray,
+               velocities: np.ndarray,
+               masses: np.ndarray,
+               dt: float,
+               grav_const: float,
+               method='direct',
+               forces=None,
+               eta=0.02,
+               max_level=10,
+               memory_budget=2 ** 27,
+               profiler=None,
+               softening=0.0,
+               kernel='plummer',
+               dtype=None):
+    """advance the bodies by dt with individual block timesteps
+
+    Every body gets its own timestep dt / 2**level from the criterion
+    eta * |a| / |da/dt|, so bodies in close encounters are integrated
+    with small steps while all others keep large steps. At the end of
+    its own step, a body gets its acceleration and jerk recomputed, is
+    kicked (kick-drift-kick) and gets a new timestep from the criterion.
+    A timestep can only grow where it stays aligned with the blocks of
+    its level. In between, all bodies are drifted together. The
+    velocities are synchronized with the positions before and after the
+    step.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    dt: float
+        the (largest) timestep
+    grav_const: float
+        The gravitational constant
+    method: str, optional
+        only 'direct' is supported, the forces are calculated with
+        forces.acceleration_jerk
+    forces: tuple, optional
+        (accelleration, jerk) at the initial state, if already known
+    eta: float, optional
+        the accuracy parameter of the timestep criterion.
+        Default is 0.02.
+    max_level: int, optional
+        the largest level, i.e. the smallest timestep is
+        dt / 2**max_level. Default is 10.
+    memory_budget: int, optional
+        the memory budget of the force kernels in bytes, see
+        forces.blocked_acceleration. Default is 2**27 (128 MiB).
+    profiler: profiling.Profiler, optional
+        times and counts the force evaluations
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+    dtype: np.dtype, optional
+        the floating point type of the force evaluations, see
+        forces.acceleration. Default is the type of positions.
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, (accelleration, jerk)) after dt has
+        elapsed. The jerk of a body is calculated with the velocities
+        before its last kick.
+    """
+    _require_direct(method, 'block')
+    if forces is None:
+        forces = _acceleration_jerk(positions, velocities, masses,
+                                    grav_const, memory_budget,
+                                    profiler=profiler, softening=softening,
+                                    kernel=kernel, dtype=dtype)
+    accelleration, jerk = (array.copy() for array in forces)
+
+    # all times are counted in ticks of the smallest timestep
+    ticks = 2 ** max_level
+    tick = dt / ticks
+    span = _block_spans(accelleration, jerk, eta, tick, max_level)
+    step_start = np.zeros(len(masses), dtype=int)
+
+    positions = positions.copy()
+    velocities = velocities.copy()
+    velocities += accelleration * (span * tick / 2)[:, None]
+    time = 0
+    while time < ticks:
+        step_end = step_start + span
+        next_time = step_end.min()
+        positions += velocities * ((next_time - time) * tick)
+        time = next_time
+
+        ending = np.nonzero(step_end == time)[0]
+        accelleration[ending], jerk[ending] = _acceleration_jerk(
+            positions, velocities, masses, grav_const, memory_budget,
+            targets=ending, profiler=profiler, softening=softening,
+            kernel=kernel, dtype=dtype)
+        velocities[ending] += (accelleration[ending]
+                               * (span[ending] * tick / 2)[:, None])
+        if time == ticks:
+            break
+
+        # new timesteps, as large as the alignment at time allows
+        new_span = _block_spans(accelleration[ending], jerk[ending], eta,
+                                tick, max_level)
+        # the largest power of two that divides time
+        new_span = np.minimum(new_span, time & -time)
+        span[ending] = new_span
+        step_start[ending] = time
+        velocities[ending] += (accelleration[ending]
+                               * (new_span * tick / 2)[:, None])
+    return positions, velocities, (accelleration, jerk)
+
+
+# the integration schemes that can be selected with the integrator
+# parameter of NBodySystem.step and NBodySystem.simulate
+INTEGRATORS = {'kick-drift': kick_drift_step,
+               'kdk': kdk_step,
+               'dkd': dkd_step,
+               'yoshida4': yoshida4_step,
+               'yoshida6': yoshida6_step,
+               'hermite': hermite_step,
+               'block': block_step}
@@ -0,0 +1,135 @@
+import importlib.util
+import numpy as np
+from .softening import check_kernel
+
+# True if the compiled kernels of this module can be used. numba itself
+# is only imported (and the kernels compiled) on first use.
+HAVE_NUMBA = importlib.util.find_spec('numba') is not None
+
+
+def _kernels():
+    """return the module with the compiled kernels"""
+    if not HAVE_NUMBA:
+        raise ImportError("the 'jit' force method needs numba, install it "
+                          "with pip install numba or use method='direct'")
+    from . import _jit_kernels
+    return _jit_kernels
+
+
+def _dtype(positions):
+    """the floating point type the kernels use for positions: float32
+    if they are float32, else float64"""
+    return np.float32 if positions.dtype == np.float32 else np.float64
+
+
+def _softening(softening, kernel, nbodies, dtype):
+    """return the softening lengths as an (N,) array and whether the
+    spline kernel is used"""
+    check_kernel(kernel)
+    softening = np.broadcast_to(np.asarray(softening, dtype=dtype),
+                                (nbodies,))
+    return np.ascontiguousarray(softening), kernel == 'spline'
+
+
+def jit_acceleration(positions: np.ndarray,
+                     masses: np.ndarray,
+                     grav_const: float,
+                     softening=0.0,
+                     kernel='plummer'):
+    """calculate the accelerations by direct summation with a compiled
+    kernel that needs no temporaries
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+
+    Raises
+    ------
+    ImportError
+        if numba is not installed
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    kernels = _kernels()
+    dtype = _dtype(positions)
+    softening, spline = _softening(softening, kernel, len(masses), dtype)
+    accelleration = np.empty(positions.shape, dtype=dtype)
+    kernels.acceleration_kernel(np.ascontiguousarray(positions, dtype=dtype),
+                                np.ascontiguousarray(masses, dtype=dtype),
+                                float(grav_const), softening, spline,
+                                accelleration)
+    return accelleration
+
+
+def jit_kick_drift(positions: np.ndarray,
+                   velocities: np.ndarray,
+                   masses: np.ndarray,
+                   dt: float,
+                   grav_const: float,
+                   nsteps: int,
+                   halfstep=False,
+                   softening=0.0,
+                   kernel='plummer'):
+    """run several steps of the kick-drift scheme of NBodySystem.step
+    in a single compiled loop
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    velocities: np.ndarray
+        the (N, D) velocities of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    dt: float
+        the timestep
+    grav_const: float
+        The gravitational constant
+    nsteps: int
+        the number of steps
+    halfstep: bool, optional
+        kick the velocities by dt/2 in the first step. Default is False.
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+
+    Raises
+    ------
+    ImportError
+        if numba is not installed
+
+    Returns
+    -------
+    tuple
+        (positions, velocities, previous) with the new positions and
+        velocities and the positions before the last step (all new
+        arrays)
+    """
+    kernels = _kernels()
+    dtype = _dtype(positions)
+    softening, spline = _softening(softening, kernel, len(masses), dtype)
+    positions = np.array(positions, dtype=dtype)
+    velocities = np.array(velocities, dtype=dtype)
+    previous = positions.copy()
+    kernels.kick_drift_kernel(positions, velocities,
+                              np.ascontiguousarray(masses, dtype=dtype),
+                              float(dt), float(grav_const), softening,
+                              spline, int(nsteps), bool(halfstep), previous)
+    return positions, velocities, previous
@@ -1,7 +1,64 @@
+import re
+from fractions import Fraction
 import numpy as np
 from .pointmass import PointMass
-from scipy.constants import gravitational_constant
-import pandas as pd
+from .forces import acceleration, potential_energy, resolve_method
+from .output import ArraySink
+from .integrators import INTEGRATORS
+from .jit import jit_kick_drift
+from . import snapshot
+from .profiling import phase
+from .bodyview import BodyView, NameIndex, swap_remove_plan
+
+# the Newtonian constant of gravitation in m^3 / (kg s^2) (CODATA 2018,
+# the value of scipy.constants.gravitational_constant)
+gravitational_constant = 6.67430e-11
+
+# the durations that _nanoseconds converts without pandas, e.g. '10ms'
+_DURATION = re.compile(r'\s*([-+]?(?:\d+\.?\d*|\.\d+))\s*'
+                       r'(ns|us|ms|s|min|m|h|D|d)\s*$')
+_UNITS = {'ns': 1, 'us': 10 ** 3, 'ms': 10 ** 6, 's': 10 ** 9,
+          'min': 60 * 10 ** 9, 'm': 60 * 10 ** 9, 'h': 3600 * 10 ** 9,
+          'D': 86400 * 10 ** 9, 'd': 86400 * 10 ** 9}
+
+
+def _nanoseconds(value):
+    """return the duration value in integer ns, like
+    pd.Timedelta(value).value
+
+    Integers, np.timedelta64 and simple strings like '10ms' or '1.5 s'
+    are converted without importing pandas, everything else is passed
+    on to pd.Timedelta.
+    """
+    if isinstance(value, str):
+        match = _DURATION.match(value)
+        if match:
+            duration = Fraction(match.group(1)) * _UNITS[match.group(2)]
+            if duration.denominator == 1:
+                return int(duration)
+    elif isinstance(value, np.timedelta64):
+        return int(value.astype('timedelta64[ns]').astype(np.int64))
+    elif (isinstance(value, (int, np.integer))
+          and not isinstance(value, bool)):
+        return int(value)
+    import pandas as pd
+    return pd.Timedelta(value).value
+
+
+def _validate(positions, velocities, masses, names=None):
+    """check the shapes of the arrays of a new NBodySystem and return
+    them with the NameIndex of names"""
+    if positions.ndim != 2:
+        raise ValueError("positions must be a (N, D) array")
+    if velocities.shape != positions.shape:
+        raise ValueError("positions and velocities must be of same shape")
+    if masses.shape != positions.shape[:1]:
+        raise ValueError("there must be one mass per body")
+    if names is None:
+        names = np.arange(len(masses))
+    elif len(names) != len(masses):
+        raise ValueError("there must be one name per body")
+    return positions, velocities, masses, NameIndex(names)
 
 
 class NBodySystem:
@@ -9,10 +66,16 @@ class NBodySystem:
 
     Attributes
     ----------
+    name_index: bodyview.NameIndex
+        the names of the bodies in the order of the rows of the arrays
+        all_positions, all_velocitys, all_masses, with a vectorized
+        lookup of the rows of many names
     bodyindex: dict
         a dictionary that stores the index of each body in the arrays
         all_positions, all_velocitys, all_masses, so it is easy to
-        track which column belongs to which body.
+        track which column belongs to which body. It is built from
+        name_index on first access, so large systems that only use
+        name_index never need it. Do not modify it in place.
     all_positions: np.ndarray
         an array that stores all position arrays in a single array:
             >> body1.position = np.array([1, 2, 3])
@@ -23,11 +86,26 @@ class NBodySystem:
         an array that stores all velocity arrays in a single array
     all_masses: np.ndarray
         an array that stores all masses
+    time: float
+        the simulation time in s, advanced by step and simulate
+    staggered: bool
+        True if the velocities lag half a step behind the positions,
+        i.e. after a 'kick-drift' step with halfstep=True
 
     Methods
     -------
+    from_arrays(positions, velocities, masses, names, dtype)
+        create an NBodySystem from arrays
+    from_csv(path), from_parquet(path), from_npy(...)
+        create an NBodySystem from a file
+    astype(dtype)
+        return a copy of the system in another floating point type
     step(inplace)
         run the simulation one timestep
+    simulate(end, step)
+        run the simulation and return the positions over time
+    iter_simulate(end, step)
+        run the simulation and yield the positions over time
     centre_of_mass()
         calculate the centre of mass of the mass-system
     stationary()
@@ -35,6 +113,20 @@ class NBodySystem:
         all single velocities accordingly
     get_body(name)
         return the PointMass object named name
+    select(names)
+        return a live BodyView of some bodies
+    add_bodies(positions, velocities, masses, names)
+        add bodies without rebuilding the system
+    remove_bodies(names)
+        remove bodies without rebuilding the system
+    kinetic_energy(), potential_energy(), momentum(), angular_momentum()
+        calculate conserved quantities
+    conserved_quantities()
+        calculate all conserved quantities and the virial ratio
+    save(path)
+        write the full state into a snapshot file
+    load(path, mmap_mode)
+        create an NBodySystem from a snapshot file
     """
 
     def __init__(self, *args, not_yet_initialized=True):
@@ -49,43 +141,253 @@ class NBodySystem:
         args:
             if not_yet_initialized is True: PointMass
             if not_yet_initialized is False:
-                (np.ndarray, np.ndarray, np.ndarray, dict)
+                (np.ndarray, np.ndarray, np.ndarray, NameIndex or dict)
         """
         if not_yet_initialized:
-            self.bodyindex = {}
-            for i, body in enumerate(args):
-                if body.name in self.bodyindex:
-                    raise AttributeError("there are several objects called "
-                                         + body.name)
-                else:
-                    self.bodyindex[body.name] = i
-
-            shape = (len(args), len(args[0].position))
-
-            self.all_positions = np.zeros(shape)
-            for i, body in enumerate(args):
-                self.all_positions[i] = body.position
-
-            self.all_velocities = np.zeros(shape)
-            for i, body in enumerate(args):
-                self.all_velocities[i] = body.velocity
-
-            self.all_masses = np.zeros(len(args))
-            for i, body in enumerate(args):
-                self.all_masses[i] = body.mass
+            # collect everything in a single pass over the bodies
+            names, positions, velocities, masses = zip(
+                *[(body.name, body.position, body.velocity, body.mass)
+                  for body in args])
+            (self.all_positions, self.all_velocities, self.all_masses,
+             self.name_index) = _validate(np.array(positions, dtype=float),
+                                         np.array(velocities, dtype=float),
+                                         np.array(masses, dtype=float),
+                                         names)
 
         else:
             # this constructor is used by some methods
             self.all_positions = args[0]
             self.all_velocities = args[1]
             self.all_masses = args[2]
-            self.bodyindex = args[3]
+            if isinstance(args[3], NameIndex):
+                self.name_index = args[3]
+            else:
+                self.bodyindex = args[3]
+
+        self.time = 0.0
+        self.staggered = False
+        # the forces at the end of the last step, see _cached_forces
+        self._forces = None
+        # {name: (buffer, view)} for the arrays all_<name> that are views
+        # of buffers of this system, see _resize
+        self._buffers = {}
+
+    @property
+    def name_index(self):
+        if self._name_index is None:
+            names = [None] * len(self._bodyindex)
+            for name, row in self._bodyindex.items():
+                names[row] = name
+            self._name_index = NameIndex(names)
+        return self._name_index
+
+    @name_index.setter
+    def name_index(self, name_index):
+        self._name_index = name_index
+        self._bodyindex = None
+
+    @property
+    def bodyindex(self):
+        if self._bodyindex is None:
+            self._bodyindex = self._name_index.to_dict()
+        return self._bodyindex
+
+    @bodyindex.setter
+    def bodyindex(self, bodyindex):
+        self._bodyindex = bodyindex
+        self._name_index = None
+
+    @classmethod
+    def from_arrays(cls, positions, velocities, masses, names=None,
+                    dtype=float):
+        """create an NBodySystem from arrays instead of PointMass objects
+
+        The arrays are validated as a whole and used without a copy if
+        they already are arrays of dtype (e.g. memory maps). step
+        replaces all_positions and all_velocities by new arrays, so the
+        given arrays are not modified by a simulation.
+
+        Parameters
+        ----------
+        positions: array_like
+            the (N, D) positions of the bodies
+        velocities: array_like
+            the (N, D) velocities of the bodies
+        masses: array_like
+            the (N,) masses of the bodies
+        names: array_like, optional
+            the N unique names or integer IDs of the bodies.
+            Default is the row numbers 0 to N - 1.
+        dtype: np.dtype, optional
+            the floating point type of the system, see astype().
+            Default is float64.
+
+        Raises
+        ------
+        ValueError
+            if the shapes of the arrays or the number of names do not
+            match
+        AttributeError
+            if several bodies have the same name
+
+        Returns
+        -------
+        NBodySystem
+            the new system
+        """
+        return cls(*_validate(np.asanyarray(positions, dtype=dtype),
+                              np.asanyarray(velocities, dtype=dtype),
+                              np.asanyarray(masses, dtype=dtype),
+                              names),
+                   not_yet_initialized=False)
+
+    @classmethod
+    def from_table(cls, table):
+        """create an NBodySystem from a DataFrame with one row per body
+
+        The columns are 'mass', the positions 'x1', 'x2', ... and the
+        velocities 'v1', 'v2', ... and optionally the 'name' of the
+        bodies.
+
+        Parameters
+        ----------
+        table: pandas.DataFrame
+            the bodies
+
+        Returns
+        -------
+        NBodySystem
+            the new system
+        """
+        dim = 0
+        while 'x' + str(dim + 1) in table.columns:
+            dim += 1
+        coordinates = ['x' + str(i + 1) for i in range(dim)]
+        speeds = ['v' + str(i + 1) for i in range(dim)]
+        names = table['name'].to_numpy() if 'name' in table.columns else None
+        return cls.from_arrays(table[coordinates].to_numpy(dtype=float),
+                               table[speeds].to_numpy(dtype=float),
+                               table['mass'].to_numpy(dtype=float),
+                               names)
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        """create an NBodySystem from a CSV file with the columns of
+        from_table()
+
+        Parameters
+        ----------
+        path: str
+            the CSV file
+        kwargs:
+            passed on to pandas.read_csv
+
+        Returns
+        -------
+        NBodySystem
+            the new system
+        """
+        import pandas as pd
+        return cls.from_table(pd.read_csv(path, **kwargs))
+
+    @classmethod
+    def from_parquet(cls, path, **kwargs):
+        """create an NBodySystem from a Parquet file with the columns of
+        from_table() (needs pyarrow or fastparquet)
+
+        Parameters
+        ----------
+        path: str
+            the Parquet file
+        kwargs:
+            passed on to pandas.read_parquet
+
+        Returns
+        -------
+        NBodySystem
+            the new system
+        """
+        import pandas as pd
+        return cls.from_table(pd.read_parquet(path, **kwargs))
+
+    @classmethod
+    def from_npy(cls, positions, velocities, masses, names=None,
+                 mmap_mode=None):
+        """create an NBodySystem from .npy files
+
+        Parameters
+        ----------
+        positions: str
+            the .npy file with the (N, D) positions
+        velocities: str
+            the .npy file with the (N, D) velocities
+        masses: str
+            the .npy file with the (N,) masses
+        names: str, optional
+            the .npy file with the N names or IDs. Default is the row
+            numbers.
+        mmap_mode: str, optional
+            passed on to np.load, e.g. 'r' to memory-map float64 files
+            instead of reading them
+
+        Returns
+        -------
+        NBodySystem
+            the new system
+        """
+        if names is not None:
+            names = np.load(names)
+        return cls.from_arrays(np.load(positions, mmap_mode=mmap_mode),
+                               np.load(velocities, mmap_mode=mmap_mode),
+                               np.load(masses, mmap_mode=mmap_mode),
+                               names)
+
+    @property
+    def dtype(self):
+        """the floating point type of all_positions"""
+        return self.all_positions.dtype
+
+    def astype(self, dtype):
+        """return a copy of the system with all arrays converted to dtype
+
+        With np.float32 the arrays and the pairwise temporaries of the
+        force backends take half the memory and bandwidth, while the
+        relative accuracy drops to about 1e-7: the positions are rounded
+        to 7 digits in every step, so the energy drifts much faster than
+        in float64. To keep the positions in float64 but evaluate the
+        forces in float32, pass dtype=np.float32 to step() or simulate()
+        instead. float32 covers magnitudes from about 1e-38 to 3e38, so
+        systems in SI units should be rescaled first (e.g. grav_const=1).
+
+        Parameters
+        ----------
+        dtype: np.dtype
+            the new floating point type, e.g. np.float32
+
+        Returns
+        -------
+        NBodySystem
+            the converted system, at the same time and phase
+        """
+        system = NBodySystem(self.all_positions.astype(dtype),
+                             self.all_velocities.astype(dtype),
+                             self.all_masses.astype(dtype),
+                             self.name_index.copy(),
+                             not_yet_initialized=False)
+        system.time = self.time
+        system.staggered = self.staggered
+        return system
 
     def step(self,
              dt,
              grav_const=gravitational_constant,
              inplace=True,
-             halfstep=False):
+             halfstep=False,
+             method='direct',
+             integrator='kick-drift',
+             profiler=None,
+             events=None,
+             **options):
         """calculate the next state of the gravitational system
 
         Parameters
@@ -107,58 +409,402 @@ class NBodySystem:
             updated wit the full step of dt. This can reduce error.
             Only use halfstep=True in the first step of a simulation! All
             following steps must be computed wiht halfstep=False.
+        method: str, optional
+            The force backend used to calculate the accelerations:
+            'direct' sums over all pairs of bodies (O(N^2) time and
+            memory), 'blocked' does the same in tiles that fit into a
+            memory budget (O(N^2) time, O(N) memory), 'parallel'
+            splits the blocked sum across a pool of worker processes,
+            'barneshut' approximates distant groups of bodies
+            with a Barnes-Hut tree (O(N log N)), 'jit' sums over all
+            pairs in a compiled loop without temporaries (needs numba),
+            'pm' solves for the forces of a periodic box on a particle
+            mesh with FFTs (O(N + G log G) for G grid cells) and 'auto'
+            is 'jit' if numba is installed and 'direct' otherwise.
+            Default is 'direct'.
+        integrator: str, optional
+            The integration scheme, see integrators.INTEGRATORS:
+            'kick-drift' kicks the velocities and then drifts the
+            positions, which is the leapfrog scheme if the velocities
+            lag half a step behind (see halfstep).
+            'kdk' and 'dkd' are the synchronized kick-drift-kick and
+            drift-kick-drift leapfrog schemes (2nd order).
+            'yoshida4' and 'yoshida6' are symplectic compositions of
+            leapfrog steps (4th and 6th order).
+            'hermite' is the 4th-order Hermite predictor-corrector.
+            'block' gives every body its own timestep dt / 2**level
+            chosen from its acceleration and jerk, and only recomputes
+            the forces on the bodies that are due (it takes the options
+            eta and max_level).
+            halfstep is only used by 'kick-drift', all other schemes
+            keep the velocities synchronized. 'hermite' and 'block' only
+            support method='direct'.
+            Default is 'kick-drift'.
+        profiler: profiling.Profiler, optional
+            collects the time spent in the phases of the step and counts
+            the steps and force evaluations
+        events: events.BodyEvents, optional
+            merges colliding bodies and removes escapers after the step.
+            Arrays of per-body options (e.g. softening) have to be
+            updated with events.source if the bodies change.
+        options:
+            passed on to the force backend, e.g. memory_budget (in
+            bytes) for method='blocked', workers and kind ('process'
+            or 'thread') for method='parallel' or theta (the opening
+            angle) and leaf_size for method='barneshut'. method='pm'
+            treats the system as a periodic box of edge length box_size
+            and takes grid, split and cutoff, see
+            particlemesh.pm_acceleration. All backends
+            and integrators take softening, a softening length or an
+            (N,) array of softening lengths per body (a pair uses the
+            larger one), and kernel, 'plummer' (the default) or
+            'spline' (exactly Newtonian beyond 2.8 softening lengths).
+            dtype (e.g. np.float32) evaluates the forces in another
+            floating point type than the positions, see
+            forces.acceleration.
 
         Returns
         -------
         NBodySystem, if inplace is False
             The state of the system after dt has elapsed
         """
-        # calculate connection vector map
-        shape = self.all_positions.shape
-        gridshape = (shape[0], shape[0], shape[1])
-        horizontal_grid = np.full(gridshape, self.all_positions)
-        vertical_grid = horizontal_grid.transpose((1, 0, 2))
-        convec_map = vertical_grid - horizontal_grid
-
-        # calculate distance map (and reshape for further computation)
-        dist_map = np.sqrt((convec_map ** 2).sum(axis=2))
-        dist_map_rs = dist_map.reshape((shape[0], shape[0], 1))
-        # replace 0s wit 1s to avoid division by zero (does not affect result)
-        dist_map_rs[dist_map_rs == 0] = 1
-
-        # calculate acceleration
-        mlen = len(self.all_masses)
-        mass_matrix = np.full((mlen, mlen), self.all_masses)
-        mass_matrix = mass_matrix.reshape((mlen, mlen, 1))
-        mx = convec_map * mass_matrix / (dist_map_rs ** 3)  # div by zero
-        accelleration = - grav_const * mx.sum(axis=1)
+        if integrator not in INTEGRATORS:
+            raise ValueError("unknown integrator " + repr(integrator)
+                             + ", choose one of " + ", ".join(INTEGRATORS))
+        if integrator == 'kick-drift':
+            options['halfstep'] = halfstep
+        settings = (integrator, grav_const, method, options)
+        forces = self._cached_forces(settings)
+        with phase(profiler, 'integrate'):
+            all_positions, all_velocities, forces = \
+                INTEGRATORS[integrator](self.all_positions,
+                                        self.all_velocities,
+                                        self.all_masses,
+                                        dt,
+                                        grav_const,
+                                        method=method,
+                                        forces=forces,
+                                        profiler=profiler,
+                                        **options)
 
         # update position and velocity
         if inplace:
-            if halfstep:
-                self.all_velocities = self.all_velocities + accelleration * dt/2
+            system = self
+        else:
+            system = NBodySystem(all_positions, 
+                                 all_velocities,
+                                 self.all_masses.copy(),
+                                 self.name_index.copy(),
+                                 not_yet_initialized=False)
+        system.all_velocities = all_velocities
+        system.all_positions = all_positions
+        # the integrators return new arrays, which can be changed in place
+        system._buffers['positions'] = (all_positions, all_positions)
+        system._buffers['velocities'] = (all_velocities, all_velocities)
+        system.time = self.time + dt
+        system.staggered = self.staggered or (integrator == 'kick-drift'
+                                              and halfstep)
+        if events is not None:
+            with phase(profiler, 'events'):
+                if events.apply(system, grav_const) is not None:
+                    # the forces belong to the old bodies
+                    forces = None
+        if forces is not None:
+            system._forces = (settings, all_positions.copy(),
+                              all_velocities.copy(), system.all_masses.copy(),
+                              forces)
+        if profiler is not None:
+            profiler.count('steps')
+        if not inplace:
+            return system
+
+    def _cached_forces(self, settings):
+        """return the forces a previous step has calculated for the
+        current state (positions, velocities and masses) with the same
+        settings, or None"""
+        if self._forces is None:
+            return None
+        cached_settings, positions, velocities, masses, forces = \
+            self._forces
+        options, cached_options = settings[3], cached_settings[3]
+        # options may hold arrays, which are compared by identity
+        same_options = options.keys() == cached_options.keys() and all(
+            options[key] is cached_options[key]
+            or (not isinstance(options[key], np.ndarray)
+                and options[key] == cached_options[key])
+            for key in options)
+        if (cached_settings[:3] == settings[:3] and same_options
+                and np.array_equal(positions, self.all_positions)
+                and np.array_equal(velocities, self.all_velocities)
+                and np.array_equal(masses, self.all_masses)):
+            return forces
+        return None
+
+    def iter_simulate(self,
+                      end: 'pd.Timedelta',
+                      step: 'pd.Timedelta',
+                      start='0s',
+                      grav_const=gravitational_constant,
+                      halfstep=True,
+                      stride=1,
+                      sample_every=None,
+                      times=None,
+                      method='direct',
+                      integrator='kick-drift',
+                      checkpoint=None,
+                      checkpoint_every=None,
+                      diagnostics=None,
+                      profiler=None,
+                      events=None,
+                      **options):
+        """simulate the evolution of the NBodySystem over time and yield
+        snapshots while the simulation runs.
+        Note: like simulate(), this advances self. Nothing is stored, so
+        the memory use does not depend on the length of the simulation.
+
+        Parameters
+        ----------
+        end: pd.Timedelta
+            The time at which the simulation terminates
+        step: pd.Timedelta
+            The timestep of each iteration
+        start: pd.Timedelta, optional
+            The time at the beginning of the simulation.
+            Default is '0s'
+        grav_const: float, optional
+            the gravitational constant. Default is the Newtonian gravitational
+            constant
+        halfstep: bool, optional
+            if halfstep=True the first iteration of the simulation will use
+            a halfstep for the velocities, see step(). It is skipped if
+            the velocities already lag half a step behind (see
+            staggered), e.g. in a system loaded from a checkpoint.
+        stride: int, optional
+            yield a snapshot every stride steps. Default is 1.
+        sample_every: pd.Timedelta, optional
+            yield a snapshot at this interval instead of every stride
+            steps. It does not have to be a multiple of step.
+        times: list of pd.Timedelta, optional
+            yield snapshots at exactly these times instead. They must lie
+            between start and the last step before end.
+        method: str, optional
+            The force backend, see step(). With 'jit' (or 'auto' if
+            numba is installed) and the 'kick-drift' integrator, all
+            steps between two snapshots run in one compiled loop.
+            Default is 'direct'.
+        integrator: str, optional
+            The integration scheme, see step(). Default is 'kick-drift'.
+        checkpoint: str, optional
+            a snapshot file (see save()) that is overwritten with the
+            state of the system at every checkpoint_every and after the
+            last step. To continue from it, load() it and simulate with
+            the same parameters and start=pd.Timedelta(system.time,
+            's'); the steps are bit-identical to an uninterrupted run.
+        checkpoint_every: pd.Timedelta, optional
+            the interval between checkpoints, rounded up to a whole
+            number of steps. Default is to only write a checkpoint
+            after the last step.
+        diagnostics: diagnostics.DiagnosticsLog, optional
+            records the conserved quantities at its interval and stops
+            the simulation early if the energy drift exceeds its
+            tolerance
+        profiler: profiling.Profiler, optional
+            collects the time spent in the phases of the simulation and
+            counts the steps, force evaluations and snapshots
+        events: events.BodyEvents, optional
+            merges colliding bodies and removes escapers after every
+            step. Arrays of per-body options (e.g. softening) are
+            updated along with the bodies.
+        options:
+            passed on to the force backend or integrator, see step()
+
+        Yields
+        ------
+        tuple
+            (time, positions) with the simulation time in s and the (N, D)
+            array of positions. step() replaces all_positions by a new
+            array, so the yielded positions stay valid without a copy.
+            Snapshots between two steps are interpolated linearly, which
+            is exact for the drift of the kick-drift scheme of step().
+            With events, the rows of positions are the current rows of
+            the system, see name_index.
+        """
+        start, dt, nsteps, output_times = self._output_times(
+            end, step, start, stride, sample_every, times)
+        every = None
+        if checkpoint is not None and checkpoint_every is not None:
+            every = self._interval_steps(checkpoint_every, dt)
+        log_every = None
+        if diagnostics is not None and diagnostics.every is not None:
+            log_every = self._interval_steps(diagnostics.every, dt)
+        run = (start, dt, grav_const, halfstep, method, integrator, options,
+               checkpoint, every, diagnostics, log_every, profiler, events)
+
+        if diagnostics is not None and resolve_method(method) == 'pm':
+            # before any step, a log that is continued records later
+            raise ValueError("diagnostics are not available for a "
+                             "periodic box (method='pm')")
+        self.time = start * 1e-9
+        if diagnostics is not None and not len(diagnostics):
+            with phase(profiler, 'diagnostics'):
+                diagnostics.record(self, grav_const, dt * 1e-9, method,
+                                   options)
+        i = 0
+        previous = self.all_positions
+        for output_time in output_times:
+            # the number of steps until output_time is reached
+            target = -((start - output_time) // dt)
+            if target > i:
+                previous = self._run(i, target, *run)
+                i = target
+                if diagnostics is not None and diagnostics.aborted:
+                    return
+            if start + i * dt == output_time:
+                yield output_time * 1e-9, self.all_positions
             else:
-                self.all_velocities = self.all_velocities + accelleration * dt
-            self.all_positions = self.all_positions + self.all_velocities * dt
+                # positions change linearly during the drift of a step
+                with phase(profiler, 'output'):
+                    fraction = (output_time - start - (i - 1) * dt) / dt
+                    positions = (previous
+                                 + (self.all_positions - previous) * fraction)
+                yield output_time * 1e-9, positions
+
+        if i < nsteps:
+            self._run(i, nsteps, *run)
+            if diagnostics is not None and diagnostics.aborted:
+                return
+        if checkpoint is not None and (every is None or nsteps % every):
+            with phase(profiler, 'checkpoint'):
+                self.save(checkpoint)
+        if diagnostics is not None and (log_every is None
+                                        or nsteps % log_every):
+            with phase(profiler, 'diagnostics'):
+                diagnostics.record(self, grav_const, dt * 1e-9, method,
+                                   options)
+
+    @staticmethod
+    def _interval_steps(interval, dt):
+        """the number of steps of dt (in ns) in interval, rounded up"""
+        return max(-(-_nanoseconds(interval) // dt), 1)
+
+    def _run(self, first, last, start, dt, grav_const, halfstep, method,
+             integrator, options, checkpoint, every, diagnostics,
+             log_every, profiler, events):
+        """run the steps first to last - 1 of a simulation that starts at
+        start (times in integer ns), write a checkpoint after every
+        `every` steps, record the diagnostics after every log_every steps
+        and return the positions before the last step"""
+        while first < last:
+            stop = last
+            for interval in (every, log_every):
+                if interval is not None:
+                    stop = min(stop, (first // interval + 1) * interval)
+            previous = self._advance(stop - first, dt * 1e-9, grav_const,
+                                     halfstep, method, integrator, options,
+                                     profiler, events)
+            first = stop
+            # the time of step first, without summing up rounding errors
+            self.time = float((start + first * dt) * 1e-9)
+            if every is not None and first % every == 0:
+                with phase(profiler, 'checkpoint'):
+                    self.save(checkpoint)
+            if log_every is not None and first % log_every == 0:
+                with phase(profiler, 'diagnostics'):
+                    proceed = diagnostics.record(self, grav_const, dt * 1e-9,
+                                                 method, options)
+                if not proceed:
+                    break
+        return previous
+
+    def _advance(self, nsteps, dt, grav_const, halfstep, method, integrator,
+                 options, profiler=None, events=None):
+        """run nsteps steps (halfstep only applies if the velocities are
+        not staggered yet) and return the positions before the last step
+
+        The kick-drift scheme with the compiled force backend runs all
+        steps in a single compiled loop. If events change the bodies,
+        the previous positions and the per-body arrays in options follow
+        the new rows."""
+        if (integrator == 'kick-drift' and resolve_method(method) == 'jit'
+                and set(options) <= {'softening', 'kernel'}
+                and events is None):
+            halfstep = halfstep and not self.staggered
+            with phase(profiler, 'integrate'):
+                self.all_positions, self.all_velocities, previous = \
+                    jit_kick_drift(self.all_positions, self.all_velocities,
+                                   self.all_masses, dt, grav_const, nsteps,
+                                   halfstep, **options)
+            self.time += nsteps * dt
+            self.staggered = self.staggered or halfstep
+            if profiler is not None:
+                nbodies = len(self.all_masses)
+                profiler.count('steps', nsteps)
+                profiler.count('force_evaluations', nsteps)
+                profiler.count('interactions',
+                               nsteps * nbodies * (nbodies - 1))
+            return previous
+        for i in range(nsteps):
+            previous = self.all_positions
+            self.step(dt=dt, grav_const=grav_const, inplace=True,
+                      halfstep=halfstep and not self.staggered,
+                      method=method, integrator=integrator,
+                      profiler=profiler, events=events, **options)
+            if events is not None and events.source is not None:
+                for key, value in options.items():
+                    if (isinstance(value, np.ndarray) and value.ndim
+                            and len(value) == len(previous)):
+                        options[key] = value[events.source]
+                previous = previous[events.source]
+        return previous
+
+    @staticmethod
+    def _output_times(end, step, start, stride, sample_every, times):
+        """convert the time parameters of simulate() to integer
+        nanoseconds
+
+        Returns
+        -------
+        tuple
+            (start, dt, nsteps, output_times) with the start time, the
+            timestep, the number of steps and the array of output times
+        """
+        start = _nanoseconds(start)
+        dt = _nanoseconds(step)
+        nsteps = (_nanoseconds(end) - start) // dt
+        stop = start + nsteps * dt
+        if times is not None:
+            output_times = np.sort(np.array(
+                [_nanoseconds(time) for time in times], dtype=np.int64))
+            if len(output_times) and (output_times[0] < start
+                                      or output_times[-1] > stop):
+                raise ValueError("all output times must be between start "
+                                 "and the last step before end")
         else:
-            if halfstep:
-                all_velocities = self.all_velocities + accelleration * dt/2
+            if sample_every is None:
+                interval = stride * dt
             else:
-                all_velocities = self.all_velocities + accelleration * dt
-            all_positions = self.all_positions + all_velocities * dt
-            new_system = NBodySystem(all_positions, 
-                                     all_velocities,
-                                     self.all_masses,
-                                     self.bodyindex,
-                                     not_yet_initialized=False)
-            return new_system
+                interval = _nanoseconds(sample_every)
+            output_times = np.arange(start, stop + 1, interval)
+        return start, dt, nsteps, output_times
 
     def simulate(self,
-                 end: pd.Timedelta, 
-                 step: pd.Timedelta, 
+                 end: 'pd.Timedelta', 
+                 step: 'pd.Timedelta', 
                  start='0s',
                  grav_const=gravitational_constant,
-                 halfstep=True):
+                 halfstep=True,
+                 stride=1,
+                 sample_every=None,
+                 times=None,
+                 sink=None,
+                 method='direct',
+                 integrator='kick-drift',
+                 checkpoint=None,
+                 checkpoint_every=None,
+                 diagnostics=None,
+                 profiler=None,
+                 events=None,
+                 **options):
         """simulate the evolution of the NBodySystem over time.
         Note: after using simulate() self will be in the final state of t=end.
         If you want to keep theinitial condition make a copy of the 
@@ -178,39 +824,137 @@ class NBodySystem:
             constant
         halfstep: bool, optional
             if halfstep=True the first iteration of the simulation will use
+            a halfstep for the velocities, see step(). It is skipped if
+            the velocities already lag half a step behind (see
+            staggered), e.g. in a system loaded from a checkpoint.
+        stride: int, optional
+            record the positions every stride steps. Default is 1.
+        sample_every: pd.Timedelta, optional
+            record the positions at this interval instead, see
+            iter_simulate()
+        times: list of pd.Timedelta, optional
+            record the positions at exactly these times instead, see
+            iter_simulate()
+        sink: optional
+            an output sink from nbody.output (e.g. NpySink,
+            ChunkedDirectorySink or CallbackSink) that receives the
+            snapshots while the simulation runs. Wrap it in an
+            AsyncSink to write on a background thread while the next
+            steps are computed. If a sink is given, no DataFrame is
+            built.
+        method: str, optional
+            The force backend, see step(). With 'jit' (or 'auto' if
+            numba is installed) and the 'kick-drift' integrator, all
+            steps between two snapshots run in one compiled loop.
+            Default is 'direct'.
+        integrator: str, optional
+            The integration scheme, see step(). Default is 'kick-drift'.
+        checkpoint: str, optional
+            a snapshot file (see save()) that is overwritten with the
+            state of the system at every checkpoint_every and after the
+            last step. To continue from it, load() it and simulate with
+            the same parameters and start=pd.Timedelta(system.time,
+            's'); the steps are bit-identical to an uninterrupted run.
+        checkpoint_every: pd.Timedelta, optional
+            the interval between checkpoints, rounded up to a whole
+            number of steps. Default is to only write a checkpoint
+            after the last step.
+        diagnostics: diagnostics.DiagnosticsLog, optional
+            records the conserved quantities at its interval and stops
+            the simulation early if the energy drift exceeds its
+            tolerance
+        profiler: profiling.Profiler, optional
+            collects the time spent in the phases of the simulation and
+            counts the steps, force evaluations and snapshots
+        events: events.BodyEvents, optional
+            merges colliding bodies and removes escapers after every
+            step. The output keeps a column for every body of the start,
+            with NaN positions after it was absorbed or has escaped.
+        options:
+            passed on to the force backend or integrator, see step()
 
         Returns
         -------
-        pandas.DataFrame
-            contains positional and velocity data at each timestep
+        pandas.DataFrame or None
+            contains positional data at each recorded timestep, None if
+            a sink is given
         """
 
-        index = pd.timedelta_range(start=start, end=end, freq=step)
-        names = list(self.bodyindex.keys())
-        dim = self.all_positions.shape[1]
+        with phase(profiler, 'simulate'):
+            output_times = self._output_times(end, step, start, stride,
+                                              sample_every, times)[3]
+            names = self.name_index.names.tolist()
+            dim = self.all_positions.shape[1]
+
+            if sink is None:
+                results = ArraySink()
+            else:
+                results = sink
+            results.open(len(output_times), names, dim)
+            snapshots = self.iter_simulate(end=end,
+                                           step=step,
+                                           start=start,
+                                           grav_const=grav_const,
+                                           halfstep=halfstep,
+                                           stride=stride,
+                                           sample_every=sample_every,
+                                           times=times,
+                                           method=method,
+                                           integrator=integrator,
+                                           checkpoint=checkpoint,
+                                           checkpoint_every=checkpoint_every,
+                                           diagnostics=diagnostics,
+                                           profiler=profiler,
+                                           events=events,
+                                           **options)
+            if events is not None:
+                start_index = self.name_index.copy()
+                changes = len(events)
+                columns = slice(None)
+                # the sinks copy the positions, so the frame is reused
+                frame = np.empty((len(start_index), dim))
+            frames = 0
+            try:
+                for time, positions in snapshots:
+                    with phase(profiler, 'output'):
+                        if events is not None:
+                            if len(events) != changes:
+                                changes = len(events)
+                                columns = start_index.rows(
+                                    self.name_index.names)
+                            frame.fill(np.nan)
+                            frame[columns] = positions
+                            positions = frame
+                        results.write(time, positions)
+                    frames += 1
+            finally:
+                results.close()
+            if profiler is not None:
+                profiler.count('frames', frames)
+            if sink is not None:
+                return None
+
+            with phase(profiler, 'output'):
+                return self._frame(results, output_times[:frames], names,
+                                   dim)
+
+    @staticmethod
+    def _frame(results, times, names, dim):
+        """build the DataFrame of simulate() from the frames in the
+        ArraySink results at the times in integer ns"""
+        import pandas as pd
+        index = pd.to_timedelta(times)
         coordinates = []
         for i in range(dim):
             coordinates.append('x' + str(i+1))
         hierarchy = [names, coordinates]
         columns = pd.MultiIndex.from_product(hierarchy, names=['body', 'pos'])
-        results = pd.DataFrame(np.zeros((len(index), len(names) * dim)),
-                               index=index,
-                               columns=columns)
-
-        dt = pd.Timedelta(step).value * 1e-9
-
-        #run simulation and copy positions into results
-        flat = self.all_positions.flatten()
-        results.iloc[0] = flat
-        self.step(dt=dt, grav_const=grav_const, inplace=True, 
-                  halfstep=halfstep)
-        for i in range(len(index) - 1):
-            flat = self.all_positions.flatten()
-            results.iloc[i + 1] = flat
-            self.step(dt=dt, grav_const=grav_const, inplace=True, 
-                      halfstep=False)
-
-        return results
+        # fewer frames if the diagnostics stopped the simulation early
+        positions = results.positions[:len(index)]
+        return pd.DataFrame(positions.reshape((len(index),
+                                               len(names) * dim)),
+                            index=index,
+                            columns=columns)
 
     def centre_of_mass(self):
         """calculate the centre of mass
@@ -238,19 +982,356 @@ class NBodySystem:
     def get_body(self, name: str):
         """return a PointMass object of the body named name
 
+        The PointMass holds copies of the state of the body, so it does
+        not change with the system. Use select() for a live view.
+
         Parameters
         ----------
         name: str
             the name of the object to return
 
+        Raises
+        ------
+        KeyError
+            if there is no body called name
+
         Returns
         -------
         PointMass
             the current state of the PointMass object
         """
-        index = self.bodyindex[name]
+        index = self.name_index.rows(name)
         body = PointMass(name=name,
-                         mass=self.all_masses[index],
-                         position=self.all_positions[index],
-                         velocity=self.all_velocities[index])
+                         mass=self.all_masses[index].item(),
+                         position=self.all_positions[index].copy(),
+                         velocity=self.all_velocities[index].copy())
         return body
+
+    def select(self, names):
+        """return a live view of the bodies called names
+
+        The rows of all names are looked up at once with a binary search
+        in name_index. See bodyview.BodyView for when the arrays of the
+        view are zero-copy views and how to write to them.
+
+        Parameters
+        ----------
+        names: scalar or array_like
+            the name of a body or the names of several bodies
+
+        Raises
+        ------
+        KeyError
+            if there is no body with one of the names
+
+        Returns
+        -------
+        BodyView
+            the view of the bodies, with (D,) arrays and a float mass for
+            a single name and (M, D) and (M,) arrays for M names
+        """
+        return BodyView(self, self.name_index.rows(names))
+
+    def _resize(self, name, size):
+        """make all_<name> a writable view of size rows of a buffer that
+        belongs to this system and return it
+
+        A new buffer is only allocated if all_<name> is not a view of a
+        buffer of this system yet (e.g. an array passed to from_arrays,
+        which must not change) or if it is too small; it grows
+        geometrically, so adding bodies takes amortized constant time
+        per body.
+        """
+        array = getattr(self, 'all_' + name)
+        buffer, view = self._buffers.get(name, (None, None))
+        if view is not array or size > len(buffer):
+            capacity = len(array)
+            if size > capacity:
+                capacity = max(size, 2 * capacity)
+            buffer = np.empty((capacity,) + array.shape[1:],
+                              dtype=array.dtype)
+            rows = min(size, len(array))
+            buffer[:rows] = array[:rows]
+        view = buffer[:size]
+        self._buffers[name] = (buffer, view)
+        setattr(self, 'all_' + name, view)
+        return view
+
+    def _set_rows(self, rows, positions, velocities, masses):
+        """overwrite the state of the bodies in rows"""
+        size = len(self.all_masses)
+        self._resize('positions', size)[rows] = positions
+        self._resize('velocities', size)[rows] = velocities
+        self._resize('masses', size)[rows] = masses
+
+    def _remove_rows(self, rows):
+        """swap-remove the bodies in rows and return the old row of every
+        remaining body"""
+        size = len(self.all_masses)
+        holes, tail, new_size = swap_remove_plan(rows, size)
+        for name in ('positions', 'velocities', 'masses'):
+            array = self._resize(name, size)
+            array[holes] = array[tail]
+            self._resize(name, new_size)
+        self.name_index.swap_remove(holes, tail, new_size)
+        self._bodyindex = None
+        source = np.arange(new_size)
+        source[holes] = tail
+        return source
+
+    def add_bodies(self, positions, velocities, masses, names=None):
+        """add bodies at the end of the arrays
+
+        The arrays grow geometrically, so adding M bodies takes time
+        proportional to M on average. all_positions, all_velocities and
+        all_masses are replaced by (views of) new arrays if they have to
+        grow, like in step().
+
+        Parameters
+        ----------
+        positions: array_like
+            the (M, D) positions of the new bodies
+        velocities: array_like
+            the (M, D) velocities of the new bodies
+        masses: array_like
+            the (M,) masses of the new bodies
+        names: array_like, optional
+            the M new unique names. Can be left out if the bodies have
+            integer IDs, the new bodies then get the IDs following the
+            largest one.
+
+        Raises
+        ------
+        ValueError
+            if the shapes of the arrays do not match the system or names
+            are missing
+        AttributeError
+            if a name is already taken
+        """
+        size, dim = self.all_positions.shape
+        positions = np.asarray(positions, dtype=self.dtype)
+        velocities = np.asarray(velocities, dtype=self.dtype)
+        masses = np.asarray(masses, dtype=self.dtype)
+        if positions.ndim != 2 or positions.shape[1] != dim:
+            raise ValueError("positions must be a (M, " + str(dim)
+                             + ") array")
+        if names is None:
+            existing = self.name_index.names
+            if existing.dtype.kind not in 'iu':
+                raise ValueError("the new bodies need names")
+            first = existing.max() + 1 if len(existing) else 0
+            names = np.arange(first, first + len(masses))
+        positions, velocities, masses, index = _validate(
+            positions, velocities, masses, names)
+        self.name_index.append(index.names)
+        self._bodyindex = None
+        new_size = size + len(masses)
+        self._resize('positions', new_size)[size:] = positions
+        self._resize('velocities', new_size)[size:] = velocities
+        self._resize('masses', new_size)[size:] = masses
+
+    def remove_bodies(self, names):
+        """remove bodies by moving the last bodies into their rows
+
+        This takes time proportional to the number of removed bodies.
+        The arrays are changed in place if they belong to the system
+        (e.g. after a step), so views of them (like those of select())
+        change as well. The rows of the remaining bodies change, so
+        select them again.
+
+        Parameters
+        ----------
+        names: scalar or array_like
+            the name of a body or the names of several bodies
+
+        Raises
+        ------
+        KeyError
+            if there is no body with one of the names
+
+        Returns
+        -------
+        np.ndarray
+            the old row of every remaining body
+        """
+        return self._remove_rows(np.atleast_1d(self.name_index.rows(names)))
+
+    def kinetic_energy(self, velocities=None):
+        """calculate the total kinetic energy
+
+        Parameters
+        ----------
+        velocities: np.ndarray, optional
+            the (N, D) velocities to use instead of all_velocities
+
+        Returns
+        -------
+        float
+            the kinetic energy
+        """
+        if velocities is None:
+            velocities = self.all_velocities
+        return 0.5 * (self.all_masses * (velocities ** 2).sum(axis=1)).sum()
+
+    def potential_energy(self, grav_const=gravitational_constant,
+                         memory_budget=2 ** 27, softening=0.0,
+                         kernel='plummer'):
+        """calculate the total potential energy, see
+        forces.potential_energy
+
+        Parameters
+        ----------
+        grav_const: float, optional
+            The gravitational constant. Default is the newtonian
+            gravitational constant.
+        memory_budget: int, optional
+            the approximate number of bytes the temporaries may use.
+            Default is 2**27 (128 MiB).
+        softening: float or np.ndarray, optional
+            the softening length(s) of the potential, see step().
+            Default is 0.
+        kernel: str, optional
+            the softening kernel, see step(). Default is 'plummer'.
+
+        Returns
+        -------
+        float
+            the potential energy
+        """
+        return potential_energy(self.all_positions, self.all_masses,
+                                grav_const, memory_budget, softening, kernel)
+
+    def momentum(self, velocities=None):
+        """calculate the total linear momentum
+
+        Parameters
+        ----------
+        velocities: np.ndarray, optional
+            the (N, D) velocities to use instead of all_velocities
+
+        Returns
+        -------
+        np.ndarray
+            the (D,) momentum
+        """
+        if velocities is None:
+            velocities = self.all_velocities
+        return (velocities * self.all_masses[:, None]).sum(axis=0)
+
+    def angular_momentum(self, velocities=None):
+        """calculate the total angular momentum about the origin
+
+        Parameters
+        ----------
+        velocities: np.ndarray, optional
+            the (N, D) velocities to use instead of all_velocities
+
+        Returns
+        -------
+        float or np.ndarray
+            the angular momentum: a float in 2 dimensions, a (3,) vector
+            in 3 dimensions and the antisymmetric (D, D) matrix
+            sum(m * (x_i v_j - x_j v_i)) otherwise
+        """
+        if velocities is None:
+            velocities = self.all_velocities
+        mx = self.all_positions * self.all_masses[:, None]
+        matrix = mx.T @ velocities
+        matrix = matrix - matrix.T
+        dim = len(matrix)
+        if dim == 2:
+            return matrix[0, 1]
+        if dim == 3:
+            return np.array([matrix[1, 2], matrix[2, 0], matrix[0, 1]])
+        return matrix
+
+    def conserved_quantities(self,
+                             grav_const=gravitational_constant,
+                             dt=None,
+                             method='direct',
+                             **options):
+        """calculate the total energy, momentum and angular momentum and
+        the virial ratio
+
+        If the velocities are staggered (see step()), they lag half a
+        step behind the positions and the kinetic energy has an error of
+        order dt. If dt is given, they are synchronized with a kick of
+        dt/2 first, which costs one force evaluation.
+
+        Parameters
+        ----------
+        grav_const: float, optional
+            The gravitational constant. Default is the newtonian
+            gravitational constant.
+        dt: float, optional
+            the timestep of the last step, to synchronize staggered
+            velocities
+        method: str, optional
+            The force backend for the synchronizing kick, see step().
+            Default is 'direct'.
+        options:
+            passed on to the force backend, see step()
+
+        Raises
+        ------
+        ValueError
+            if method is 'pm': the pairwise potential energy and the
+            angular momentum about the origin of isolated bodies have
+            no meaning in a periodic box
+
+        Returns
+        -------
+        dict
+            with the kinetic, potential and total 'energy', the
+            'momentum', the 'angular_momentum' and the 'virial_ratio'
+            2 * kinetic / |potential|, which is 1 in virial equilibrium
+        """
+        if resolve_method(method) == 'pm':
+            raise ValueError("the conserved quantities of a periodic box "
+                             "(method='pm') are not implemented")
+        velocities = self.all_velocities
+        if self.staggered and dt is not None:
+            velocities = velocities + acceleration(
+                self.all_positions, self.all_masses, grav_const,
+                method=method, **options) * (dt / 2)
+        kinetic = self.kinetic_energy(velocities)
+        potential = self.potential_energy(
+            grav_const, options.get('memory_budget', 2 ** 27),
+            options.get('softening', 0.0), options.get('kernel', 'plummer'))
+        return {'kinetic': kinetic,
+                'potential': potential,
+                'energy': kinetic + potential,
+                'momentum': self.momentum(velocities),
+                'angular_momentum': self.angular_momentum(velocities),
+                'virial_ratio': (2 * kinetic / abs(potential)
+                                 if potential else np.inf)}
+
+    def save(self, path):
+        """write the full state into a snapshot file, see
+        snapshot.save_snapshot
+
+        Parameters
+        ----------
+        path: str
+            the snapshot file
+        """
+        snapshot.save_snapshot(self, path)
+
+    @staticmethod
+    def load(path, mmap_mode=None):
+        """create an NBodySystem from a snapshot file written by save()
+
+        Parameters
+        ----------
+        path: str
+            the snapshot file
+        mmap_mode: str, optional
+            memory-map the arrays of the file instead of reading them,
+            see snapshot.load_snapshot
+
+        Returns
+        -------
+        NBodySystem
+            the saved system
+        """
+        return snapshot.load_snapshot(path, mmap_mode)
@@ -0,0 +1,359 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+
+class ArraySink:
+    """keep all snapshots of a simulation in a single in-memory array
+
+    Attributes
+    ----------
+    times: np.ndarray
+        the (frames,) simulation times in s
+    positions: np.ndarray
+        the (frames, N, D) positions
+
+    Methods
+    -------
+    open(nframes, names, dim)
+        prepare for nframes snapshots
+    write(time, positions)
+        store the next snapshot
+    close()
+        finish writing
+    """
+
+    def __init__(self):
+        self.times = None
+        self.positions = None
+        self._frame = 0
+
+    def open(self, nframes: int, names: list, dim: int):
+        """prepare for nframes snapshots
+
+        Parameters
+        ----------
+        nframes: int
+            the number of snapshots that will be written
+        names: list
+            the names of the bodies, in the order of their rows
+        dim: int
+            the number of spatial dimensions
+        """
+        self.times = np.zeros(nframes)
+        self.positions = np.zeros((nframes, len(names), dim))
+        self._frame = 0
+
+    def write(self, time: float, positions: np.ndarray):
+        """store the next snapshot
+
+        Parameters
+        ----------
+        time: float
+            the simulation time of the snapshot in s
+        positions: np.ndarray
+            the (N, D) positions at time
+        """
+        self.times[self._frame] = time
+        self.positions[self._frame] = positions
+        self._frame += 1
+
+    def close(self):
+        """finish writing"""
+        return
+
+
+class NpySink(ArraySink):
+    """write the snapshots of a simulation into a memory-mapped .npy file
+
+    The positions are written to path as a (frames, N, D) array that
+    can be read back with np.load(path, mmap_mode='r'), the times are
+    written to times_path when the sink is closed.
+    """
+
+    def __init__(self, path, times_path=None):
+        """
+        Parameters
+        ----------
+        path: str
+            the .npy file for the positions
+        times_path: str, optional
+            the .npy file for the times. Default is path with the
+            suffix '_times.npy' instead of '.npy'.
+        """
+        super().__init__()
+        self.path = str(path)
+        if times_path is None:
+            times_path = os.path.splitext(self.path)[0] + '_times.npy'
+        self.times_path = str(times_path)
+
+    def open(self, nframes: int, names: list, dim: int):
+        self.times = np.zeros(nframes)
+        self.positions = np.lib.format.open_memmap(
+            self.path, mode='w+', shape=(nframes, len(names), dim))
+        self._frame = 0
+
+    def close(self):
+        self.positions.flush()
+        np.save(self.times_path, self.times)
+
+
+class ChunkedDirectorySink:
+    """write the snapshots of a simulation into a directory of chunks
+
+    Every chunk_size snapshots are written as a pair of files
+    positions_<n>.npy and times_<n>.npy, so only one chunk has to be
+    kept in memory. With compress=True, the positions are written as
+    compressed positions_<n>.npz files instead (which is CPU-bound, see
+    AsyncSink). The names of the bodies are stored in meta.json.
+    Chunks of an earlier run in the same directory are removed when the
+    sink is opened. Use read_chunked to load the snapshots again.
+
+    Methods
+    -------
+    open(nframes, names, dim)
+        create the directory and the metadata
+    write(time, positions)
+        store the next snapshot
+    close()
+        write the last (partial) chunk
+    """
+
+    def __init__(self, directory, chunk_size=1000, compress=False):
+        """
+        Parameters
+        ----------
+        directory: str
+            the directory to write into. It is created if necessary.
+        chunk_size: int, optional
+            the number of snapshots per chunk. Default is 1000.
+        compress: bool, optional
+            compress the positions with np.savez_compressed. Default is
+            False.
+        """
+        self.directory = str(directory)
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self._chunk = 0
+        self._frame = 0
+
+    def open(self, nframes: int, names: list, dim: int):
+        os.makedirs(self.directory, exist_ok=True)
+        # remove the chunks of an earlier run, read_chunked would mix
+        # them into this one
+        for name in os.listdir(self.directory):
+            if (name.startswith(('positions_', 'times_'))
+                    and name.endswith(('.npy', '.npz'))):
+                os.remove(os.path.join(self.directory, name))
+        meta = {'names': [str(name) for name in names],
+                'dim': dim,
+                'chunk_size': self.chunk_size}
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+        self._times = np.zeros(self.chunk_size)
+        self._positions = np.zeros((self.chunk_size, len(names), dim))
+        self._chunk = 0
+        self._frame = 0
+
+    def write(self, time: float, positions: np.ndarray):
+        self._times[self._frame] = time
+        self._positions[self._frame] = positions
+        self._frame += 1
+        if self._frame == self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._frame == 0:
+            return
+        suffix = '_{:06d}.npy'.format(self._chunk)
+        np.save(os.path.join(self.directory, 'times' + suffix),
+                self._times[:self._frame])
+        path = os.path.join(self.directory, 'positions' + suffix)
+        if self.compress:
+            np.savez_compressed(path[:-4] + '.npz',
+                                positions=self._positions[:self._frame])
+        else:
+            np.save(path, self._positions[:self._frame])
+        self._chunk += 1
+        self._frame = 0
+
+    def close(self):
+        self._flush()
+
+
+def read_chunked(directory, mmap_mode=None):
+    """read the snapshots written by a ChunkedDirectorySink
+
+    Parameters
+    ----------
+    directory: str
+        the directory the sink has written into
+    mmap_mode: str, optional
+        passed on to np.load for the positions of every chunk. If it is
+        given, the chunks are not concatenated (which would load them
+        into memory) and positions is a list of per-chunk memory maps
+        (compressed chunks are loaded into memory).
+
+    Returns
+    -------
+    tuple
+        (names, times, positions) with the list of body names, the
+        (frames,) times and the (frames, N, D) positions, or the list of
+        (chunk frames, N, D) memory maps if mmap_mode is given
+    """
+    directory = str(directory)
+    with open(os.path.join(directory, 'meta.json')) as file:
+        meta = json.load(file)
+    chunks = sorted(name for name in os.listdir(directory)
+                    if name.startswith('positions_'))
+    times = [np.load(os.path.join(directory, 'times' + name[9:-4] + '.npy'))
+             for name in chunks]
+    positions = [np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+                 if name.endswith('.npy')
+                 else np.load(os.path.join(directory, name))['positions']
+                 for name in chunks]
+    times = np.concatenate(times) if chunks else np.zeros(0)
+    if mmap_mode is not None:
+        return meta['names'], times, positions
+    if not chunks:
+        return (meta['names'],
+                times,
+                np.zeros((0, len(meta['names']), meta['dim'])))
+    return meta['names'], times, np.concatenate(positions)
+
+
+class CallbackSink:
+    """pass every snapshot of a simulation to a function
+
+    The positions passed to callback are not copied, so callback must
+    copy them if it keeps them.
+    """
+
+    def __init__(self, callback):
+        """
+        Parameters
+        ----------
+        callback: callable
+            called as callback(time, positions) for every snapshot
+        """
+        self.callback = callback
+
+    def open(self, nframes: int, names: list, dim: int):
+        return
+
+    def write(self, time: float, positions: np.ndarray):
+        self.callback(time, positions)
+
+    def close(self):
+        return
+
+
+class AsyncSink:
+    """write the snapshots of a simulation on a background thread
+
+    AsyncSink wraps another sink, e.g.
+    simulate(..., sink=AsyncSink(ChunkedDirectorySink(path, compress=True))),
+    so that compressing and writing the snapshots overlaps with the
+    next steps of the simulation. write() only copies the positions
+    into one of a fixed number of buffers that are allocated by open()
+    and passes it to the writer thread through a bounded queue; if all
+    buffers are waiting to be written, write() blocks until the writer
+    thread has caught up, which bounds the memory. With the default of
+    two buffers, one snapshot is written while the next one is filled.
+
+    close() writes all pending snapshots before it closes the wrapped
+    sink, also if the simulation raised an exception (simulate always
+    closes its sink). An exception of the wrapped sink is raised by the
+    next write() or by close().
+
+    The wrapped sink receives the buffers, which are reused, so it must
+    copy the positions if it keeps them (all sinks of this module do,
+    callbacks of a CallbackSink have to).
+
+    Attributes
+    ----------
+    sink
+        the wrapped sink
+    buffers: int
+        the number of snapshot buffers
+
+    Methods
+    -------
+    open(nframes, names, dim)
+        open the wrapped sink and start the writer thread
+    write(time, positions)
+        queue the next snapshot
+    close()
+        write the pending snapshots and close the wrapped sink
+    """
+
+    def __init__(self, sink, buffers=2):
+        """
+        Parameters
+        ----------
+        sink
+            the sink that writes the snapshots, e.g. NpySink or
+            ChunkedDirectorySink
+        buffers: int, optional
+            the number of snapshots that can be queued. Default is 2.
+        """
+        if buffers < 1:
+            raise ValueError("an AsyncSink needs at least one buffer")
+        self.sink = sink
+        self.buffers = buffers
+        self._thread = None
+        self._error = None
+        self._reported = False
+
+    def open(self, nframes: int, names: list, dim: int):
+        self.sink.open(nframes, names, dim)
+        self._buffers = np.zeros((self.buffers, len(names), dim))
+        self._free = queue.Queue()
+        for buffer in range(self.buffers):
+            self._free.put(buffer)
+        # one more slot for the end marker of close()
+        self._pending = queue.Queue(self.buffers + 1)
+        self._error = None
+        self._reported = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='nbody-async-sink', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """write the queued snapshots until close() puts None"""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            time, buffer = item
+            if self._error is None:
+                try:
+                    self.sink.write(time, self._buffers[buffer])
+                except BaseException as error:
+                    # keep taking snapshots, so write() never blocks
+                    self._error = error
+            self._free.put(buffer)
+
+    def _raise(self):
+        """raise the exception of the wrapped sink, once"""
+        if self._error is not None and not self._reported:
+            self._reported = True
+            raise self._error
+
+    def write(self, time: float, positions: np.ndarray):
+        self._raise()
+        buffer = self._free.get()
+        self._buffers[buffer] = positions
+        self._pending.put((time, buffer))
+
+    def close(self):
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+        try:
+            self._raise()
+        finally:
+            self.sink.close()
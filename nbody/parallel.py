@@ -0,0 +1,262 @@
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from . import forces
+
+# the shared buffers of a worker process, set by _init_worker
+_buffers = None
+
+
+def _init_worker(positions, masses, accelleration, softening):
+    global _buffers
+    _buffers = (positions, masses, accelleration, softening)
+
+
+def _shared_views(buffers, nbodies, dim):
+    """wrap the shared buffers as positions, masses, accelleration and
+    softening arrays of nbodies bodies in dim dimensions"""
+    pos_buf, mass_buf, acc_buf, soft_buf = buffers
+    positions = np.frombuffer(pos_buf, count=nbodies * dim)
+    masses = np.frombuffer(mass_buf, count=nbodies)
+    accelleration = np.frombuffer(acc_buf, count=nbodies * dim)
+    softening = np.frombuffer(soft_buf, count=nbodies)
+    return (positions.reshape((nbodies, dim)),
+            masses,
+            accelleration.reshape((nbodies, dim)),
+            softening)
+
+
+def _work(task):
+    """calculate the accelerations of the targets start:stop in a
+    worker process and write them into the shared buffer
+
+    softening is None if the softening lengths per body are in the
+    shared buffer."""
+    (nbodies, dim, start, stop, grav_const, memory_budget, softening,
+     kernel) = task
+    positions, masses, accelleration, shared_softening = _shared_views(
+        _buffers, nbodies, dim)
+    if softening is None:
+        softening = shared_softening
+    accelleration[start:stop] = forces.target_acceleration(
+        positions, masses, grav_const, slice(start, stop), memory_budget,
+        softening, kernel)
+
+
+class ForcePool:
+    """a pool of workers that calculate the direct-summation
+    accelerations of disjoint slices of target bodies in parallel
+
+    Worker processes read the positions, masses and softening lengths
+    per body from shared memory and write their slice of the result
+    back into shared memory, so only a few numbers per worker are sent
+    each step. The shared memory holds float64, worker threads use the
+    floating point type of the positions. The slices only depend on the
+    number of bodies and workers and every target is summed over the
+    sources in a fixed order, so the results are bitwise reproducible
+    for a fixed worker count.
+
+    Attributes
+    ----------
+    workers: int
+        the number of workers
+    kind: str
+        'process' for worker processes, 'thread' for worker threads
+        in this process (NumPy releases the GIL in its kernels)
+
+    Methods
+    -------
+    acceleration(positions, masses, grav_const, memory_budget, softening,
+                 kernel)
+        calculate the accelerations of all bodies
+    close()
+        stop the workers
+    """
+
+    def __init__(self, workers=None, kind='process'):
+        """
+        Parameters
+        ----------
+        workers: int, optional
+            the number of workers. Default is the number of CPUs.
+        kind: str, optional
+            'process' or 'thread'. Default is 'process'.
+        """
+        if kind not in ('process', 'thread'):
+            raise ValueError("kind must be 'process' or 'thread'")
+        self.workers = workers or os.cpu_count()
+        self.kind = kind
+        self._pool = None
+        self._buffers = None
+        self._capacity = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self, size):
+        """(re)start the workers with shared buffers of at least size
+        float64 items"""
+        self.close()
+        if self.kind == 'thread':
+            # threads work on the caller's arrays, there are no buffers
+            self._pool = ThreadPoolExecutor(self.workers)
+            return
+        # grow geometrically so a slowly growing system does not
+        # restart the workers every step
+        self._capacity = max(size, 2 * self._capacity)
+        self._buffers = tuple(multiprocessing.RawArray('d', self._capacity)
+                              for buffer in range(4))
+        # forking a process that already runs threads (e.g. the thread
+        # pool of a compiled kernel) can deadlock the children, so the
+        # workers are spawned
+        context = multiprocessing.get_context('spawn')
+        self._pool = context.Pool(self.workers,
+                                  initializer=_init_worker,
+                                  initargs=self._buffers)
+
+    def acceleration(self,
+                     positions: np.ndarray,
+                     masses: np.ndarray,
+                     grav_const: float,
+                     memory_budget=2 ** 27,
+                     softening=0.0,
+                     kernel='plummer'):
+        """calculate the accelerations of all bodies
+
+        Parameters
+        ----------
+        positions: np.ndarray
+            the (N, D) positions of the bodies
+        masses: np.ndarray
+            the (N,) masses of the bodies
+        grav_const: float
+            The gravitational constant
+        memory_budget: int, optional
+            the approximate number of bytes the temporaries of a
+            single worker may use. Default is 2**27 (128 MiB).
+        softening: float or np.ndarray, optional
+            the softening length(s), see forces.direct_acceleration.
+            Default is 0.
+        kernel: str, optional
+            the softening kernel, see forces.direct_acceleration.
+            Default is 'plummer'.
+
+        Returns
+        -------
+        np.ndarray
+            the (N, D) accelerations
+        """
+        nbodies, dim = positions.shape
+        if self._pool is None or (self.kind == 'process'
+                                  and nbodies * dim > self._capacity):
+            self._start(nbodies * dim)
+        bounds = np.linspace(0, nbodies, self.workers + 1).astype(int)
+        slices = [(start, stop) for start, stop in zip(bounds[:-1],
+                                                        bounds[1:])
+                  if stop > start]
+
+        if self.kind == 'thread':
+            accelleration = np.empty(positions.shape, dtype=positions.dtype)
+
+            def work(bounds):
+                start, stop = bounds
+                accelleration[start:stop] = forces.target_acceleration(
+                    positions, masses, grav_const, slice(start, stop),
+                    memory_budget, softening, kernel)
+            list(self._pool.map(work, slices))
+            return accelleration
+
+        (shared_positions, shared_masses, shared_accelleration,
+         shared_softening) = _shared_views(self._buffers, nbodies, dim)
+        shared_positions[:] = positions
+        shared_masses[:] = masses
+        if np.ndim(softening):
+            # only a flag is sent, not the (N,) array
+            shared_softening[:] = softening
+            softening = None
+        tasks = [(nbodies, dim, start, stop, grav_const, memory_budget,
+                  softening, kernel)
+                 for start, stop in slices]
+        self._pool.map(_work, tasks)
+        return shared_accelleration.astype(positions.dtype)
+
+    def close(self):
+        """stop the workers"""
+        if self._pool is None:
+            return
+        if self.kind == 'thread':
+            self._pool.shutdown()
+        else:
+            self._pool.terminate()
+            self._pool.join()
+        self._pool = None
+
+
+# pools created by parallel_acceleration, reused across steps
+_pools = {}
+
+
+@atexit.register
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+def parallel_acceleration(positions: np.ndarray,
+                          masses: np.ndarray,
+                          grav_const: float,
+                          workers=None,
+                          kind='process',
+                          memory_budget=2 ** 27,
+                          pool=None,
+                          softening=0.0,
+                          kernel='plummer'):
+    """calculate the accelerations by direct summation on a ForcePool
+
+    Unless pool is given, a ForcePool for (workers, kind) is created on
+    the first call and reused by all later calls, so the workers are
+    only started once per simulation.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    workers: int, optional
+        the number of workers. Default is the number of CPUs.
+    kind: str, optional
+        'process' or 'thread'. Default is 'process'.
+    memory_budget: int, optional
+        the approximate number of bytes the temporaries of a single
+        worker may use. Default is 2**27 (128 MiB).
+    pool: ForcePool, optional
+        an existing pool to use instead of the shared ones
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    if pool is None:
+        key = (workers or os.cpu_count(), kind)
+        if key not in _pools:
+            _pools[key] = ForcePool(*key)
+        pool = _pools[key]
+    return pool.acceleration(positions, masses, grav_const,
+                             memory_budget=memory_budget,
+                             softening=softening, kernel=kernel)
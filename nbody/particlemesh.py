@@ -0,0 +1,287 @@
+import itertools
+import math
+import numpy as np
+from .softening import check_kernel, force_factor
+
+
+def _fourier_constant(dim):
+    """return c, so that the Fourier transform of 1/r in dim dimensions
+    is c / k**(dim - 1)"""
+    if dim < 2:
+        raise ValueError("the particle mesh needs at least 2 dimensions")
+    return (math.pi ** ((dim - 1) / 2) * 2 ** (dim - 1)
+            * math.gamma((dim - 1) / 2))
+
+
+def _cic(positions, box_size, grid):
+    """return the flat grid indices and the cloud-in-cell weights of the
+    2**D grid points around every body"""
+    nbodies, dim = positions.shape
+    scaled = np.mod(positions, box_size) * (grid / box_size)
+    base = np.floor(scaled).astype(np.intp)
+    fraction = scaled - base
+    corners = []
+    for corner in itertools.product((0, 1), repeat=dim):
+        corner = np.array(corner, dtype=bool)
+        weight = np.prod(np.where(corner, fraction, 1 - fraction), axis=1)
+        index = np.ravel_multi_index(((base + corner) % grid).T,
+                                     (grid,) * dim)
+        corners.append((index, weight))
+    return corners
+
+
+def _wavenumbers(grid, box_size, dim):
+    """return the wavenumbers of the axes of a real FFT of a grid**dim
+    grid, shaped to broadcast"""
+    spacing = box_size / grid
+    axes = []
+    for axis in range(dim):
+        if axis == dim - 1:
+            k = 2 * np.pi * np.fft.rfftfreq(grid, spacing)
+        else:
+            k = 2 * np.pi * np.fft.fftfreq(grid, spacing)
+        shape = [1] * dim
+        shape[axis] = len(k)
+        axes.append(k.reshape(shape))
+    return axes
+
+
+def mesh_acceleration(positions: np.ndarray,
+                      masses: np.ndarray,
+                      grav_const: float,
+                      box_size: float,
+                      grid=64,
+                      split=None):
+    """calculate the long-range accelerations in a periodic box with a
+    particle mesh
+
+    The masses are assigned to a grid with the cloud-in-cell scheme,
+    the potential is solved for with an FFT (with the mean density
+    subtracted, so a uniform box feels no force), differentiated with
+    a 4-point finite difference in Fourier space and interpolated back
+    to the bodies with the same cloud-in-cell weights. With split, the
+    smoothing of the two interpolations is divided out. Forces between
+    bodies closer than a few cells are too weak, see pm_acceleration
+    for the short-range correction.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies, D >= 2. They are wrapped
+        into the box.
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    box_size: float
+        the edge length of the periodic box, which spans
+        [0, box_size) in every dimension
+    grid: int, optional
+        the number of grid cells per dimension. Default is 64.
+    split: float, optional
+        if given, only the long-range part of the forces, smoothed with
+        a Gaussian of this scale in Fourier space (exp(-k^2 split^2))
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations
+    """
+    nbodies, dim = positions.shape
+    constant = _fourier_constant(dim)
+    spacing = box_size / grid
+    corners = _cic(positions, box_size, grid)
+    density = np.zeros(grid ** dim)
+    for index, weight in corners:
+        density += np.bincount(index, weights=masses * weight,
+                               minlength=grid ** dim)
+    density_k = np.fft.rfftn(density.reshape((grid,) * dim))
+
+    wavenumbers = _wavenumbers(grid, box_size, dim)
+    k2 = sum(k ** 2 for k in wavenumbers)
+    window = 1.0
+    for k in wavenumbers:
+        # np.sinc(x) is sin(pi x) / (pi x)
+        window = window * np.sinc(k * spacing / (2 * np.pi)) ** 2
+    with np.errstate(divide='ignore'):
+        green = - grav_const * constant * k2 ** ((1 - dim) / 2)
+    # the mean density does not pull
+    green[(0,) * dim] = 0
+    if split is not None:
+        # the Gaussian damps the high wavenumbers enough that the
+        # smoothing of the cloud-in-cell scheme can be divided out,
+        # without it this amplifies the aliased modes
+        green = green * np.exp(- k2 * split ** 2) / window ** 2
+    potential_k = green * density_k / spacing ** dim
+
+    accelleration = np.zeros(positions.shape)
+    for axis, k in enumerate(wavenumbers):
+        # the 4-point finite difference, an exact spectral derivative
+        # rings around every body
+        gradient = (8 * np.sin(k * spacing)
+                    - np.sin(2 * k * spacing)) / (6 * spacing)
+        field = np.fft.irfftn(-1j * gradient * potential_k,
+                              s=(grid,) * dim, axes=range(dim))
+        field = field.reshape(-1)
+        for index, weight in corners:
+            accelleration[:, axis] += weight * field[index]
+    return accelleration
+
+
+def _long_range_factor(dist, split):
+    """the force factor of the part of 1/r^2 that the mesh calculates
+    with a Gaussian split (3 dimensions)"""
+    from scipy.special import erf
+    x = dist / (2 * split)
+    return (erf(x) - 2 * x / np.sqrt(np.pi) * np.exp(-x ** 2)) / dist ** 3
+
+
+def short_range_acceleration(positions: np.ndarray,
+                             masses: np.ndarray,
+                             grav_const: float,
+                             box_size: float,
+                             split: float,
+                             cutoff=4.5,
+                             softening=0.0,
+                             kernel='plummer'):
+    """calculate the short-range accelerations in a periodic box that
+    complement mesh_acceleration with the same split
+
+    All pairs closer than cutoff * split (with the nearest periodic
+    image) are found with a periodic KD-tree and get the difference
+    between the (softened) pair force and the long-range part the mesh
+    already includes, which falls off like erfc(r / (2 split)).
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, 3) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    box_size: float
+        the edge length of the periodic box
+    split: float
+        the split scale of the mesh forces
+    cutoff: float, optional
+        the range of the short-range forces in units of split. At 4.5,
+        the neglected short-range force is below 1e-5 of the pair force.
+        Default is 4.5.
+    softening: float or np.ndarray, optional
+        the softening length(s), see forces.direct_acceleration.
+        Default is 0.
+    kernel: str, optional
+        the softening kernel, see forces.direct_acceleration.
+        Default is 'plummer'.
+
+    Raises
+    ------
+    ValueError
+        if the system is not 3-dimensional or the cutoff reaches beyond
+        half the box
+
+    Returns
+    -------
+    np.ndarray
+        the (N, 3) accelerations
+    """
+    from scipy.spatial import cKDTree
+    nbodies, dim = positions.shape
+    if dim != 3:
+        raise ValueError("the short-range split is only available in 3 "
+                         "dimensions")
+    radius = cutoff * split
+    if radius >= box_size / 2:
+        raise ValueError("cutoff * split must be less than half the box")
+    wrapped = np.mod(positions, box_size)
+    # np.mod can round tiny negative values up to box_size
+    wrapped[wrapped >= box_size] = 0
+    pairs = cKDTree(wrapped, boxsize=box_size).query_pairs(
+        radius, output_type='ndarray')
+    rows, cols = pairs[:, 0], pairs[:, 1]
+    convec = wrapped[rows] - wrapped[cols]
+    # the nearest periodic image
+    convec -= box_size * np.round(convec / box_size)
+    dist2 = (convec ** 2).sum(axis=1)
+    softening = np.asarray(softening)
+    if softening.ndim:
+        softening = np.maximum(softening[rows], softening[cols])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = (force_factor(dist2, softening, kernel)
+                  - _long_range_factor(np.sqrt(dist2), split))
+    # coincident bodies without softening do not pull each other
+    factor[~np.isfinite(factor)] = 0
+    accelleration = np.zeros(positions.shape)
+    for axis in range(dim):
+        pull = convec[:, axis] * factor
+        accelleration[:, axis] -= np.bincount(
+            rows, weights=pull * masses[cols], minlength=nbodies)
+        accelleration[:, axis] += np.bincount(
+            cols, weights=pull * masses[rows], minlength=nbodies)
+    return grav_const * accelleration
+
+
+def pm_acceleration(positions: np.ndarray,
+                    masses: np.ndarray,
+                    grav_const: float,
+                    box_size: float,
+                    grid=64,
+                    split=None,
+                    cutoff=4.5,
+                    softening=0.0,
+                    kernel='plummer'):
+    """calculate the accelerations in a periodic box with a particle
+    mesh, optionally with short-range pair forces (P3M / TreePM)
+
+    Without split, this is mesh_acceleration: O(N + G log G) for G grid
+    cells, accurate for pairs farther apart than a few cells. With
+    split (about 1 to 1.5 cells), the mesh only calculates the
+    long-range part and short_range_acceleration adds the pairs within
+    cutoff * split, so close pairs get the exact (softened) force.
+    The positions of the system are not wrapped into the box, so
+    trajectories stay continuous; wrap them with np.mod for output.
+
+    Parameters
+    ----------
+    positions: np.ndarray
+        the (N, D) positions of the bodies
+    masses: np.ndarray
+        the (N,) masses of the bodies
+    grav_const: float
+        The gravitational constant
+    box_size: float
+        the edge length of the periodic box
+    grid: int, optional
+        the number of grid cells per dimension. Default is 64.
+    split: float, optional
+        the split scale between mesh and pair forces (3 dimensions
+        only). Default is to use the mesh only.
+    cutoff: float, optional
+        the range of the pair forces in units of split. Default is 4.5.
+    softening: float or np.ndarray, optional
+        the softening length(s) of the pair forces, see
+        forces.direct_acceleration. Default is 0.
+    kernel: str, optional
+        the softening kernel of the pair forces, see
+        forces.direct_acceleration. Default is 'plummer'.
+
+    Raises
+    ------
+    ValueError
+        if kernel is unknown, or split is given and the system is not
+        3-dimensional or cutoff * split reaches beyond half the box
+
+    Returns
+    -------
+    np.ndarray
+        the (N, D) accelerations in the floating point type of positions
+    """
+    check_kernel(kernel)
+    accelleration = mesh_acceleration(positions, masses, grav_const,
+                                      box_size, grid, split)
+    if split is not None:
+        accelleration += short_range_acceleration(
+            positions, masses, grav_const, box_size, split, cutoff,
+            softening, kernel)
+    return accelleration.astype(positions.dtype, copy=False)
@@ -0,0 +1,159 @@
+import contextlib
+import time
+import tracemalloc
+
+# returned by phase() if there is no profiler
+_NO_PHASE = contextlib.nullcontext()
+
+
+def phase(profiler, name):
+    """return profiler.phase(name), or a context manager that does
+    nothing if profiler is None"""
+    if profiler is None:
+        return _NO_PHASE
+    return profiler.phase(name)
+
+
+class Profiler:
+    """collect the time spent in the phases of NBodySystem.step and
+    simulate and count steps, force evaluations and interactions
+
+    Pass a Profiler as profiler= to step, simulate or iter_simulate.
+    Without a profiler only a few None checks remain in the hot path.
+    The phases are
+        'simulate'     the Python overhead of simulate, iter_simulate
+                       and step (checks, caching, copies)
+        'integrate'    the arithmetic of the integration scheme (or the
+                       whole compiled loop of method='jit')
+        'forces'       the force backend
+        'output'       interpolating and writing snapshots, building
+                       the DataFrame
+        'checkpoint'   writing checkpoints
+        'diagnostics'  recording conserved quantities
+        'events'       merging and removing bodies (see events.BodyEvents)
+    The timings of phases are exclusive: the time of a phase does not
+    include the time of the phases that run inside of it, so the sum of
+    all timings is the total time.
+
+    Attributes
+    ----------
+    timings: dict
+        the exclusive time in s spent in every phase
+    calls: dict
+        how often every phase was entered
+    counters: dict
+        'steps', 'force_evaluations', 'interactions' (the ordered
+        pairs of bodies a direct summation evaluates, also counted for
+        approximating backends) and 'frames'
+    allocated: dict
+        the net number of bytes allocated in every phase (including the
+        phases inside of it), only if trace_memory is True
+
+    Methods
+    -------
+    phase(name)
+        a context manager that times a phase
+    count(name, value)
+        add value to a counter
+    add_hook(hook)
+        call hook(name, seconds) at the end of every phase
+    report()
+        summarize the timings and counters
+    reset()
+        clear all timings and counters
+    close()
+        stop tracing memory allocations
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        Parameters
+        ----------
+        trace_memory: bool, optional
+            trace the memory allocations with tracemalloc, which slows
+            down Python code considerably. Default is False.
+        """
+        self.trace_memory = trace_memory
+        self._hooks = []
+        # the time spent in the phases inside of every open phase
+        self._inner = []
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.reset()
+
+    def reset(self):
+        """clear all timings and counters"""
+        self.timings = {}
+        self.calls = {}
+        self.allocated = {}
+        self.counters = {'steps': 0,
+                         'force_evaluations': 0,
+                         'interactions': 0,
+                         'frames': 0}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def add_hook(self, hook):
+        """call hook(name, seconds) with the name and the (inclusive)
+        duration of every phase when it ends, e.g. to export metrics"""
+        self._hooks.append(hook)
+
+    def count(self, name, value=1):
+        """add value to the counter name"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """a context manager that adds the time spent inside of it to
+        the phase name"""
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+        self._inner.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self._inner.pop()
+            if self._inner:
+                self._inner[-1] += elapsed
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - inner
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.trace_memory:
+                self.allocated[name] = (self.allocated.get(name, 0)
+                                        + tracemalloc.get_traced_memory()[0]
+                                        - memory)
+            for hook in self._hooks:
+                hook(name, elapsed)
+
+    def report(self):
+        """summarize the timings and counters
+
+        Returns
+        -------
+        dict
+            the timings, calls and counters, the total time in s,
+            steps_per_s and interactions_per_s and, if trace_memory is
+            True, the allocations and the peak_memory in bytes
+        """
+        total = sum(self.timings.values())
+        report = {'timings': dict(self.timings),
+                  'calls': dict(self.calls),
+                  'counters': dict(self.counters),
+                  'total_time': total,
+                  'steps_per_s': self.counters['steps'] / total
+                  if total else 0.0,
+                  'interactions_per_s': self.counters['interactions'] / total
+                  if total else 0.0}
+        if self.trace_memory:
+            report['allocated'] = dict(self.allocated)
+            report['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        return report
+
+    def close(self):
+        """stop tracing memory allocations if this profiler started it"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,179 @@
+import json
+import os
+import numpy as np
+from . import nbodysystem
+from .bodyview import NameIndex
+
+# a snapshot file starts with MAGIC, the format version and the length of
+# a JSON header (both little-endian uint32), followed by the header and
+# the arrays in the floating point type of the positions. The arrays
+# start at multiples of ALIGNMENT bytes so they can be memory-mapped.
+MAGIC = b'NBODYSNP'
+VERSION = 1
+ALIGNMENT = 64
+_PREFIX = len(MAGIC) + 8
+
+
+def _cache_header(system):
+    """describe the forces cache of system for the header, or return
+    None if its settings can not be stored"""
+    if system._forces is None:
+        return None
+    settings, positions, velocities, masses, forces = system._forces
+    if not (np.array_equal(positions, system.all_positions)
+            and np.array_equal(velocities, system.all_velocities)
+            and np.array_equal(masses, system.all_masses)):
+        return None
+    integrator, grav_const, method, options = settings
+    try:
+        settings = json.loads(json.dumps(
+            {'integrator': integrator, 'grav_const': grav_const,
+             'method': method, 'options': options}))
+    except (TypeError, ValueError):
+        # e.g. options holding arrays or pools
+        return None
+    arrays = forces if isinstance(forces, tuple) else (forces,)
+    settings['tuple'] = isinstance(forces, tuple)
+    settings['arrays'] = len(arrays)
+    return settings
+
+
+def save_snapshot(system, path):
+    """write the full state of an NBodySystem into a snapshot file
+
+    The file holds the positions, velocities and masses, the names of
+    the bodies in row order, the simulation time, whether the velocities
+    lag half a step behind the positions and, if the settings can be
+    stored, the forces a step has cached for the current state, so a
+    loaded system continues bit-identically. The file is written to a
+    temporary file first and then renamed, so a crash while writing
+    never leaves a broken snapshot behind.
+
+    Parameters
+    ----------
+    system: NBodySystem
+        the system to save
+    path: str
+        the snapshot file
+    """
+    path = str(path)
+    nbodies, dim = system.all_positions.shape
+    dtype = system.all_positions.dtype.newbyteorder('<')
+    cache = _cache_header(system)
+    arrays = [system.all_positions, system.all_velocities, system.all_masses]
+    if cache is not None:
+        forces = system._forces[4]
+        arrays.extend(forces if cache['tuple'] else [forces])
+    header = {'bodies': nbodies,
+              'dim': dim,
+              'names': system.name_index.names.tolist(),
+              'time': float(system.time),
+              'staggered': bool(system.staggered),
+              'dtype': dtype.str,
+              'forces': cache}
+    header = json.dumps(header).encode()
+    # pad the header so the arrays are aligned
+    header += b' ' * (-(_PREFIX + len(header)) % ALIGNMENT)
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.array([VERSION, len(header)], dtype='<u4').tobytes())
+        file.write(header)
+        for array in arrays:
+            data = np.ascontiguousarray(array, dtype=dtype).tobytes()
+            file.write(data + b'\0' * (-len(data) % ALIGNMENT))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def read_header(path):
+    """read the header of a snapshot file
+
+    Parameters
+    ----------
+    path: str
+        the snapshot file
+
+    Raises
+    ------
+    ValueError
+        if path is not a snapshot file or has an unknown version
+
+    Returns
+    -------
+    tuple
+        (header, offset) with the header dict and the offset of the
+        first array in bytes
+    """
+    with open(str(path), 'rb') as file:
+        prefix = file.read(_PREFIX)
+        if len(prefix) < _PREFIX or prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(str(path) + " is not an nbody snapshot")
+        version, length = np.frombuffer(prefix[len(MAGIC):], dtype='<u4')
+        if version != VERSION:
+            raise ValueError("unsupported snapshot version " + str(version)
+                             + ", expected " + str(VERSION))
+        header = json.loads(file.read(int(length)))
+    return header, _PREFIX + int(length)
+
+
+def load_snapshot(path, mmap_mode=None):
+    """create an NBodySystem from a snapshot file
+
+    Parameters
+    ----------
+    path: str
+        the snapshot file written by save_snapshot
+    mmap_mode: str, optional
+        if given ('r', 'r+' or 'c', see np.memmap), the positions,
+        velocities and masses are memory maps of the file instead of
+        arrays in memory. step replaces the positions and velocities
+        by new arrays, so 'r' is enough to continue a simulation.
+
+    Raises
+    ------
+    ValueError
+        if path is not a snapshot file or has an unknown version
+
+    Returns
+    -------
+    NBodySystem
+        the saved system, with its simulation time, phase and forces
+        cache
+    """
+    path = str(path)
+    header, offset = read_header(path)
+    nbodies, dim = header['bodies'], header['dim']
+    dtype = np.dtype(header['dtype'])
+    shapes = [(nbodies, dim), (nbodies, dim), (nbodies,)]
+    cache = header['forces']
+    if cache is not None:
+        shapes.extend([(nbodies, dim)] * cache['arrays'])
+
+    arrays = []
+    for shape in shapes:
+        if mmap_mode is None:
+            array = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                offset=offset).reshape(shape)
+        else:
+            array = np.memmap(path, dtype=dtype, mode=mmap_mode,
+                              offset=offset, shape=shape)
+        arrays.append(array)
+        size = int(np.prod(shape)) * dtype.itemsize
+        offset += size + (-size % ALIGNMENT)
+
+    positions, velocities, masses = arrays[:3]
+    system = nbodysystem.NBodySystem(positions, velocities, masses,
+                                     NameIndex(header['names']),
+                                     not_yet_initialized=False)
+    system.time = header['time']
+    system.staggered = header['staggered']
+    if cache is not None:
+        forces = tuple(arrays[3:]) if cache['tuple'] else arrays[3]
+        settings = (cache['integrator'], cache['grav_const'],
+                    cache['method'], cache['options'])
+        system._forces = (settings, positions.copy(), velocities.copy(),
+                          masses.copy(), forces)
+    return system
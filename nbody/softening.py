@@ -0,0 +1,152 @@
+import numpy as np
+
+# the softening kernels of the force backends
+KERNELS = ('plummer', 'spline')
+# the cubic spline kernel is exactly Newtonian beyond this many
+# softening lengths, so its softening length matches the Plummer one
+SPLINE_SUPPORT = 2.8
+
+
+def check_kernel(kernel):
+    """raise a ValueError if kernel is not one of KERNELS"""
+    if kernel not in KERNELS:
+        raise ValueError("unknown softening kernel " + repr(kernel)
+                         + ", choose one of " + ", ".join(KERNELS))
+
+
+def pair_softening(softening, rows, cols):
+    """return the softening lengths of the pairs of the bodies rows and
+    the bodies cols
+
+    Parameters
+    ----------
+    softening: float or np.ndarray
+        a global softening length or the (N,) softening lengths of the
+        bodies
+    rows, cols: slice or np.ndarray
+        select the bodies of both sides of the pairs
+
+    Returns
+    -------
+    float or np.ndarray
+        softening itself if it is global, else the (R, C) array with the
+        larger softening length of the two bodies of every pair
+    """
+    if np.ndim(softening) == 0:
+        return softening
+    return np.maximum(softening[rows, None], softening[None, cols])
+
+
+def force_factor(dist2, softening=0.0, kernel='plummer', derivative=False):
+    """return the factor f(r) of the pairwise accelerations
+    a_i = -G sum_j m_j (x_i - x_j) f(|x_i - x_j|)
+
+    f is 1/r^3 for point masses. The 'plummer' kernel uses
+    1/(r^2 + eps^2)^(3/2), the 'spline' kernel is the cubic spline of
+    Monaghan & Lattanzio (1985) as used in GADGET, which is exactly
+    Newtonian beyond SPLINE_SUPPORT * eps. Pairs at an infinite
+    distance get 0, unsoftened pairs at distance 0 get inf.
+
+    Parameters
+    ----------
+    dist2: np.ndarray
+        the squared distances of the pairs
+    softening: float or np.ndarray, optional
+        the softening lengths of the pairs, see pair_softening.
+        Default is 0.
+    kernel: str, optional
+        'plummer' or 'spline'. Default is 'plummer'.
+    derivative: bool, optional
+        also return f'(r) / r, which the jerk needs. Default is False.
+
+    Returns
+    -------
+    np.ndarray or tuple
+        f, or (f, f'(r) / r) if derivative is True
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the pairs are evaluated in the floating point type of dist2
+        softening = np.asarray(softening, dtype=dist2.dtype)
+        if kernel == 'plummer':
+            softened2 = dist2 + np.square(softening)
+            factor = softened2 ** -1.5
+            if derivative:
+                return factor, -3 * factor / softened2
+            return factor
+
+        check_kernel(kernel)
+        h = SPLINE_SUPPORT * softening
+        dist = np.sqrt(dist2)
+        u = dist / h
+        inner = u < 0.5
+        middle = (u >= 0.5) & (u < 1)
+        factor = np.where(
+            inner, 32 / 3 + u ** 2 * (32 * u - 38.4),
+            np.where(middle, (64 / 3 - 48 * u + 38.4 * u ** 2
+                              - 32 / 3 * u ** 3 - 1 / (15 * u ** 3)),
+                     0)) / h ** 3
+        factor = np.where(inner | middle, factor, dist2 ** -1.5)
+        if not derivative:
+            return factor
+        slope = np.where(
+            inner, 96 * u - 76.8,
+            np.where(middle, -48 / u + 76.8 - 32 * u + 0.2 / u ** 5,
+                     0)) / h ** 5
+        slope = np.where(inner | middle, slope, -3 * dist2 ** -2.5)
+        return factor, slope
+
+
+def potential_factor(dist2, softening=0.0, kernel='plummer'):
+    """return the factor p(r) of the pair potential energies
+    -G m_i m_j p(|x_i - x_j|) that belongs to force_factor
+
+    p is 1/r for point masses and 1/sqrt(r^2 + eps^2) for the 'plummer'
+    kernel. Pairs at an infinite distance get 0.
+
+    Parameters
+    ----------
+    dist2: np.ndarray
+        the squared distances of the pairs
+    softening: float or np.ndarray, optional
+        the softening lengths of the pairs. Default is 0.
+    kernel: str, optional
+        'plummer' or 'spline'. Default is 'plummer'.
+
+    Returns
+    -------
+    np.ndarray
+        p
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        softening = np.asarray(softening, dtype=dist2.dtype)
+        if kernel == 'plummer':
+            return (dist2 + np.square(softening)) ** -0.5
+
+        check_kernel(kernel)
+        h = SPLINE_SUPPORT * softening
+        dist = np.sqrt(dist2)
+        u = dist / h
+        inner = u < 0.5
+        middle = (u >= 0.5) & (u < 1)
+        factor = np.where(
+            inner, 2.8 - u ** 2 * (16 / 3 + u ** 2 * (6.4 * u - 9.6)),
+            np.where(middle, (3.2 - 1 / (15 * u) - u ** 2
+                              * (32 / 3 + u * (-16 + u * (9.6 - 32 / 15
+                                                          * u)))),
+                     0)) / h
+        return np.where(inner | middle, factor, 1 / dist)
+
+
+def weighted_sum(subscripts, convec, weights):
+    """return np.einsum(subscripts, convec, weights), where the infinite
+    weights of coincident bodies without softening contribute nothing
+
+    The weights are only searched for infinite values if the sum is not
+    finite, so the common case needs no pass over all pairs.
+    """
+    result = np.einsum(subscripts, convec, weights)
+    if not np.isfinite(result).all():
+        # coincident bodies without softening do not pull each other
+        weights = np.where(np.isinf(weights), 0, weights)
+        result = np.einsum(subscripts, convec, weights)
+    return result
@@ -0,0 +1,12 @@
+from ..nbodysystem import NBodySystem
+from ..pointmass import PointMass
+import numpy as np
+
+
+def random_system(nbodies=10, dim=3, seed=0):
+    """a random system of the bodies b0, b1, ... with masses between 1
+    and 2, normally distributed positions and slow velocities"""
+    rng = np.random.default_rng(seed)
+    bodies = [PointMass('b' + str(i), rng.uniform(1, 2), rng.normal(size=dim),
+                        rng.normal(size=dim) * 0.1) for i in range(nbodies)]
+    return NBodySystem(*bodies)
@@ -0,0 +1,41 @@
+from ..barneshut import BarnesHutTree, barneshut_acceleration
+from ..forces import direct_acceleration
+import numpy as np
+
+
+class TestBarnesHutTree():
+
+    def test_init(self):
+        rng = np.random.default_rng(0)
+        positions = rng.normal(size=(100, 3))
+        masses = rng.uniform(1, 2, size=100)
+        tree = BarnesHutTree(positions, masses, leaf_size=4)
+        assert np.isclose(tree.node_masses[0], masses.sum())
+        com = (positions * masses[:, None]).sum(axis=0) / masses.sum()
+        assert np.allclose(tree.node_coms[0], com)
+        leaves = [b for b in tree.leaf_bodies if b is not None]
+        assert max(len(b) for b in leaves) <= 4
+        assert sorted(np.concatenate(leaves)) == list(range(100))
+
+    def test_acceleration_theta_zero(self):
+        rng = np.random.default_rng(1)
+        positions = rng.normal(size=(200, 2))
+        masses = rng.uniform(1, 2, size=200)
+        tree = BarnesHutTree(positions, masses)
+        acc = tree.acceleration(grav_const=1, theta=0)
+        assert np.allclose(acc, direct_acceleration(positions, masses, 1))
+
+    def test_barneshut_acceleration(self):
+        rng = np.random.default_rng(2)
+        positions = rng.normal(size=(500, 3))
+        masses = rng.uniform(1, 2, size=500)
+        acc = barneshut_acceleration(positions, masses, 1, theta=0.5)
+        direct = direct_acceleration(positions, masses, 1)
+        error = np.linalg.norm(acc - direct, axis=1)
+        assert np.median(error / np.linalg.norm(direct, axis=1)) < 1e-2
+
+    def test_coincident_bodies(self):
+        positions = np.zeros((20, 3))
+        masses = np.ones(20)
+        acc = barneshut_acceleration(positions, masses, 1, leaf_size=2)
+        assert (acc == 0).all()
@@ -0,0 +1,91 @@
+from ..bodyview import NameIndex
+from ..nbodysystem import NBodySystem
+from .helpers import random_system
+import numpy as np
+import pytest
+
+
+class TestNameIndex():
+
+    def test_rows(self):
+        index = NameIndex(['c', 'a', 'b'])
+        assert index.rows('a') == 1
+        assert (index.rows(['b', 'c', 'a']) == [2, 0, 1]).all()
+        assert (index.rows(np.array(['b', 'b'])) == [2, 2]).all()
+        assert 'b' in index and 'd' not in index
+        with pytest.raises(KeyError, match='d'):
+            index.rows(['a', 'd'])
+        with pytest.raises(KeyError):
+            index.rows(1)
+        assert index.to_dict() == {'c': 0, 'a': 1, 'b': 2}
+
+    def test_ids(self):
+        ids = np.random.default_rng(0).permutation(10 ** 6)
+        index = NameIndex(ids)
+        query = ids[::1000]
+        assert (index.rows(query) == np.arange(0, 10 ** 6, 1000)).all()
+        with pytest.raises(KeyError):
+            index.rows([10 ** 6])
+
+    def test_invalid(self):
+        with pytest.raises(AttributeError, match='b'):
+            NameIndex(['a', 'b', 'b'])
+        with pytest.raises(AttributeError, match='a'):
+            NameIndex(['a', 1, 'a'])
+
+    def test_hashable_names(self):
+        # tuples and names that can not be sorted are looked up in a dict
+        index = NameIndex([('a', 1), ('b', 2)])
+        assert index.rows(('b', 2)) == 1
+        assert (index.rows([('b', 2), ('a', 1)]) == [1, 0]).all()
+        index = NameIndex(['a', 1, 2.5])
+        assert index.rows(1) == 1
+        assert (index.rows(['a', 2.5]) == [0, 2]).all()
+        assert 'b' not in index
+        index.append([('c', 3)])
+        assert index.to_dict() == {'a': 0, 1: 1, 2.5: 2, ('c', 3): 3}
+        system = NBodySystem.from_arrays(np.eye(2), np.eye(2), [1., 2],
+                                         [('x', 0), 'y'])
+        assert system.get_body(('x', 0)).mass == 1
+
+
+class TestBodyView():
+
+    def test_single(self):
+        system = random_system()
+        view = system.select('b3')
+        assert view.names == 'b3' and len(view) == 1
+        assert np.shares_memory(view.positions, system.all_positions)
+        view.velocities += 1
+        assert (system.all_velocities[3] == view.velocities).all()
+        view.masses = 5
+        assert system.all_masses[3] == 5
+        system.step(0.1, grav_const=1)
+        # the view follows the new arrays of the system
+        assert (view.positions == system.all_positions[3]).all()
+
+    def test_many(self):
+        system = random_system()
+        view = system.select(['b2', 'b3', 'b4'])
+        assert isinstance(view.rows, slice)
+        assert np.shares_memory(view.positions, system.all_positions)
+        view = system.select(['b7', 'b1'])
+        assert (view.names == ['b7', 'b1']).all()
+        assert (view.positions == system.all_positions[[7, 1]]).all()
+        view.positions = 0
+        assert (system.all_positions[[7, 1]] == 0).all()
+        view.masses *= 2
+        assert (view.masses == system.all_masses[[7, 1]]).all()
+
+    def test_copy(self):
+        system = random_system()
+        system.step(0.1, grav_const=1)
+        subset = system.select(['b5', 'b2']).copy()
+        assert subset.bodyindex == {'b5': 0, 'b2': 1}
+        assert (subset.all_positions == system.all_positions[[5, 2]]).all()
+        assert subset.time == system.time
+        subset.all_positions[0] = 0
+        assert (system.all_positions[5] != 0).all()
+        body = system.get_body('b5')
+        body.position[0] = 100
+        assert system.all_positions[5, 0] != 100
@@ -0,0 +1,65 @@
+from ..nbodysystem import NBodySystem
+from ..pointmass import PointMass
+from ..diagnostics import DiagnosticsLog
+import numpy as np
+import pytest
+
+
+def circular_orbit():
+    """two unit masses on a circular orbit of radius 1 (G=1)"""
+    body1 = PointMass('b1', 1, np.array([1., 0, 0]), np.array([0, 0.5, 0]))
+    body2 = PointMass('b2', 1, np.array([-1., 0, 0]), np.array([0, -0.5, 0]))
+    return NBodySystem(body1, body2)
+
+
+class TestDiagnostics():
+
+    def test_conserved_quantities(self):
+        system = circular_orbit()
+        quantities = system.conserved_quantities(grav_const=1)
+        assert quantities['kinetic'] == 0.25
+        assert quantities['potential'] == -0.5
+        assert quantities['energy'] == -0.25
+        assert (quantities['momentum'] == 0).all()
+        assert (quantities['angular_momentum'] == [0, 0, 1]).all()
+        assert quantities['virial_ratio'] == 1
+        planar = NBodySystem.from_arrays(system.all_positions[:, :2],
+                                         system.all_velocities[:, :2],
+                                         system.all_masses)
+        assert planar.angular_momentum() == 1
+
+    def test_staggered(self):
+        system = NBodySystem.from_arrays([[1., 0], [-1, 0]],
+                                         [[0.2, 0.3], [-0.2, -0.3]], [1, 1])
+        energy = system.conserved_quantities(grav_const=1)['energy']
+        system.step(0.1, grav_const=1, halfstep=True)
+        for i in range(5):
+            system.step(0.1, grav_const=1)
+        synchronized = system.conserved_quantities(grav_const=1, dt=0.1)
+        staggered = system.conserved_quantities(grav_const=1)
+        assert np.isclose(synchronized['energy'], energy, rtol=1e-4)
+        assert not np.isclose(staggered['energy'], energy, rtol=1e-3)
+
+    def test_simulate(self):
+        system = circular_orbit()
+        log = DiagnosticsLog(every='250ms')
+        system.simulate(end='1s', step='100ms', grav_const=1,
+                        diagnostics=log)
+        # every 3 steps, plus the start and the end
+        assert np.allclose(log.times, [0, 0.3, 0.6, 0.9, 1])
+        assert log.momentum.shape == (5, 3)
+        assert log.energy_drift() < 1e-3
+        assert not log.aborted
+        assert list(log.to_frame().columns[:3]) == ['kinetic', 'potential',
+                                                    'energy']
+
+    def test_abort(self):
+        system = circular_orbit()
+        log = DiagnosticsLog(every='1s', max_energy_drift=1e-3)
+        with pytest.warns(RuntimeWarning, match='energy drift'):
+            results = system.simulate(end='100s', step='1s', grav_const=1,
+                                      integrator='kdk', diagnostics=log)
+        assert log.aborted
+        assert log.energy_drift() > 1e-3
+        assert len(results) == len(log) - 1
+        assert system.time == log.times[-1] < 100
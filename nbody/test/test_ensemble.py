@@ -0,0 +1,79 @@
+from ..ensemble import NBodyEnsemble
+from ..nbodysystem import NBodySystem
+from ..pointmass import PointMass
+import numpy as np
+import pytest
+
+
+def three_body(offset):
+    body1 = PointMass('b1', 1, np.array([1, offset, 0]), np.array([0, 1, 1]))
+    body2 = PointMass('b2', 2, np.array([0, 0, 0]), np.array([0, 1, 1]))
+    body3 = PointMass('b3', 1, np.array([-1, 0, 0]), np.array([0, 1, 1]))
+    return NBodySystem(body1, body2, body3)
+
+
+def two_body():
+    body1 = PointMass('a', 1, np.array([1, 0, 0]), np.array([0, 0.5, 0]))
+    body2 = PointMass('b', 1, np.array([-1, 0, 0]), np.array([0, -0.5, 0]))
+    return NBodySystem(body1, body2)
+
+
+class TestNBodyEnsemble():
+
+    def test_init(self):
+        ensemble = NBodyEnsemble(three_body(0), two_body())
+        assert ensemble.all_positions.shape == (2, 3, 3)
+        compare = ensemble.mask == np.array([[1, 1, 1], [1, 1, 0]])
+        assert compare.all()
+        assert ensemble.all_masses[1, 2] == 0
+        assert ensemble.bodyindices[1] == {'a': 0, 'b': 1}
+
+    def test_init_different_dimensions(self):
+        body = PointMass('b1', 1, np.array([1, 0]), np.array([0, 1]))
+        with pytest.raises(ValueError):
+            NBodyEnsemble(three_body(0), NBodySystem(body))
+
+    def test_step(self):
+        systems = [three_body(0.1), two_body(), three_body(0.5)]
+        ensemble = NBodyEnsemble(*systems, memory_budget=1000)
+        ensemble.step(dt=0.1, grav_const=1, halfstep=True)
+        ensemble.step(dt=0.1, grav_const=1)
+        for i, system in enumerate(systems):
+            system.step(dt=0.1, grav_const=1, halfstep=True)
+            system.step(dt=0.1, grav_const=1)
+            member = ensemble.member(i)
+            assert np.allclose(member.all_positions, system.all_positions)
+            assert np.allclose(member.all_velocities, system.all_velocities)
+        # the padding does not move
+        assert (ensemble.all_positions[1, 2] == 0).all()
+
+    def test_simulate(self):
+        system = three_body(0.1)
+        results = system.simulate(end='1s', step='100ms', grav_const=1,
+                                  stride=2)
+        ensemble = NBodyEnsemble(three_body(0.1), two_body())
+        times, trajectories = ensemble.simulate(end='1s', step='100ms',
+                                                grav_const=1, stride=2)
+        assert np.allclose(times, [0, 0.2, 0.4, 0.6, 0.8, 1])
+        assert trajectories[0].shape == (6, 3, 3)
+        assert trajectories[1].shape == (6, 2, 3)
+        assert np.allclose(trajectories[0].reshape((6, 9)), results.values)
+
+    @pytest.mark.parametrize('kernel', ['plummer', 'spline'])
+    def test_softening(self, kernel):
+        # a member with a body at the position of its padding
+        origin = NBodySystem(PointMass('c', 1, np.zeros(3), np.zeros(3)),
+                             PointMass('d', 2, np.array([1, 0, 0]),
+                                       np.zeros(3)))
+        systems = [three_body(0), origin]
+        lengths = np.array([[0.1, 0.3, 0.2], [0.2, 0.4, 0.0]])
+        ensemble = NBodyEnsemble(*systems)
+        ensemble.step(dt=0.1, grav_const=1, softening=lengths,
+                      kernel=kernel)
+        for i, system in enumerate(systems):
+            n = len(system.all_masses)
+            system.step(dt=0.1, grav_const=1, softening=lengths[i, :n],
+                        kernel=kernel)
+            member = ensemble.member(i)
+            assert np.allclose(member.all_velocities, system.all_velocities)
+        assert np.isfinite(ensemble.all_velocities).all()
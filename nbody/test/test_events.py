@@ -0,0 +1,84 @@
+from ..events import BodyEvents
+from ..nbodysystem import NBodySystem
+import numpy as np
+
+
+def collision_system():
+    # b0 and b1 collide head-on, b2 and b3 are far away
+    return NBodySystem.from_arrays([[-0.05, 0], [0.05, 0], [5, 0], [-5, 0]],
+                                   [[1, 0], [-0.5, 0.2], [0, 0.1],
+                                    [0, -0.1]],
+                                   [1., 2, 1, 1],
+                                   ['b0', 'b1', 'b2', 'b3'])
+
+
+class TestBodyEvents():
+
+    def test_merge(self):
+        system = collision_system()
+        momentum = system.momentum()
+        mass = system.all_masses.sum()
+        events = BodyEvents(capture_radius=0.2)
+        system.step(0.01, grav_const=1, integrator='kdk', events=events)
+        assert len(system.all_masses) == 3
+        assert system.all_masses.sum() == mass
+        assert np.allclose(system.momentum(), momentum)
+        # the more massive body survives, b3 moved into the row of b0
+        assert system.bodyindex == {'b3': 0, 'b1': 1, 'b2': 2}
+        assert events.merges == [(0.01, 'b1', ['b0'])]
+        assert (events.source == [3, 1, 2]).all()
+        assert system.select('b1').masses == 3
+
+    def test_chain(self):
+        positions = np.array([[0., 0], [0.15, 0], [0.3, 0], [3, 3]])
+        system = NBodySystem.from_arrays(positions, np.zeros((4, 2)),
+                                         [1., 1, 3, 1])
+        events = BodyEvents(capture_radius=0.2)
+        events.apply(system, 1)
+        assert system.bodyindex == {2: 0, 3: 1}
+        assert events.merges == [(0.0, 2, [0, 1])]
+        assert np.allclose(system.all_positions[0], [0.21, 0])
+        assert np.allclose(system.all_masses, [5, 1])
+
+    def test_escape(self):
+        system = NBodySystem.from_arrays([[0, 0], [0.1, 0], [10, 0],
+                                          [0, -10]],
+                                         [[0, 0], [0, 0], [5, 0], [0, 0]],
+                                         [1., 1, 0.01, 0.01],
+                                         ['a', 'b', 'fast', 'slow'])
+        events = BodyEvents(escape_radius=5)
+        events.apply(system, 1)
+        assert 'fast' not in system.name_index
+        assert 'slow' in system.name_index
+        assert events.escapes == [(0.0, 'fast')]
+        assert (events.to_frame()['event'] == ['escape']).all()
+
+    def test_simulate(self):
+        system = collision_system()
+        lengths = np.array([0.01, 0.02, 0.03, 0.04])
+        events = BodyEvents(capture_radius=0.2, escape_radius=100)
+        results = system.simulate(end='100ms', step='10ms', grav_const=1,
+                                  sample_every='15ms', events=events,
+                                  softening=lengths)
+        assert list(results.columns.levels[0]) == ['b0', 'b1', 'b2', 'b3']
+        assert results['b0'].iloc[1:].isna().all().all()
+        assert results['b1'].notna().all().all()
+        assert results['b3'].notna().all().all()
+        # b3 moved into the row of b0, its positions stay continuous
+        steps = np.abs(np.diff(results['b3'].values, axis=0)).max()
+        assert steps < 0.01
+        frame = events.to_frame()
+        assert frame['name'].tolist() == ['b1']
+        assert frame['absorbed'].tolist() == [['b0']]
+        assert all(type(event[0]) is float for event in events.merges)
+
+    def test_event_times(self):
+        system = NBodySystem.from_arrays([[0, 0], [0.1, 0], [10, 0]],
+                                         [[0, 0], [0, 0], [5, 0]],
+                                         [1., 1, 0.01],
+                                         ['a', 'b', 'fast'])
+        events = BodyEvents(escape_radius=10.2)
+        system.simulate(end='100ms', step='10ms', grav_const=1,
+                        sample_every='15ms', events=events)
+        assert [name for time, name in events.escapes] == ['fast']
+        assert type(events.escapes[0][0]) is float
@@ -0,0 +1,67 @@
+from ..forces import acceleration, direct_acceleration, blocked_acceleration
+from ..forces import potential_energy
+from .. import jit
+import numpy as np
+import pytest
+
+
+class TestForces():
+
+    def test_direct_acceleration(self):
+        positions = np.array([[1., 0, 0], [0, 0, 0], [-1, 0, 0]])
+        masses = np.array([1., 2, 1])
+        acc = direct_acceleration(positions, masses, 1)
+        compare = acc == np.array([[-2.25, 0, 0], [0, 0, 0], [2.25, 0, 0]])
+        assert compare.all()
+
+    def test_acceleration_unknown_method(self):
+        positions = np.array([[1., 0], [0, 0]])
+        masses = np.array([1., 1])
+        with pytest.raises(ValueError):
+            acceleration(positions, masses, 1, method='unknown')
+
+    def test_blocked_acceleration(self):
+        rng = np.random.default_rng(0)
+        positions = rng.normal(size=(300, 3))
+        positions[1] = positions[0]
+        masses = rng.uniform(1, 2, size=300)
+        direct = direct_acceleration(positions, masses, 1)
+        # a budget this small forces blocks of a few bodies
+        blocked = blocked_acceleration(positions, masses, 1,
+                                       memory_budget=10000)
+        assert np.allclose(blocked, direct)
+        blocked = blocked_acceleration(positions, masses, 1)
+        assert np.allclose(blocked, direct)
+
+    def test_potential_energy(self):
+        positions = np.array([[1., 0], [0, 0], [-1, 0], [-1, 0]])
+        masses = np.array([1., 2, 1, 3])
+        # the coincident bodies 2 and 3 are skipped
+        expected = -(2 + 1 / 2 + 3 / 2 + 2 + 6)
+        assert np.isclose(potential_energy(positions, masses, 1), expected)
+        assert np.isclose(potential_energy(positions, masses, 1,
+                                           memory_budget=100), expected)
+
+    @pytest.mark.parametrize('method, options', [
+        ('direct', {}),
+        ('blocked', {'memory_budget': 10000}),
+        ('parallel', {'workers': 2, 'kind': 'thread'}),
+        ('barneshut', {'theta': 0}),
+        pytest.param('jit', {}, marks=pytest.mark.skipif(
+            not jit.HAVE_NUMBA, reason='numba is not installed'))])
+    def test_float32(self, method, options):
+        rng = np.random.default_rng(0)
+        positions = rng.normal(size=(100, 3))
+        masses = rng.uniform(1, 2, size=100)
+        expected = direct_acceleration(positions, masses, 1, softening=0.01)
+        scale = np.abs(expected).max()
+        acc = acceleration(positions.astype(np.float32),
+                           masses.astype(np.float32), 1, method=method,
+                           softening=0.01, **options)
+        assert acc.dtype == np.float32
+        assert np.allclose(acc, expected, rtol=0, atol=1e-4 * scale)
+        # mixed precision: float32 forces for float64 positions
+        acc = acceleration(positions, masses, 1, method=method,
+                           dtype=np.float32, softening=0.01, **options)
+        assert acc.dtype == np.float64
+        assert np.allclose(acc, expected, rtol=0, atol=1e-4 * scale)
@@ -0,0 +1,53 @@
+from ..nbodysystem import _nanoseconds, gravitational_constant
+import numpy as np
+import pandas as pd
+import pytest
+import subprocess
+import sys
+
+# a short simulation into a sink, which needs neither pandas nor scipy
+SIMULATION = """
+import sys
+import numpy as np
+import nbody
+from nbody.output import ArraySink
+system = nbody.NBodySystem.from_arrays(np.eye(3), np.zeros((3, 3)),
+                                       np.ones(3))
+system.simulate(end='1s', step='100ms', grav_const=1, sink=ArraySink(),
+                method='blocked', integrator='kdk')
+print(sorted(name for name in ('pandas', 'scipy', 'numba')
+             if name in sys.modules))
+"""
+
+
+def run(*args):
+    return subprocess.run([sys.executable, *args], capture_output=True,
+                          text=True, check=True)
+
+
+class TestImport():
+
+    def test_lazy_imports(self):
+        assert run('-c', SIMULATION).stdout.strip() == '[]'
+
+    def test_import_time(self):
+        # -X importtime reports the cumulative time of every module in
+        # microseconds; nbody itself must cost less than numpy
+        report = run('-X', 'importtime', '-c', 'import nbody').stderr
+        cumulative = {}
+        for line in report.splitlines()[1:]:
+            columns = line.split('|')
+            cumulative[columns[2].strip()] = int(columns[1])
+        assert cumulative['nbody'] - cumulative['numpy'] < \
+            cumulative['numpy']
+
+    def test_gravitational_constant(self):
+        from scipy.constants import gravitational_constant as expected
+        assert gravitational_constant == expected
+
+    @pytest.mark.parametrize('value', ['1s', '100ms', '0.1s', '1.5 h',
+                                       '2D', '3min', '10us', '-5m', 250,
+                                       np.timedelta64(3, 'ms'), '1 days',
+                                       '1h30m', pd.Timedelta('2s')])
+    def test_nanoseconds(self, value):
+        assert _nanoseconds(value) == pd.Timedelta(value).value
@@ -0,0 +1,96 @@
+from ..integrators import INTEGRATORS, block_step, kdk_step
+from ..forces import acceleration_jerk, direct_acceleration
+import numpy as np
+
+
+def binary_and_field():
+    """a tight binary in a field of distant bodies"""
+    rng = np.random.default_rng(0)
+    positions = np.concatenate(([[0.01, 0, 0], [-0.01, 0, 0]],
+                                rng.uniform(-10, 10, size=(8, 3))))
+    velocities = np.zeros((10, 3))
+    velocities[0, 1] = np.sqrt(0.5 / 0.02) / 2 * np.sqrt(2)
+    velocities[1, 1] = - velocities[0, 1]
+    masses = np.concatenate(([0.5, 0.5], np.full(8, 0.1)))
+    return positions, velocities, masses
+
+
+class TestIntegrators():
+
+    def test_acceleration_jerk(self):
+        positions, velocities, masses = binary_and_field()
+        acc, jerk = acceleration_jerk(positions, velocities, masses, 1)
+        assert np.allclose(acc, direct_acceleration(positions, masses, 1))
+        # compare the jerk to a finite difference of the acceleration
+        h = 1e-6
+        later = direct_acceleration(positions + velocities * h, masses, 1)
+        earlier = direct_acceleration(positions - velocities * h, masses, 1)
+        difference = (later - earlier) / (2 * h)
+        assert np.allclose(jerk, difference, rtol=1e-4,
+                           atol=1e-6 * np.abs(jerk).max())
+
+    def test_block_step(self):
+        positions, velocities, masses = binary_and_field()
+        pos, vel, forces = block_step(positions, velocities, masses, 0.01,
+                                      1, eta=0.01)
+        # reference: synchronized leapfrog with the smallest timestep
+        ref_pos, ref_vel = positions.copy(), velocities.copy()
+        dt = 0.01 / 2 ** 10
+        acc = direct_acceleration(ref_pos, masses, 1)
+        for i in range(2 ** 10):
+            ref_vel += acc * dt / 2
+            ref_pos += ref_vel * dt
+            acc = direct_acceleration(ref_pos, masses, 1)
+            ref_vel += acc * dt / 2
+        assert np.allclose(pos, ref_pos, rtol=1e-4, atol=1e-8)
+        assert np.allclose(vel, ref_vel, rtol=1e-3, atol=1e-6)
+
+    def kepler_error(self, integrator, dt):
+        """the position error after one period of a circular orbit"""
+        positions = np.array([[1., 0], [-1, 0]])
+        velocities = np.array([[0, 0.5], [0, -0.5]])
+        masses = np.array([1., 1])
+        period = 2 * np.pi * 1 / 0.5
+        nsteps = int(round(period / dt))
+        forces = None
+        pos, vel = positions, velocities
+        for i in range(nsteps):
+            pos, vel, forces = INTEGRATORS[integrator](
+                pos, vel, masses, period / nsteps, 1, forces=forces)
+        return np.abs(pos - positions).max()
+
+    def test_order(self):
+        orders = {'kdk': 2, 'dkd': 2, 'yoshida4': 4, 'yoshida6': 6,
+                  'hermite': 4}
+        for integrator, order in orders.items():
+            coarse = self.kepler_error(integrator, 0.2)
+            fine = self.kepler_error(integrator, 0.1)
+            assert np.log2(coarse / fine) > order - 0.5
+
+    def test_kdk_step_forces(self):
+        positions, velocities, masses = binary_and_field()
+        first = kdk_step(positions, velocities, masses, 1e-4, 1)
+        second = kdk_step(*first[:2], masses, 1e-4, 1, forces=first[2])
+        again = kdk_step(*first[:2], masses, 1e-4, 1)
+        assert (second[0] == again[0]).all()
+        assert (second[1] == again[1]).all()
+
+    def test_block_step_encounter(self):
+        # b2 flies past b1 during the step, starting on a coarse level
+        positions = np.array([[0., 0], [-4, 0.05]])
+        velocities = np.array([[0., 0], [80, 0]])
+        masses = np.array([1., 1e-3])
+        pos, vel, forces = block_step(positions, velocities, masses, 0.1, 1,
+                                      eta=0.01, max_level=12)
+        ref_pos, ref_vel = positions.copy(), velocities.copy()
+        dt = 0.1 / 2 ** 15
+        acc = direct_acceleration(ref_pos, masses, 1)
+        for i in range(2 ** 15):
+            ref_vel += acc * dt / 2
+            ref_pos += ref_vel * dt
+            acc = direct_acceleration(ref_pos, masses, 1)
+            ref_vel += acc * dt / 2
+        assert np.allclose(pos, ref_pos, rtol=0, atol=1e-7)
+        assert np.allclose(vel, ref_vel, rtol=0, atol=1e-4)
+        # the returned forces belong to the final positions
+        assert np.allclose(forces[0], direct_acceleration(pos, masses, 1))
@@ -0,0 +1,112 @@
+from .. import jit
+from ..forces import direct_acceleration, resolve_method
+from .helpers import random_system
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+requires_numba = pytest.mark.skipif(not jit.HAVE_NUMBA,
+                                    reason='numba is not installed')
+
+
+class TestJit():
+
+    @requires_numba
+    def test_jit_acceleration(self):
+        system = random_system(40)
+        positions = system.all_positions
+        positions[1] = positions[0]
+        acc = jit.jit_acceleration(positions, system.all_masses, 1)
+        assert np.allclose(acc, direct_acceleration(positions,
+                                                    system.all_masses, 1))
+
+    @requires_numba
+    def test_jit_kick_drift(self):
+        system = random_system(40, dim=2)
+        reference = random_system(40, dim=2)
+        positions, velocities, previous = jit.jit_kick_drift(
+            system.all_positions, system.all_velocities, system.all_masses,
+            0.01, 1, 10, halfstep=True)
+        for i in range(10):
+            last = reference.all_positions
+            reference.step(0.01, grav_const=1, halfstep=(i == 0))
+        assert np.allclose(positions, reference.all_positions)
+        assert np.allclose(velocities, reference.all_velocities)
+        assert np.allclose(previous, last)
+
+    @requires_numba
+    @pytest.mark.parametrize('method', ['jit', 'auto'])
+    def test_step(self, method):
+        system = random_system(40)
+        for halfstep in [True, False]:
+            direct = system.step(0.01, grav_const=1, inplace=False,
+                                 halfstep=halfstep)
+            compiled = system.step(0.01, grav_const=1, inplace=False,
+                                   halfstep=halfstep, method=method)
+            assert np.allclose(direct.all_positions, compiled.all_positions)
+            assert np.allclose(direct.all_velocities,
+                               compiled.all_velocities)
+
+    @requires_numba
+    @pytest.mark.parametrize('halfstep', [True, False])
+    @pytest.mark.parametrize('output', [{'stride': 3},
+                                        {'sample_every': '55ms'},
+                                        {'times': ['0ms', '333ms', '1s']}])
+    def test_simulate(self, halfstep, output):
+        # the compiled loop runs all steps between two snapshots
+        system = random_system(40)
+        results = system.simulate(end='1s', step='10ms', grav_const=1,
+                                  halfstep=halfstep, **output)
+        jit_system = random_system(40)
+        jit_results = jit_system.simulate(end='1s', step='10ms',
+                                          grav_const=1, halfstep=halfstep,
+                                          method='jit', **output)
+        assert (results.index == jit_results.index).all()
+        assert np.allclose(results.values, jit_results.values)
+        assert np.allclose(system.all_velocities, jit_system.all_velocities)
+
+    @requires_numba
+    @pytest.mark.parametrize('kernel', ['plummer', 'spline'])
+    def test_simulate_softening(self, kernel):
+        # the compiled loop also runs with softening
+        lengths = np.linspace(0.1, 0.3, 40)
+        system = random_system(40)
+        results = system.simulate(end='500ms', step='10ms', grav_const=1,
+                                  softening=lengths, kernel=kernel)
+        jit_system = random_system(40)
+        jit_results = jit_system.simulate(end='500ms', step='10ms',
+                                          grav_const=1, method='jit',
+                                          softening=lengths, kernel=kernel)
+        assert np.allclose(results.values, jit_results.values)
+
+    @requires_numba
+    def test_resolve_method(self):
+        assert resolve_method('auto') == 'jit'
+        assert resolve_method('direct') == 'direct'
+
+    def test_without_numba(self, monkeypatch):
+        monkeypatch.setattr(jit, 'HAVE_NUMBA', False)
+        system = random_system(40)
+        with pytest.raises(ImportError):
+            jit.jit_acceleration(system.all_positions, system.all_masses, 1)
+        with pytest.raises(ImportError):
+            system.step(0.01, method='jit')
+        # 'auto' falls back to the NumPy path
+        assert resolve_method('auto') == 'direct'
+        direct = system.step(0.01, grav_const=1, inplace=False)
+        auto = system.step(0.01, grav_const=1, inplace=False,
+                           method='auto')
+        assert (direct.all_positions == auto.all_positions).all()
+        results = random_system(40).simulate(end='100ms', step='10ms',
+                                           grav_const=1)
+        auto_results = random_system(40).simulate(end='100ms', step='10ms',
+                                                grav_const=1, method='auto')
+        assert results.equals(auto_results)
+
+    def test_import_does_not_load_numba(self):
+        code = 'import sys, nbody; print("numba" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', code],
+                                capture_output=True, text=True, check=True,
+                                cwd=__file__.rsplit('/nbody/', 1)[0])
+        assert output.stdout.strip() == 'False'
@@ -1,5 +1,6 @@
 from ..nbodysystem import NBodySystem
 from ..pointmass import PointMass
+from ..output import CallbackSink
 import numpy as np
 import pytest
 import pandas as pd
@@ -170,3 +171,223 @@ class TestNBodySystem():
         assert pos_compare.all()
         vel_compare = body2.velocity == b2.velocity
         assert vel_compare.all()
+
+    def test_step_barneshut(self):
+        rng = np.random.default_rng(0)
+        bodies = [PointMass('b' + str(i), 1.0, rng.normal(size=3),
+                            np.zeros(3)) for i in range(50)]
+        system = NBodySystem(*bodies)
+        direct = system.step(dt=0.01, grav_const=1, inplace=False)
+        tree = system.step(dt=0.01, grav_const=1, inplace=False,
+                           method='barneshut', theta=0)
+        assert np.allclose(direct.all_positions, tree.all_positions)
+        assert np.allclose(direct.all_velocities, tree.all_velocities)
+
+    def test_iter_simulate(self):
+        body1 = PointMass('b1', 1, np.array([1, 0, 0]), np.array([0, 1, 1]))
+        body2 = PointMass('b2', 2, np.array([0, 0, 0]), np.array([0, 1, 1]))
+        body3 = PointMass('b3', 1, np.array([-1, 0, 0]), np.array([0, 1, 1]))
+        system = NBodySystem(body1, body2, body3)
+        system2 = NBodySystem(body1, body2, body3)
+        results = system2.simulate(end='1s', step='100ms', grav_const=1)
+        snapshots = list(system.iter_simulate(end='1s', step='100ms',
+                                              grav_const=1, stride=3))
+        times = [time for time, positions in snapshots]
+        assert np.allclose(times, [0, 0.3, 0.6, 0.9])
+        for i, (time, positions) in enumerate(snapshots):
+            compare = positions.flatten() == results.iloc[3 * i].values
+            assert compare.all()
+
+    def test_simulate_sink(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 1]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -1]))
+        system = NBodySystem(body1, body2)
+        system2 = NBodySystem(body1, body2)
+        results = system.simulate(end='1s', step='100ms', grav_const=1,
+                                  stride=2)
+        snapshots = []
+        sink = CallbackSink(lambda time, pos: snapshots.append(pos))
+        assert system2.simulate(end='1s', step='100ms', grav_const=1,
+                                stride=2, sink=sink) is None
+        assert len(results) == len(snapshots) == 6
+        compare = np.array(snapshots).reshape((6, 4)) == results.values
+        assert compare.all()
+
+    def test_simulate_sample_every(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 1]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -1]))
+        system = NBodySystem(body1, body2)
+        system2 = NBodySystem(body1, body2)
+        results = system.simulate(end='1s', step='100ms', grav_const=1)
+        sampled = system2.simulate(end='1s', step='100ms', grav_const=1,
+                                   sample_every='250ms')
+        index = pd.to_timedelta(['0ms', '250ms', '500ms', '750ms', '1s'])
+        assert (sampled.index == index).all()
+        assert (sampled.loc['500ms'] == results.loc['500ms']).all()
+        middle = (results.loc['200ms'] + results.loc['300ms']) / 2
+        assert np.allclose(sampled.loc['250ms'], middle)
+        compare = system.all_positions == system2.all_positions
+        assert compare.all()
+
+    def test_simulate_times(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 1]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -1]))
+        system = NBodySystem(body1, body2)
+        results = system.simulate(end='1s', step='100ms', grav_const=1,
+                                  times=['330ms', '0.9s'])
+        assert len(results) == 2
+        with pytest.raises(ValueError):
+            system.simulate(end='1s', step='100ms', grav_const=1,
+                            times=['2s'])
+        # no output times still runs the simulation
+        results = system.simulate(end='1s', step='100ms', grav_const=1,
+                                  times=[])
+        assert results.shape == (0, 4)
+        assert system.time == 1
+
+    def test_step_block(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 0.5]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -0.5]))
+        system = NBodySystem(body1, body2)
+        new_system = system.step(dt=0.1, grav_const=1, inplace=False,
+                                 integrator='block')
+        momentum = (new_system.all_velocities
+                    * new_system.all_masses[:, None]).sum(axis=0)
+        assert np.allclose(momentum, 0)
+        assert (system.all_positions != new_system.all_positions).any()
+        with pytest.raises(ValueError):
+            system.step(dt=0.1, integrator='unknown')
+
+    def test_step_integrators(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 0.5]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -0.5]))
+        for integrator in ['kdk', 'dkd', 'yoshida4', 'yoshida6', 'hermite']:
+            system = NBodySystem(body1, body2)
+            for i in range(32):
+                system.step(dt=np.pi / 32, grav_const=1,
+                            integrator=integrator)
+            # a quarter period later the bodies have swapped axes
+            assert np.allclose(system.all_positions, [[0, 1], [0, -1]],
+                               atol=0.01)
+
+    def test_step_reuses_forces(self):
+        body1 = PointMass('b1', 1, np.array([1, 0]), np.array([0, 0.5]))
+        body2 = PointMass('b2', 1, np.array([-1, 0]), np.array([0, -0.5]))
+        system = NBodySystem(body1, body2)
+        system.step(dt=0.1, grav_const=1, integrator='kdk')
+        assert system._cached_forces(('kdk', 1, 'direct', {})) is not None
+        assert system._cached_forces(('kdk', 2, 'direct', {})) is None
+        system.all_masses[1] = 2
+        assert system._cached_forces(('kdk', 1, 'direct', {})) is None
+        system.all_masses[1] = 1
+        assert system._cached_forces(('kdk', 1, 'direct', {})) is not None
+        system.all_positions[0, 0] = 2
+        assert system._cached_forces(('kdk', 1, 'direct', {})) is None
+
+    def test_from_arrays(self):
+        positions = np.array([[1., 2], [5, 6]])
+        system = NBodySystem.from_arrays(positions, [[3, 4], [7, 8]], [1, 2],
+                                         names=np.array(['b1', 'b2']))
+        assert system.all_positions is positions
+        assert (system.all_velocities == [[3, 4], [7, 8]]).all()
+        assert (system.all_masses == [1, 2]).all()
+        assert system.bodyindex == {'b1': 0, 'b2': 1}
+        assert type(next(iter(system.bodyindex))) is str
+        ids = NBodySystem.from_arrays(positions, positions, [1, 2])
+        assert ids.bodyindex == {0: 0, 1: 1}
+        with pytest.raises(AttributeError):
+            NBodySystem.from_arrays(positions, positions, [1, 2], [7, 7])
+        with pytest.raises(ValueError):
+            NBodySystem.from_arrays(positions, positions[:1], [1, 2])
+        with pytest.raises(ValueError):
+            NBodySystem.from_arrays(positions, positions, [1, 2, 3])
+        with pytest.raises(ValueError):
+            NBodySystem.from_arrays(positions, positions, [1, 2], ['b1'])
+
+    def test_from_files(self, tmp_path):
+        table = pd.DataFrame({'name': ['b1', 'b2'], 'mass': [1., 2],
+                              'x1': [1., 5], 'x2': [2., 6],
+                              'v1': [3., 7], 'v2': [4., 8]})
+        table.to_csv(tmp_path / 'bodies.csv', index=False)
+        system = NBodySystem.from_csv(tmp_path / 'bodies.csv')
+        assert (system.all_positions == [[1, 2], [5, 6]]).all()
+        assert (system.all_velocities == [[3, 4], [7, 8]]).all()
+        assert (system.all_masses == [1, 2]).all()
+        assert system.bodyindex == {'b1': 0, 'b2': 1}
+
+        for name in ['positions', 'velocities', 'masses']:
+            np.save(tmp_path / (name + '.npy'), getattr(system,
+                                                        'all_' + name))
+        loaded = NBodySystem.from_npy(tmp_path / 'positions.npy',
+                                      tmp_path / 'velocities.npy',
+                                      tmp_path / 'masses.npy',
+                                      mmap_mode='r')
+        assert isinstance(loaded.all_positions, np.memmap)
+        assert (loaded.all_positions == system.all_positions).all()
+        assert loaded.bodyindex == {0: 0, 1: 1}
+
+    def test_from_parquet(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        table = pd.DataFrame({'mass': [1., 2], 'x1': [1., 5],
+                              'v1': [3., 7]})
+        table.to_parquet(tmp_path / 'bodies.parquet')
+        system = NBodySystem.from_parquet(tmp_path / 'bodies.parquet')
+        assert (system.all_positions == [[1], [5]]).all()
+
+    @pytest.mark.parametrize('integrator', ['kick-drift', 'kdk', 'yoshida4',
+                                            'hermite', 'block'])
+    def test_float32(self, integrator):
+        rng = np.random.default_rng(0)
+        system = NBodySystem.from_arrays(rng.normal(size=(20, 3)),
+                                         rng.normal(size=(20, 3)) * 0.1,
+                                         rng.uniform(1, 2, size=20))
+        single = system.astype(np.float32)
+        assert single.dtype == np.float32
+        assert system.dtype == np.float64
+        mixed = NBodySystem.from_arrays(system.all_positions,
+                                        system.all_velocities,
+                                        system.all_masses)
+        options = {'end': '100ms', 'step': '10ms', 'grav_const': 1,
+                   'integrator': integrator, 'softening': 0.05}
+        results = system.simulate(**options)
+        single_results = single.simulate(**options)
+        mixed_results = mixed.simulate(dtype=np.float32, **options)
+        assert single.all_positions.dtype == np.float32
+        assert single.all_velocities.dtype == np.float32
+        assert mixed.all_positions.dtype == np.float64
+        assert np.allclose(single_results.values, results.values, atol=1e-5)
+        assert np.allclose(mixed_results.values, results.values, atol=1e-5)
+
+    def test_add_remove_bodies(self):
+        positions = np.array([[0., 0], [1, 0], [2, 0], [3, 0]])
+        masses = np.array([1., 2, 3, 4])
+        system = NBodySystem.from_arrays(positions, positions * 0, masses,
+                                         ['a', 'b', 'c', 'd'])
+        source = system.remove_bodies(['a', 'b'])
+        assert (source == [2, 3]).all()
+        assert system.bodyindex == {'c': 0, 'd': 1}
+        assert (system.all_masses == [3, 4]).all()
+        # the arrays passed to from_arrays are not changed
+        assert (masses == [1, 2, 3, 4]).all()
+        system.add_bodies([[5, 0]], [[0, 1]], [5], names=['long name'])
+        system.add_bodies([[6, 0]], [[0, 1]], [6], names=['f'])
+        system.add_bodies([[7, 0]], [[0, 1]], [7], names=['g'])
+        buffer = system.all_masses.base
+        system.add_bodies([[8, 0]], [[0, 1]], [8], names=['h'])
+        # the buffer grows geometrically, so it is not copied every time
+        assert system.all_masses.base is buffer
+        assert (system.select(['long name', 'g']).masses == [5, 7]).all()
+        assert system.get_body('c').mass == 3
+        with pytest.raises(AttributeError):
+            system.add_bodies([[8, 0]], [[0, 1]], [8], names=['c'])
+        with pytest.raises(ValueError):
+            system.add_bodies([[8, 0]], [[0, 1]], [8])
+        with pytest.raises(KeyError):
+            system.remove_bodies('a')
+        system.step(0.01, grav_const=1)
+        system.remove_bodies('c')
+        assert system.bodyindex == {'h': 0, 'd': 1, 'long name': 2,
+                                    'f': 3, 'g': 4}
+        ids = NBodySystem.from_arrays(positions, positions, masses)
+        ids.add_bodies([[5, 0]], [[0, 1]], [5])
+        assert ids.bodyindex == {0: 0, 1: 1, 2: 2, 3: 3, 4: 4}
@@ -0,0 +1,111 @@
+from ..nbodysystem import NBodySystem
+from ..output import ArraySink, AsyncSink, CallbackSink, ChunkedDirectorySink
+from ..output import NpySink, read_chunked
+import numpy as np
+import pytest
+
+
+def write_frames(sink, nframes=5):
+    sink.open(nframes, ['b1', 'b2'], 3)
+    for i in range(nframes):
+        sink.write(0.1 * i, np.full((2, 3), i))
+    sink.close()
+
+
+class TestArraySink():
+
+    def test_write(self):
+        sink = ArraySink()
+        write_frames(sink)
+        assert np.allclose(sink.times, [0, 0.1, 0.2, 0.3, 0.4])
+        assert (sink.positions[3] == 3).all()
+
+
+class TestNpySink():
+
+    def test_write(self, tmp_path):
+        sink = NpySink(tmp_path / 'run.npy')
+        write_frames(sink)
+        positions = np.load(tmp_path / 'run.npy', mmap_mode='r')
+        assert positions.shape == (5, 2, 3)
+        assert (positions[4] == 4).all()
+        times = np.load(tmp_path / 'run_times.npy')
+        assert np.allclose(times, [0, 0.1, 0.2, 0.3, 0.4])
+
+
+class TestChunkedDirectorySink():
+
+    def test_write(self, tmp_path):
+        sink = ChunkedDirectorySink(tmp_path / 'run', chunk_size=2)
+        write_frames(sink)
+        assert len(list((tmp_path / 'run').glob('positions_*.npy'))) == 3
+        names, times, positions = read_chunked(tmp_path / 'run')
+        assert names == ['b1', 'b2']
+        assert np.allclose(times, [0, 0.1, 0.2, 0.3, 0.4])
+        assert positions.shape == (5, 2, 3)
+        assert (positions[:, 0, 0] == np.arange(5)).all()
+
+    def test_read_chunked_mmap(self, tmp_path):
+        sink = ChunkedDirectorySink(tmp_path / 'run', chunk_size=2)
+        write_frames(sink)
+        names, times, positions = read_chunked(tmp_path / 'run',
+                                               mmap_mode='r')
+        assert len(times) == 5
+        assert [len(chunk) for chunk in positions] == [2, 2, 1]
+        assert all(isinstance(chunk, np.memmap) for chunk in positions)
+        assert (positions[1][0] == 2).all()
+
+    def test_write_removes_old_chunks(self, tmp_path):
+        write_frames(ChunkedDirectorySink(tmp_path / 'run', chunk_size=2))
+        write_frames(ChunkedDirectorySink(tmp_path / 'run', chunk_size=2), 2)
+        names, times, positions = read_chunked(tmp_path / 'run')
+        assert np.allclose(times, [0, 0.1])
+        assert positions.shape == (2, 2, 3)
+
+
+class TestAsyncSink():
+
+    def test_write(self, tmp_path):
+        sink = AsyncSink(ChunkedDirectorySink(tmp_path / 'run', chunk_size=2,
+                                              compress=True))
+        write_frames(sink)
+        assert len(list((tmp_path / 'run').glob('positions_*.npz'))) == 3
+        names, times, positions = read_chunked(tmp_path / 'run')
+        assert np.allclose(times, [0, 0.1, 0.2, 0.3, 0.4])
+        assert (positions[:, 0, 0] == np.arange(5)).all()
+
+    def test_flush_on_exception(self):
+        sink = AsyncSink(ArraySink(), buffers=1)
+        sink.open(5, ['b1', 'b2'], 3)
+        with pytest.raises(ZeroDivisionError):
+            try:
+                for i in range(3):
+                    sink.write(0.1 * i, np.full((2, 3), i))
+                1 / 0
+            finally:
+                sink.close()
+        assert (sink.sink.positions[:3, 0, 0] == [0, 1, 2]).all()
+
+    def test_writer_error(self):
+        def fail(time, positions):
+            raise OSError('disk full')
+        sink = AsyncSink(CallbackSink(fail))
+        sink.open(5, ['b1', 'b2'], 3)
+        sink.write(0, np.zeros((2, 3)))
+        with pytest.raises(OSError):
+            for i in range(4):
+                sink.write(0, np.zeros((2, 3)))
+            sink.close()
+        sink.close()
+
+    def test_simulate(self):
+        def orbit():
+            return NBodySystem.from_arrays([[0., 0], [1, 0]],
+                                           [[0., 0], [0, 1]], [1., 1e-3])
+        expected = orbit().simulate(end='1s', step='10ms', grav_const=1)
+        system = orbit()
+        sink = AsyncSink(ArraySink())
+        assert system.simulate(end='1s', step='10ms', grav_const=1,
+                               sink=sink) is None
+        assert np.allclose(sink.sink.positions,
+                           expected.values.reshape(sink.sink.positions.shape))
@@ -0,0 +1,70 @@
+from ..parallel import ForcePool, parallel_acceleration
+from ..forces import direct_acceleration
+import numpy as np
+import pytest
+
+
+class TestForcePool():
+
+    @pytest.mark.parametrize('kind', ['process', 'thread'])
+    def test_acceleration(self, kind):
+        rng = np.random.default_rng(0)
+        positions = rng.normal(size=(101, 3))
+        masses = rng.uniform(1, 2, size=101)
+        direct = direct_acceleration(positions, masses, 1)
+        with ForcePool(workers=3, kind=kind) as pool:
+            acc = pool.acceleration(positions, masses, 1)
+            assert np.allclose(acc, direct)
+            again = pool.acceleration(positions, masses, 1)
+            assert (acc == again).all()
+            # a bigger system restarts the workers with bigger buffers
+            positions = rng.normal(size=(300, 3))
+            masses = rng.uniform(1, 2, size=300)
+            acc = pool.acceleration(positions, masses, 1)
+            assert np.allclose(acc,
+                               direct_acceleration(positions, masses, 1))
+
+    @pytest.mark.parametrize('kind', ['process', 'thread'])
+    def test_acceleration_reuses_workers(self, kind):
+        rng = np.random.default_rng(2)
+        positions = rng.normal(size=(20, 3))
+        masses = rng.uniform(1, 2, size=20)
+        with ForcePool(workers=2, kind=kind) as pool:
+            pool.acceleration(positions, masses, 1)
+            workers = pool._pool
+            pool.acceleration(positions, masses, 1)
+            pool.acceleration(positions[:10], masses[:10], 1)
+            assert pool._pool is workers
+            if kind == 'process':
+                assert len(workers._pool) == 2
+
+    def test_softening_per_body(self, monkeypatch):
+        rng = np.random.default_rng(3)
+        positions = rng.normal(size=(40, 3))
+        masses = rng.uniform(1, 2, size=40)
+        lengths = rng.uniform(0.1, 0.5, size=40)
+        tasks = []
+        with ForcePool(workers=2) as pool:
+            acc = pool.acceleration(positions, masses, 1, softening=lengths,
+                                    kernel='spline')
+            # the lengths are shared, the tasks only carry a flag
+            map_tasks = pool._pool.map
+            monkeypatch.setattr(pool._pool, 'map', lambda work, items: (
+                tasks.extend(items), map_tasks(work, items))[1])
+            again = pool.acceleration(positions, masses, 1,
+                                      softening=lengths, kernel='spline')
+        assert np.allclose(acc, direct_acceleration(positions, masses, 1,
+                                                    lengths, 'spline'))
+        assert (acc == again).all()
+        assert tasks and all(task[6] is None for task in tasks)
+
+    def test_init_wrong_kind(self):
+        with pytest.raises(ValueError):
+            ForcePool(kind='gpu')
+
+    def test_parallel_acceleration(self):
+        rng = np.random.default_rng(1)
+        positions = rng.normal(size=(50, 2))
+        masses = rng.uniform(1, 2, size=50)
+        acc = parallel_acceleration(positions, masses, 1, workers=2)
+        assert np.allclose(acc, direct_acceleration(positions, masses, 1))
@@ -0,0 +1,117 @@
+from ..diagnostics import DiagnosticsLog
+from ..nbodysystem import NBodySystem
+from ..particlemesh import mesh_acceleration, pm_acceleration
+import numpy as np
+import pytest
+from scipy.special import erfc
+
+
+def ewald_acceleration(convec, box_size=1., images=4):
+    """the acceleration of a body at convec from a unit mass at the
+    origin and all its periodic images (Ewald summation, G=1)"""
+    alpha = 5.6 / box_size
+    offsets = np.arange(-images, images + 1)
+    acc = np.zeros(3)
+    for image in np.array(np.meshgrid(offsets, offsets,
+                                      offsets)).reshape(3, -1).T:
+        shifted = convec + image * box_size
+        dist = np.linalg.norm(shifted)
+        acc -= shifted / dist ** 3 * (
+            erfc(alpha * dist) + 2 * alpha * dist / np.sqrt(np.pi)
+            * np.exp(- (alpha * dist) ** 2))
+        if image.any():
+            k = 2 * np.pi * image / box_size
+            acc -= (4 * np.pi / box_size ** 3 * k / (k @ k)
+                    * np.exp(- (k @ k) / (4 * alpha ** 2))
+                    * np.sin(k @ convec))
+    return acc
+
+
+class TestParticleMesh():
+
+    @pytest.mark.parametrize('split', [None, 1.25 / 32])
+    @pytest.mark.parametrize('separation', [0.1, 0.35])
+    def test_ewald(self, split, separation):
+        convec = np.array([separation, 0.1 * separation, 0])
+        # a test particle, so only the pull of the first body counts
+        positions = np.array([[0.3, 0.4, 0.5], [0.3, 0.4, 0.5] + convec])
+        acc = pm_acceleration(positions, np.array([1, 1e-12]), 1, 1.,
+                              grid=32, split=split)
+        expected = ewald_acceleration(convec)
+        error = np.linalg.norm(acc[1] - expected) / np.linalg.norm(expected)
+        assert error < (3e-2 if split else 5e-2)
+
+    def test_close_pair(self):
+        # the short-range part gives the exact softened force
+        positions = np.array([[0.5, 0.5, 0.5], [0.505, 0.5, 0.5]])
+        acc = pm_acceleration(positions, np.array([1., 1]), 1, 1., grid=32,
+                              split=1.25 / 32, softening=0.01)
+        assert np.isclose(acc[0, 0], 0.005 / (0.005 ** 2 + 0.01 ** 2) ** 1.5,
+                          rtol=1e-3)
+
+    @pytest.mark.parametrize('split', [None, 1.25 / 32])
+    def test_periodic(self, split):
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(0, 2, size=(300, 3))
+        masses = rng.uniform(1, 2, size=300)
+        acc = pm_acceleration(positions, masses, 1, 2., grid=32,
+                              split=split)
+        # momentum is conserved and whole boxes do not matter
+        assert np.allclose(masses @ acc, 0, atol=1e-8 * np.abs(acc).max())
+        shifted = pm_acceleration(positions + [2, -4, 6], masses, 1, 2.,
+                                  grid=32, split=split)
+        assert np.allclose(shifted, acc)
+
+    def test_lattice(self):
+        # a uniform lattice feels no force
+        grid = (np.arange(4) + 0.5) / 4
+        positions = np.stack(np.meshgrid(grid, grid, grid),
+                             axis=-1).reshape(-1, 3)
+        acc = pm_acceleration(positions, np.ones(64), 1, 1., grid=16,
+                              split=1.25 / 16)
+        assert np.allclose(acc, 0, atol=1e-10)
+
+    def test_2d(self):
+        # the mesh keeps the 1/r^2 law of the other backends in 2D
+        positions = np.array([[0.45, 0.5], [0.55, 0.5]])
+        acc = mesh_acceleration(positions, np.array([1., 1]), 1, 10.,
+                                grid=256)
+        assert np.isclose(acc[0, 0], 100, rtol=5e-2)
+        with pytest.raises(ValueError):
+            pm_acceleration(positions, np.ones(2), 1, 10., split=0.1)
+
+    def test_errors(self):
+        positions = np.zeros((2, 3))
+        with pytest.raises(ValueError):
+            pm_acceleration(positions, np.ones(2), 1, 1., split=0.2)
+        with pytest.raises(ValueError):
+            pm_acceleration(positions, np.ones(2), 1, 1., kernel='gauss')
+
+    def test_simulate(self):
+        rng = np.random.default_rng(1)
+        system = NBodySystem.from_arrays(rng.uniform(0, 1, size=(50, 3)),
+                                         np.zeros((50, 3)),
+                                         np.full(50, 1 / 50))
+        momentum = system.momentum()
+        system.simulate(end='1s', step='100ms', grav_const=1e-3,
+                        method='pm', integrator='kdk', box_size=1.,
+                        grid=16, split=1.25 / 16, softening=0.01)
+        assert np.allclose(system.momentum(), momentum, atol=1e-12)
+        assert np.abs(system.all_velocities).max() > 0
+
+    def test_diagnostics(self):
+        system = NBodySystem.from_arrays(np.eye(3), np.zeros((3, 3)),
+                                         np.ones(3))
+        with pytest.raises(ValueError):
+            system.conserved_quantities(1, method='pm', box_size=2.)
+        with pytest.raises(ValueError):
+            system.simulate(end='1s', step='100ms', grav_const=1,
+                            method='pm', box_size=2., grid=8,
+                            diagnostics=DiagnosticsLog(every='500ms'))
+        assert system.time == 0
+
+    def test_float32(self):
+        positions = np.random.default_rng(2).uniform(0, 1, size=(20, 3))
+        acc = pm_acceleration(positions.astype(np.float32), np.ones(20), 1,
+                              1., grid=16, split=1.25 / 16)
+        assert acc.dtype == np.float32
@@ -0,0 +1,83 @@
+from ..output import CallbackSink
+from .. import jit
+from .. import profiling
+from ..profiling import Profiler
+from .helpers import random_system
+import numpy as np
+import pytest
+
+
+class TestProfiling():
+
+    def test_phase(self):
+        profiler = Profiler()
+        events = []
+        profiler.add_hook(lambda name, seconds: events.append(name))
+        with profiler.phase('outer'):
+            with profiler.phase('inner'):
+                pass
+            with profiler.phase('inner'):
+                pass
+        assert events == ['inner', 'inner', 'outer']
+        assert profiler.calls == {'inner': 2, 'outer': 1}
+        report = profiler.report()
+        assert report['total_time'] == pytest.approx(
+            sum(report['timings'].values()))
+        assert profiling.phase(None, 'outer') is profiling._NO_PHASE
+
+    def test_simulate(self):
+        system = random_system()
+        reference = random_system()
+        profiler = Profiler()
+        results = system.simulate(end='100ms', step='10ms', grav_const=1,
+                                  sample_every='15ms', profiler=profiler)
+        assert results.equals(reference.simulate(end='100ms', step='10ms',
+                                                 grav_const=1,
+                                                 sample_every='15ms'))
+        assert profiler.counters == {'steps': 10,
+                                     'force_evaluations': 10,
+                                     'interactions': 10 * 10 * 9,
+                                     'frames': 7}
+        assert set(profiler.timings) == {'simulate', 'integrate', 'forces',
+                                         'output'}
+        assert profiler.calls['integrate'] == 10
+        report = profiler.report()
+        assert report['steps_per_s'] > 0
+        assert 'peak_memory' not in report
+
+    @pytest.mark.parametrize('integrator', ['kdk', 'hermite', 'block'])
+    def test_step(self, integrator):
+        system = random_system()
+        profiler = Profiler()
+        system.step(0.01, grav_const=1, integrator=integrator,
+                    profiler=profiler)
+        system.step(0.01, grav_const=1, integrator=integrator,
+                    profiler=profiler)
+        assert profiler.counters['steps'] == 2
+        # kdk and hermite reuse the forces of the first step
+        if integrator != 'block':
+            assert profiler.counters['force_evaluations'] == 3
+        assert profiler.calls['forces'] == \
+            profiler.counters['force_evaluations']
+
+    @pytest.mark.skipif(not jit.HAVE_NUMBA, reason='numba is not installed')
+    def test_jit(self):
+        profiler = Profiler()
+        random_system().simulate(end='100ms', step='10ms', grav_const=1,
+                                 method='jit', stride=5, profiler=profiler)
+        assert profiler.counters['steps'] == 10
+        assert profiler.calls['integrate'] == 2
+
+    def test_trace_memory(self, tmp_path):
+        profiler = Profiler(trace_memory=True)
+        try:
+            random_system().simulate(end='50ms', step='10ms', grav_const=1,
+                                     checkpoint=tmp_path / 'state.nbs',
+                                     sink=CallbackSink(lambda *args: None),
+                                     profiler=profiler)
+            report = profiler.report()
+        finally:
+            profiler.close()
+        assert report['peak_memory'] > 0
+        assert set(report['allocated']) == set(report['timings'])
+        assert profiler.calls['checkpoint'] == 1
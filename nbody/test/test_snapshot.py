@@ -0,0 +1,78 @@
+from ..nbodysystem import NBodySystem
+from .. import snapshot
+from .helpers import random_system
+import numpy as np
+import pandas as pd
+import pytest
+
+
+class TestSnapshot():
+
+    @pytest.mark.parametrize('mmap_mode', [None, 'r'])
+    def test_roundtrip(self, tmp_path, mmap_mode):
+        system = random_system()
+        system.step(0.01, grav_const=1, halfstep=True)
+        system.save(tmp_path / 'state.nbs')
+        loaded = NBodySystem.load(tmp_path / 'state.nbs', mmap_mode=mmap_mode)
+        assert (loaded.all_positions == system.all_positions).all()
+        assert (loaded.all_velocities == system.all_velocities).all()
+        assert (loaded.all_masses == system.all_masses).all()
+        assert loaded.bodyindex == system.bodyindex
+        assert loaded.time == system.time == 0.01
+        assert loaded.staggered and system.staggered
+        assert isinstance(loaded.all_positions, np.memmap) == bool(mmap_mode)
+
+    def test_float32(self, tmp_path):
+        system = random_system().astype(np.float32)
+        system.step(0.01, grav_const=1, integrator='kdk')
+        system.save(tmp_path / 'state.nbs')
+        loaded = NBodySystem.load(tmp_path / 'state.nbs')
+        assert loaded.dtype == np.float32
+        assert (loaded.all_positions == system.all_positions).all()
+        assert loaded._forces[4].dtype == np.float32
+
+    def test_not_a_snapshot(self, tmp_path):
+        (tmp_path / 'state.nbs').write_bytes(b'something else')
+        with pytest.raises(ValueError):
+            NBodySystem.load(tmp_path / 'state.nbs')
+        random_system().save(tmp_path / 'state.nbs')
+        data = bytearray((tmp_path / 'state.nbs').read_bytes())
+        data[len(snapshot.MAGIC)] = snapshot.VERSION + 1
+        (tmp_path / 'state.nbs').write_bytes(bytes(data))
+        with pytest.raises(ValueError, match='version'):
+            NBodySystem.load(tmp_path / 'state.nbs')
+
+    @pytest.mark.parametrize('integrator', ['kick-drift', 'kdk', 'hermite',
+                                            'block'])
+    def test_resume(self, tmp_path, integrator):
+        path = tmp_path / 'state.nbs'
+        system = random_system()
+        results = system.simulate(end='200ms', step='10ms', grav_const=1,
+                                  integrator=integrator)
+        interrupted = random_system()
+        interrupted.simulate(end='100ms', step='10ms', grav_const=1,
+                             integrator=integrator, checkpoint=path)
+        resumed = NBodySystem.load(path)
+        assert resumed.time == 0.1
+        resumed_results = resumed.simulate(
+            end='200ms', step='10ms', start=pd.Timedelta(resumed.time, 's'),
+            grav_const=1, integrator=integrator)
+        assert (resumed.all_positions == system.all_positions).all()
+        assert (resumed.all_velocities == system.all_velocities).all()
+        assert resumed_results.equals(results.loc['100ms':])
+
+    def test_checkpoint_every(self, tmp_path):
+        path = tmp_path / 'state.nbs'
+        system = random_system()
+        snapshots = system.iter_simulate(end='100ms', step='10ms',
+                                          grav_const=1, stride=2,
+                                          checkpoint=path,
+                                          checkpoint_every='25ms')
+        for time, positions in snapshots:
+            if time == 0.04:
+                # a checkpoint is written every 3 steps
+                assert NBodySystem.load(path).time == pytest.approx(0.03)
+                break
+        system.simulate(end='100ms', step='10ms', grav_const=1,
+                        checkpoint=path, checkpoint_every='30ms')
+        assert NBodySystem.load(path).time == pytest.approx(0.1)
@@ -0,0 +1,118 @@
+from .. import jit
+from .. import softening
+from ..forces import acceleration, acceleration_jerk, direct_acceleration
+from ..forces import potential_energy
+import numpy as np
+import pytest
+
+
+def random_bodies(nbodies=60, dim=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(nbodies, dim)),
+            rng.normal(size=(nbodies, dim)),
+            rng.uniform(1, 2, size=nbodies),
+            rng.uniform(0.1, 0.5, size=nbodies))
+
+
+class TestSoftening():
+
+    def test_plummer(self):
+        positions = np.array([[0.3, 0.4], [0, 0]])
+        masses = np.array([1., 2])
+        acc = direct_acceleration(positions, masses, 1, softening=0.5)
+        expected = -2 * positions[0] / (0.25 + 0.25) ** 1.5
+        assert np.allclose(acc[0], expected)
+        assert np.allclose(masses @ acc, 0)
+
+    def test_spline(self):
+        eps = 0.1
+        dist = np.linspace(0.01, 0.5, 200)
+        factor, slope = softening.force_factor(dist ** 2, eps, 'spline',
+                                               derivative=True)
+        newtonian = dist >= softening.SPLINE_SUPPORT * eps
+        assert np.allclose(factor[newtonian], dist[newtonian] ** -3)
+        assert (factor[~newtonian] < dist[~newtonian] ** -3).all()
+        # the pieces join continuously
+        h = softening.SPLINE_SUPPORT * eps
+        for u in (0.5, 1):
+            pieces = softening.force_factor(
+                (h * np.array([u - 1e-9, u + 1e-9])) ** 2, eps, 'spline')
+            assert np.isclose(*pieces)
+            pieces = softening.potential_factor(
+                (h * np.array([u - 1e-9, u + 1e-9])) ** 2, eps, 'spline')
+            assert np.isclose(*pieces)
+        # f'(r) / r
+        step = 1e-6
+        numeric = (softening.force_factor((dist + step) ** 2, eps, 'spline')
+                   - softening.force_factor((dist - step) ** 2, eps,
+                                            'spline')) / (2 * step * dist)
+        assert np.allclose(slope, numeric, rtol=1e-5)
+        with pytest.raises(ValueError):
+            softening.force_factor(dist, eps, 'unknown')
+
+    @pytest.mark.parametrize('kernel', softening.KERNELS)
+    def test_potential_gradient(self, kernel):
+        positions, _, masses, lengths = random_bodies(nbodies=8)
+        acc = direct_acceleration(positions, masses, 1, lengths, kernel)
+        step = 1e-6
+        for i in range(3):
+            moved = positions.copy()
+            moved[i, 0] += step
+            upper = potential_energy(moved, masses, 1, softening=lengths,
+                                     kernel=kernel)
+            moved[i, 0] -= 2 * step
+            lower = potential_energy(moved, masses, 1, softening=lengths,
+                                     kernel=kernel)
+            gradient = (upper - lower) / (2 * step)
+            assert np.isclose(-gradient / masses[i], acc[i, 0], rtol=1e-5)
+
+    def test_per_body(self):
+        positions = np.array([[1., 0], [0, 0], [-1, 0]])
+        masses = np.array([1., 1, 1])
+        lengths = np.array([0.5, 0.1, 0.])
+        acc = direct_acceleration(positions, masses, 1, lengths)
+        # the pairs with body 0 use its softening length
+        assert np.isclose(acc[1, 0],
+                          1 / 1.25 ** 1.5 - 1 / (1 + 0.01) ** 1.5)
+        # coincident softened bodies do not pull each other
+        positions[2] = positions[1]
+        acc = direct_acceleration(positions, masses, 1, lengths)
+        assert np.isfinite(acc).all()
+        assert np.isclose(acc[1, 0], acc[2, 0])
+
+    @pytest.mark.parametrize('method, options', [
+        ('blocked', {'memory_budget': 10000}),
+        ('parallel', {'workers': 3, 'kind': 'thread'}),
+        ('barneshut', {'theta': 0, 'leaf_size': 4}),
+        pytest.param('jit', {}, marks=pytest.mark.skipif(
+            not jit.HAVE_NUMBA, reason='numba is not installed'))])
+    @pytest.mark.parametrize('kernel', softening.KERNELS)
+    def test_backends(self, method, options, kernel):
+        positions, _, masses, lengths = random_bodies()
+        positions[1] = positions[0]
+        for eps in (0.2, lengths):
+            direct = direct_acceleration(positions, masses, 1, eps, kernel)
+            acc = acceleration(positions, masses, 1, method=method,
+                               softening=eps, kernel=kernel, **options)
+            assert np.allclose(acc, direct)
+
+    @pytest.mark.parametrize('kernel', softening.KERNELS)
+    def test_jerk(self, kernel):
+        positions, velocities, masses, lengths = random_bodies(nbodies=20)
+        acc, jerk = acceleration_jerk(positions, velocities, masses, 1,
+                                      softening=lengths, kernel=kernel)
+        assert np.allclose(acc, direct_acceleration(positions, masses, 1,
+                                                    lengths, kernel))
+        step = 1e-6
+        numeric = (direct_acceleration(positions + velocities * step,
+                                       masses, 1, lengths, kernel)
+                   - direct_acceleration(positions - velocities * step,
+                                         masses, 1, lengths, kernel)
+                   ) / (2 * step)
+        assert np.allclose(jerk, numeric, rtol=1e-4, atol=1e-6)
+        targets = np.array([3, 7, 11])
+        partial = acceleration_jerk(positions, velocities, masses, 1,
+                                    memory_budget=2000, targets=targets,
+                                    softening=lengths, kernel=kernel)
+        assert np.allclose(partial[0], acc[targets])
+        assert np.allclose(partial[1], jerk[targets])